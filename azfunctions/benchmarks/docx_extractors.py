@@ -0,0 +1,86 @@
+"""Benchmark the python-docx and streaming lxml DOCX extractors.
+
+Usage:
+    python benchmarks/docx_extractors.py [CORPUS_DIR] [--repeat N]
+
+Without a corpus directory a synthetic corpus of small, medium and large
+documents (with many tables) is generated in memory.
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from docx import Document
+
+from shared.docx_service import DocxService
+from shared.docx_stream_service import DocxStreamService
+
+EXTRACTORS = {
+    "python-docx": DocxService,
+    "stream": DocxStreamService,
+}
+
+
+def build_synthetic_document(paragraph_count: int, table_count: int) -> bytes:
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Synthetic CV"
+    for i in range(paragraph_count):
+        doc.add_paragraph(f"Paragraph {i}: delivered features in Python and Azure", style="Heading 1" if i % 20 == 0 else None)
+    for i in range(table_count):
+        table = doc.add_table(rows=5, cols=4)
+        for row_idx, row in enumerate(table.rows):
+            for col_idx, cell in enumerate(row.cells):
+                cell.text = f"t{i} r{row_idx} c{col_idx}"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def load_corpus(corpus_dir: str | None) -> dict[str, bytes]:
+    if corpus_dir:
+        return {path.name: path.read_bytes() for path in sorted(Path(corpus_dir).glob("*.docx"))}
+    return {
+        "small.docx": build_synthetic_document(50, 2),
+        "medium.docx": build_synthetic_document(1000, 50),
+        "large.docx": build_synthetic_document(5000, 400),
+    }
+
+
+def measure(extractor, content: bytes, repeat: int) -> tuple[float, int]:
+    """Return the best wall time in seconds and the peak traced memory in bytes."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extractor.get_text_from_docx(content)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    extractor.get_text_from_docx(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?", help="directory with .docx files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_dir)
+    print(f"{'document':<30}{'size KB':>10}{'extractor':>14}{'time ms':>10}{'peak MB':>10}{'speedup':>9}")
+    for name, content in corpus.items():
+        baseline = None
+        for extractor_name, extractor in EXTRACTORS.items():
+            elapsed, peak = measure(extractor, content, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{name:<30}{len(content) / 1024:>10.1f}{extractor_name:>14}{elapsed * 1000:>10.1f}"
+                  f"{peak / 2**20:>10.1f}{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
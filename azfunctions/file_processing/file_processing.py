@@ -2,21 +2,64 @@ import logging
 import os
 import azure.functions as func
 import traceback
+from typing import Tuple
 from pydantic import ValidationError
 
 from shared.db_service import get_cosmos_db_client
 from shared.files_repository import FilesRepository
-from file_processing.schemas import FileProcessingOutputQueueMessage, FileProcessingRequest
+from shared.file_status_repository import FileStatusRepository
+from file_processing.schemas import FileProcessingOutputQueueMessage, FileProcessingRequest, FileStageMessage
 from shared.blob_service import FilesBlobService
 from shared.document_intelligence_service import DocumentIntelligenceService
 from shared.docx_service import DocxService
-from shared.models import FileMetadataDb, FileType
+from shared.docx_stream_service import DocxStreamService
+from shared.extraction_store import FileExtractionStore
+from shared.models import EXTRACTION_FIELDS, DocumentLayout, FileMetadataDb, FileStage, FileType, ProcessingState
+from shared.outbox import OutboxDispatcher, outbox_entry
 from shared.queue_service import QueueService
 from shared.openai_service.openai_service import OpenAIService
+from shared.parsing_executor import ParsingExecutor, get_parsing_executor
+
+# Queues of the processing stages. Each stage is its own function, so OCR,
+# LLM and database work scale and retry independently.
+EXTRACT_QUEUE = "extract-queue"
+ANALYZE_QUEUE = "analyze-queue"
+PERSIST_QUEUE = "persist-queue"
+# Stage queue that runs the next step of a file in each processing state
+STAGE_QUEUES = {
+    ProcessingState.UPLOADED: EXTRACT_QUEUE,
+    ProcessingState.EXTRACTED: ANALYZE_QUEUE,
+    ProcessingState.ANALYZED: PERSIST_QUEUE,
+    ProcessingState.PERSISTED: PERSIST_QUEUE,
+}
+# How persisted files are scheduled for matching: "queue" sends the matching
+# message from the persist stage; "change_feed" leaves it to the change-feed
+# trigger on the files container (matching/matching_feed.py)
+QUEUE_TRIGGER = "queue"
+CHANGE_FEED_TRIGGER = "change_feed"
+MATCHING_TRIGGER = os.getenv("MATCHING_TRIGGER", QUEUE_TRIGGER)
 
 # create blueprint with Queue trigger
 file_processing_bp = func.Blueprint()
 
+@file_processing_bp.queue_trigger(arg_name="msg", queue_name=EXTRACT_QUEUE, connection="AzureWebJobsStorage")
+def extract_file(msg: func.QueueMessage):
+    """Extract text and structure from an uploaded file (Document Intelligence / DOCX parsing)."""
+    _run_stage_function(msg, EXTRACT_QUEUE)
+
+
+@file_processing_bp.queue_trigger(arg_name="msg", queue_name=ANALYZE_QUEUE, connection="AzureWebJobsStorage")
+def analyze_file(msg: func.QueueMessage):
+    """Analyze an extracted document with OpenAI to determine its type and structure."""
+    _run_stage_function(msg, ANALYZE_QUEUE)
+
+
+@file_processing_bp.queue_trigger(arg_name="msg", queue_name=PERSIST_QUEUE, connection="AzureWebJobsStorage")
+def persist_file(msg: func.QueueMessage):
+    """Store the analyzed file in the database and queue it for matching."""
+    _run_stage_function(msg, PERSIST_QUEUE)
+
+
 @file_processing_bp.queue_trigger(arg_name="msg", queue_name="processing-queue", connection="AzureWebJobsStorage")
 def process_file(msg: func.QueueMessage):
     """
@@ -25,101 +68,209 @@ def process_file(msg: func.QueueMessage):
     2. Analyze the document to determine its type (CV/Resume or Job Description).
     3. Store the structured data in the database.
     4. Queue the file for matching.
+
+    Uploads now enter the pipeline through the extract queue; messages still in
+    processing-queue run the extract stage and continue through the stage queues.
     """
+    _run_stage_function(msg, EXTRACT_QUEUE)
+
+
+def _run_stage_function(msg: func.QueueMessage, queue_name: str) -> None:
     try:
-        logging.debug("DEBUG: process_file function called")
-        logging.debug(f"DEBUG: Message type: {type(msg)}")
         logging.debug(f"DEBUG: Message content: {msg.get_body().decode('utf-8') if hasattr(msg, 'get_body') else 'No get_body method'}")
-        
-        # Step 1: Parse the queue message
-        logging.debug("DEBUG: About to parse queue message")
-        file_processing_request = _parse_queue_message(msg)
-        logging.debug(f"DEBUG: Parsed request: {file_processing_request}")
-        
-        # Step 2: Create services
-        logging.debug("DEBUG: About to create blob service")
-        blob_service = FilesBlobService()
-        logging.debug(f"DEBUG: Created blob service: {blob_service}")
-        logging.debug(f"DEBUG: Blob service type: {type(blob_service)}")
-        logging.debug(f"DEBUG: Blob service class: {blob_service.__class__}")
-        logging.debug(f"DEBUG: Blob service module: {blob_service.__class__.__module__}")
-        logging.debug(f"DEBUG: Blob service container name: {blob_service.container_name}")
-        logging.debug("DEBUG: About to create document intelligence service")
-        document_intelligence_service = DocumentIntelligenceService()
-        logging.debug(f"DEBUG: Created document intelligence service: {document_intelligence_service}")
-        logging.debug("DEBUG: About to create OpenAI service")
-        openai_service = OpenAIService()
-        logging.debug(f"DEBUG: Created OpenAI service: {openai_service}")
-        
-        # Step 3: Get file content
-        logging.debug(f"DEBUG: About to get file content from {blob_service.container_name}/{file_processing_request.filename}")
-        content = blob_service.get_file_content(file_processing_request.filename)
-        logging.debug(f"DEBUG: Got file content, length: {len(content) if content else 'None'}")
-        if not content:
-            raise ValueError(f"File content is empty or file not found: {file_processing_request.filename}")
-        
-        # Step 4: Extract text from the document
-        # Use different methods based on file type
-        file_extension = os.path.splitext(file_processing_request.filename)[1].lower()
-        logging.debug("DEBUG: About to extract document content")
-        structured_info = _extract_document_content(
-            content, 
-            file_processing_request.filename,
-            document_intelligence_service
-        )
-        logging.debug(f"DEBUG: Extracted document content: {structured_info.keys()}")
-        
-        # Step 5: Analyze the document using OpenAI
-        logging.debug("DEBUG: About to analyze document with OpenAI")
-        document_analysis = openai_service.analyze_document(
-            text=structured_info['text'],
-            pages=structured_info.get('pages', []),
-            paragraphs=structured_info.get('paragraphs', [])
-        )
-        logging.debug(f"DEBUG: Document analysis result: {document_analysis}")
-        
-        # Step 6: Determine file type
-        file_type = file_processing_request.type or document_analysis.document_type
-        logging.debug(f"DEBUG: Determined file type: {file_type}")
-        
-        # Step 7: Create file metadata
-        logging.debug("DEBUG: About to create file metadata")
-        file_metadata = _create_file_metadata(file_processing_request, document_analysis)
-        logging.debug("DEBUG: About to get repository")
-        repository = FilesRepository(get_cosmos_db_client())
-        logging.debug(f"DEBUG: Got repository: {repository}")
-        logging.debug("DEBUG: About to upsert file")
-        repository.upsert_file(file_metadata)
-        logging.debug(f"DEBUG: Saved metadata to database")
-        
-        # Step 8: Queue for matching if needed
-        logging.debug("DEBUG: About to queue for matching")
-        _queue_for_matching(file_processing_request, file_type)
-        logging.debug(f"DEBUG: Queued file for matching")
-        
-        return func.HttpResponse(f"File processed successfully. ID: {file_processing_request.id}.", status_code=200)
-        
+        message = _parse_stage_message(msg)
+        _get_pipeline().run_stage(message, queue_name)
     except Exception as e:
-        logging.error(f"ERROR in process_file: {str(e)}")
+        logging.error(f"ERROR in {queue_name} stage: {str(e)}")
         logging.error(f"ERROR type: {type(e)}")
         # Print traceback for debugging
         logging.error(f"ERROR traceback: {traceback.format_exc()}")
-        return func.HttpResponse(f"Error processing file: {str(e)}", status_code=500)
+        # Fail the invocation so the message is redelivered and resumes where it stopped
+        raise
+
+
+class FileProcessingPipeline:
+    """Runs the processing steps of a file as a DAG of queue-connected stages.
+
+    Stage messages are claim checks (FileStageMessage): the file document holds
+    the processing state and the blobs hold the content and the step outputs.
+    Each step stores its output and advances the state in one conditional
+    patch, so a redelivered message resumes after the last completed step.
+    The same patch writes the message for the next stage to the file's outbox
+    (shared/outbox.py), so a crash cannot separate the two.
+    """
+
+    def __init__(
+        self,
+        repository: FilesRepository,
+        blob_service: FilesBlobService,
+        extraction_store: FileExtractionStore,
+        queue_service: QueueService,
+        status_repository: FileStatusRepository = None,
+        matching_trigger: str = QUEUE_TRIGGER
+    ):
+        self.repository = repository
+        self.blob_service = blob_service
+        self.extraction_store = extraction_store
+        self.queue_service = queue_service
+        self.status_repository = status_repository
+        self.outbox_dispatcher = OutboxDispatcher(repository, queue_service)
+        self.stage_queues = dict(STAGE_QUEUES)
+        if matching_trigger == CHANGE_FEED_TRIGGER:
+            # the change feed sees the persisted file and schedules matching
+            del self.stage_queues[ProcessingState.PERSISTED]
+        self.steps = {
+            ProcessingState.UPLOADED: self._extract,
+            ProcessingState.EXTRACTED: self._analyze,
+            ProcessingState.ANALYZED: self._persist,
+            ProcessingState.PERSISTED: self._queue_for_matching,
+        }
+
+    def run_stage(self, message: FileStageMessage, queue_name: str) -> None:
+        """Run the steps of the ``queue_name`` stage that the file has not completed yet.
+
+        The file is then handed to the stage of its next step. A file whose next
+        step belongs to another stage, because an earlier delivery already did
+        the work, is forwarded there without running anything here.
+        """
+        file = self.repository.get_file_by_id(message.user_id, message.file_id)
+        if file is None:
+            logging.info(f"File {message.file_id} no longer exists, nothing to process")
+            return
+        if message.sha256 and file.sha256 and message.sha256 != file.sha256:
+            logging.info(f"File {message.file_id} was re-uploaded with new content, skipping stale message")
+            return
+        state = file.processing_state or ProcessingState.UPLOADED
+        logging.info(f"Running {queue_name} stage for file {file.id} in state {state.value}")
+
+        outbox = []
+        while self.stage_queues.get(state) == queue_name:
+            try:
+                file, to_state = self.steps[state](file)
+            except Exception as e:
+                self._report(file, error=f"{queue_name} failed: {str(e)}")
+                raise
+            # the message for the next stage or matching is written with the state it follows from
+            outbox = self._outbox_for(file, to_state, queue_name)
+            if not self.repository.advance_processing_state(
+                file.user_id, file.id, state, to_state, sha256=file.sha256, outbox=outbox, **self._step_outputs(file, to_state)
+            ):
+                logging.info(f"File {file.id} left state {state.value} concurrently, stopping")
+                return
+            state = to_state
+            self._report(file, stage=FileStage(state.value))
+
+        if outbox:
+            # send now rather than on the next dispatcher tick; on failure the dispatcher sends it
+            try:
+                self.outbox_dispatcher.dispatch([{"id": str(file.id), "user_id": file.user_id, "outbox": outbox}])
+            except Exception as e:
+                logging.warning(f"Outbox of file {file.id} left to the dispatcher: {str(e)}")
+            return
+
+        next_queue = self.stage_queues.get(state)
+        if next_queue:
+            # nothing ran here: forward the file to the stage of its next step
+            self.queue_service.create_queue_if_not_exists(next_queue)
+            self.queue_service.send_message(
+                next_queue,
+                FileStageMessage(file_id=file.id, user_id=file.user_id, sha256=file.sha256).model_dump_json()
+            )
+
+    def _outbox_for(self, file: FileMetadataDb, to_state: ProcessingState, queue_name: str) -> list[dict]:
+        """Messages announcing that ``file`` reached ``to_state``, unless this stage continues with it."""
+        if to_state == ProcessingState.QUEUED:
+            return [outbox_entry("matching-queue", FileProcessingOutputQueueMessage(file_id=file.id, user_id=file.user_id, type=file.type))]
+        next_queue = self.stage_queues.get(to_state)
+        if next_queue and next_queue != queue_name:
+            return [outbox_entry(next_queue, FileStageMessage(file_id=file.id, user_id=file.user_id, sha256=file.sha256))]
+        return []
+
+    def _report(self, file: FileMetadataDb, stage: FileStage = None, error: str = None) -> None:
+        """Update the status record clients poll; a failed update never fails the stage."""
+        if not self.status_repository:
+            return
+        try:
+            if stage:
+                self.status_repository.set_stage(file.user_id, file.id, stage)
+            else:
+                self.status_repository.set_error(file.user_id, file.id, error)
+        except Exception as e:
+            logging.warning(f"Could not update the status of file {file.id}: {str(e)}")
+
+    @staticmethod
+    def _step_outputs(file: FileMetadataDb, to_state: ProcessingState) -> dict:
+        """Fields of the file document written together with the new state."""
+        if to_state in (ProcessingState.EXTRACTED, ProcessingState.ANALYZED):
+            return {"extraction_blob": file.extraction_blob, "extraction_hash": file.extraction_hash}
+        if to_state == ProcessingState.PERSISTED:
+            return {"type": FileType(file.type).value}
+        return {}
+
+    def _extract(self, file: FileMetadataDb) -> Tuple[FileMetadataDb, ProcessingState]:
+        request = FileProcessingRequest(**file.model_dump(mode="json", include=set(FileProcessingRequest.model_fields)))
+        # Identical content processed before is copied rather than processed again
+        duplicate = _reuse_processed_duplicate(request, self.repository, self.extraction_store)
+        if duplicate:
+            return self.extraction_store.save(duplicate), ProcessingState.ANALYZED
+
+        blob_name = file.get_blob_name()
+        logging.debug(f"DEBUG: About to get file content from {self.blob_service.container_name}/{blob_name}")
+        content = self.blob_service.get_file_content(self.blob_service.container_name, blob_name)
+        if not content:
+            raise ValueError(f"File content is empty or file not found: {file.filename}")
+        structured_info = _extract_document_content(
+            content,
+            file.filename,
+            _get_document_intelligence_service(),
+            get_parsing_executor()
+        )
+        logging.debug(f"DEBUG: Extracted document content: {structured_info.keys()}")
+        file = _create_file_metadata(request, structured_info, request.type, None)
+        return self.extraction_store.save(file), ProcessingState.EXTRACTED
+
+    def _analyze(self, file: FileMetadataDb) -> Tuple[FileMetadataDb, ProcessingState]:
+        # The sidecar may already hold the analysis of an attempt that stopped
+        # before recording it, so it is loaded without checking its hash.
+        file = self.extraction_store.load(file.model_copy(update={"extraction_hash": None}))
+        if file.document_analysis is None:
+            logging.debug("DEBUG: About to analyze document with OpenAI")
+            pages = file.get_pages() or []
+            file.document_analysis = OpenAIService().analyze_document(
+                text=file.text,
+                pages=[page.model_dump(exclude_none=True) for page in pages],
+                paragraphs=file.get_paragraphs() or []
+            )
+        return self.extraction_store.save(file), ProcessingState.ANALYZED
 
+    def _persist(self, file: FileMetadataDb) -> Tuple[FileMetadataDb, ProcessingState]:
+        file_type = file.type or self.extraction_store.load(file).document_analysis.document_type
+        return file.model_copy(update={"type": FileType(file_type)}), ProcessingState.PERSISTED
+
+    def _queue_for_matching(self, file: FileMetadataDb) -> Tuple[FileMetadataDb, ProcessingState]:
+        # the matching message goes out through the outbox written with the queued state
+        return file, ProcessingState.QUEUED
+
+
+def _get_pipeline() -> FileProcessingPipeline:
+    blob_service = FilesBlobService()
+    return FileProcessingPipeline(
+        _get_repository(),
+        blob_service,
+        FileExtractionStore(blob_service),
+        QueueService(connection_string=os.getenv("AzureWebJobsStorage")),
+        FileStatusRepository(get_cosmos_db_client()),
+        MATCHING_TRIGGER
+    )
 
-def _parse_queue_message(msg: func.QueueMessage) -> FileProcessingRequest:
-    """Parse the queue message into a FileProcessingRequest object."""
+
+def _parse_stage_message(msg: func.QueueMessage) -> FileStageMessage:
+    """Parse a stage message; processing messages sent by uploads are accepted too."""
     try:
-        message_body = msg.get_json()
-        return FileProcessingRequest(**message_body)
+        return FileStageMessage(**msg.get_json())
     except ValidationError as e:
-        logging.error(f"Validation error creating FileProcessingRequest: {e}")
-        logging.error("Invalid fields: " + ", ".join(str(err["loc"]) for err in e.errors()))
+        logging.error(f"Validation error creating FileStageMessage: {e}")
         raise ValueError(f"Invalid message: {e}")
-    except Exception as e:
-        logging.error(f"Error parsing message: {str(e)}")
-        logging.error(f"Raw message content: {msg.get_body().decode('utf-8')}")
-        raise
 
 
 def _get_document_intelligence_service() -> DocumentIntelligenceService:
@@ -136,16 +287,63 @@ def _get_repository() -> FilesRepository:
     return FilesRepository(cosmos_db_client)
 
 
-def _extract_document_content(content: bytes, filename: str, document_intelligence_service: DocumentIntelligenceService) -> dict:
-    """Extract text and structure from the document based on its file type."""
+def _get_docx_extractor_name() -> str:
+    """Return the DOCX extractor selected by DOCX_EXTRACTOR ("python-docx" or "stream")."""
+    return "stream" if os.getenv("DOCX_EXTRACTOR", "python-docx").lower() == "stream" else "python-docx"
+
+
+def _reuse_processed_duplicate(
+    request: FileProcessingRequest,
+    repository: FilesRepository,
+    extraction_store: FileExtractionStore
+) -> FileMetadataDb | None:
+    """Build the file from another processed file of the user with the same content hash.
+
+    Identical bytes give identical extraction and analysis, so they are copied
+    instead of running Document Intelligence and OpenAI again.
+    """
+    if not request.sha256:
+        return None
+    duplicate = repository.find_processed_file_by_sha256(request.user_id, request.sha256, exclude_id=request.id)
+    if not duplicate:
+        return None
+    logging.info(f"Reusing the extraction of file {duplicate.id} for {request.filename}")
+    duplicate = extraction_store.load(duplicate)
+    request_data = request.model_dump()
+    request_data.pop('type')
+    return FileMetadataDb(
+        **request_data,
+        **duplicate.model_dump(include=EXTRACTION_FIELDS),
+        type=request.type or duplicate.document_analysis.document_type
+    )
+
+
+def _get_docx_extractor():
+    return DocxStreamService if _get_docx_extractor_name() == "stream" else DocxService
+
+
+def _extract_document_content(
+    content: bytes,
+    filename: str,
+    document_intelligence_service: DocumentIntelligenceService,
+    parsing_executor: ParsingExecutor = None
+) -> dict:
+    """Extract text and structure from the document based on its file type.
+
+    When a parsing executor is given, CPU-bound parsing runs in its process pool.
+    """
     if filename.endswith(".docx"):
-        return DocxService.get_text_from_docx(content)
+        if parsing_executor:
+            return parsing_executor.extract_docx(content, _get_docx_extractor_name())
+        return _get_docx_extractor().get_text_from_docx(content)
     else:
         # Process PDF file using Document Intelligence
         try:
             client = document_intelligence_service.client
             poller = client.begin_analyze_document("prebuilt-layout", document=content)
             result = poller.result(timeout=300)
+            if parsing_executor:
+                return parsing_executor.process_analysis_result(result)
             return document_intelligence_service.process_analysis_result(result)
         except Exception as e:
             logging.error(f"Error processing PDF document: {str(e)}", exc_info=True)
@@ -158,28 +356,25 @@ def _create_file_metadata(
     file_type: FileType, 
     document_analysis
 ) -> FileMetadataDb:
-    """Create file metadata object with structured information."""
+    """Create file metadata object with structured information.
+
+    Pages, lines and paragraphs are stored as a layout of spans into the text
+    rather than as copies of it.
+    """
     request_data = request.model_dump()
     request_data.pop('type')  # Remove type from request data
+    structured_info = dict(structured_info)
+    pages = structured_info.pop('pages', None)
+    paragraphs = structured_info.pop('paragraphs', None)
+    if structured_info.get('text') is not None:
+        structured_info['layout'] = DocumentLayout.from_structure(
+            structured_info['text'], pages, paragraphs, structured_info.get('tables')
+        )
     return FileMetadataDb(
         **request_data,
         **structured_info,
         type=file_type,
         document_analysis=document_analysis
     )
-
-
-def _queue_for_matching(file_id: str, user_id: str, file_type: FileType):
-    """Send file to matching queue for further processing."""
-    queue_message = FileProcessingOutputQueueMessage(
-        file_id=file_id,
-        user_id=user_id,
-        type=file_type
-    )
-    
-    queue_service = QueueService(connection_string=os.getenv("AzureWebJobsStorage"))
-    queue_service.create_queue_if_not_exists("matching-queue")
-    queue_service.send_message("matching-queue", queue_message.model_dump_json())
-    logging.info(f"File {file_id} queued for matching")
     
     
\ No newline at end of file
@@ -0,0 +1,41 @@
+import logging
+from typing import List, Tuple
+
+from file_processing.file_processing import EXTRACT_QUEUE, QUEUE_TRIGGER, STAGE_QUEUES, FileProcessingPipeline
+from file_processing.schemas import FileStageMessage
+from shared.mock_queue_service import MockQueueService
+
+STAGE_QUEUE_NAMES = set(STAGE_QUEUES.values())
+
+
+class LocalPipelineRunner:
+    """Drives the processing stages in-process, for tests and local runs.
+
+    Stage queues are kept in memory and drained in order, the way the queue
+    triggers would run them. Messages for other queues (matching-queue) are
+    left in ``queue_service.messages`` for the caller to inspect.
+    """
+
+    def __init__(self, repository, blob_service, extraction_store, status_repository=None, max_deliveries: int = 100, matching_trigger: str = QUEUE_TRIGGER):
+        self.queue_service = MockQueueService()
+        self.pipeline = FileProcessingPipeline(repository, blob_service, extraction_store, self.queue_service, status_repository, matching_trigger)
+        self.max_deliveries = max_deliveries
+
+    def run(self, message: FileStageMessage, queue_name: str = EXTRACT_QUEUE) -> List[Tuple[str, str]]:
+        """Deliver ``message`` to ``queue_name`` and run stages until no stage message is left.
+
+        Returns the (queue_name, message) deliveries that were run.
+        """
+        self.queue_service.send_message(queue_name, message.model_dump_json())
+        delivered = []
+        while True:
+            pending = next((item for item in self.queue_service.messages if item[0] in STAGE_QUEUE_NAMES), None)
+            if pending is None:
+                return delivered
+            if len(delivered) >= self.max_deliveries:
+                raise RuntimeError(f"Pipeline did not settle after {self.max_deliveries} deliveries")
+            self.queue_service.messages.remove(pending)
+            stage_queue, body = pending
+            logging.info(f"Delivering message to {stage_queue}")
+            self.pipeline.run_stage(FileStageMessage.model_validate_json(body), stage_queue)
+            delivered.append(pending)
@@ -1,6 +1,6 @@
 from enum import Enum
 from uuid import UUID, uuid4
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional
 
 class FileType(str, Enum):
@@ -14,6 +14,11 @@ class FileProcessingBase(BaseModel):
     type: FileType
     user_id: str
     url: str
+    # set when the blob is not stored under the filename (direct uploads)
+    blob_name: Optional[str] = None
+    # size and sha256 of the uploaded content, kept on the processed document
+    size: Optional[int] = None
+    sha256: Optional[str] = None
 
 class FileProcessingRequest(FileProcessingBase):
     pass
@@ -24,4 +29,14 @@ class FileProcessingOutputQueueMessage(BaseModel):
     user_id: str
     type: FileType
     filename: Optional[str] = None
-    url: Optional[str] = None
\ No newline at end of file
+    url: Optional[str] = None
+
+class FileStageMessage(BaseModel):
+    """Claim check passed between processing stages.
+
+    The file document and its blobs hold everything else; ``sha256`` identifies
+    the content the message was sent for.
+    """
+    file_id: UUID = Field(validation_alias=AliasChoices("file_id", "id"))
+    user_id: str
+    sha256: Optional[str] = None
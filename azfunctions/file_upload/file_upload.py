@@ -4,17 +4,45 @@ import logging
 import json
 import base64
 import re
-from uuid import uuid4
+from datetime import datetime, timedelta, UTC
+from concurrent.futures import ThreadPoolExecutor
 
 from pydantic import ValidationError
 
 from shared.db_service import get_cosmos_db_client
 from shared.files_repository import FilesRepository
+from shared.file_status_repository import FileStatusRepository
+from shared.outbox import OutboxDispatcher, outbox_entry
 from shared.queue_service import QueueService
-from file_upload.schemas import FileUploadOutputQueueMessage, FileUploadRequest, FileUploadResponse, FileUploadResponses
+from file_upload.schemas import (
+    CompleteUploadRequest,
+    FileUploadFailure,
+    FileUploadOutputQueueMessage,
+    FileUploadRequest,
+    FileUploadResponse,
+    FileUploadResponses,
+    UploadUrl,
+    UploadUrlRequest,
+    UploadUrlResponse,
+)
+from file_processing.file_processing import EXTRACT_QUEUE
 from shared.blob_service import FilesBlobService
-from shared.models import FileMetadataDb
+from shared.models import FileMetadataDb, FileStage, ProcessingState
+from shared.natural_keys import file_id_for
 from shared.user_repository import UserRepository
+from user_files.user_files import get_user_id_from_claims
+
+# Upper bound on files uploaded concurrently within one request
+MAX_UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", 8))
+# Largest accepted file; uploads are aborted as soon as they exceed it
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE_MB", 20)) * 1024 * 1024
+# How long a direct upload URL stays valid
+UPLOAD_URL_TTL = timedelta(minutes=int(os.getenv("UPLOAD_URL_TTL_MINUTES", 15)))
+# Leading bytes of each file type accepted by direct uploads
+FILE_SIGNATURES = {
+    ".pdf": b"%PDF-",
+    ".docx": b"PK\x03\x04",
+}
 
 # create blueprint
 file_upload_bp = func.Blueprint()
@@ -26,9 +54,16 @@ def files_upload(req: func.HttpRequest) -> func.HttpResponse:
     cosmos_db_client = get_cosmos_db_client()
     files_repository = FilesRepository(cosmos_db_client)
     user_repository = UserRepository(cosmos_db_client)
-    return _files_upload(req, files_blob_service, files_repository, user_repository)
+    file_status_repository = FileStatusRepository(cosmos_db_client)
+    return _files_upload(req, files_blob_service, files_repository, user_repository, file_status_repository, _outbox_dispatcher(files_repository))
+
+
+def _outbox_dispatcher(files_repository: FilesRepository) -> OutboxDispatcher:
+    # the connection the queue triggers listen on
+    return OutboxDispatcher(files_repository, QueueService(connection_string=os.getenv("AzureWebJobsStorage")))
 
-def _files_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, files_repository: FilesRepository, user_repository: UserRepository) -> func.HttpResponse:
+
+def _files_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, files_repository: FilesRepository, user_repository: UserRepository, file_status_repository: FileStatusRepository = None, outbox_dispatcher: OutboxDispatcher = None) -> func.HttpResponse:
     try:
         # Log all headers for debugging
         logging.info("Request headers:")
@@ -116,7 +151,7 @@ def _files_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, f
                 mimetype="application/json"
             )
 
-        file_upload_responses = FileUploadResponses()
+        upload_requests: list[FileUploadRequest] = []
         # iterate over all files from the request
         files_list = req.files.get('content', [])
         if isinstance(files_list, dict):
@@ -136,7 +171,8 @@ def _files_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, f
                 # Handle each input_file
                 if hasattr(input_file, 'filename') and input_file.filename:
                     filename = input_file.filename
-                    content = input_file.read()
+                    # keep the file object: it is read block by block during upload
+                    content = input_file
                 elif isinstance(input_file, bytes):
                     # If the file is already bytes, try to get the filename from the original FileStorage
                     fs_obj = None
@@ -177,57 +213,58 @@ def _files_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, f
                     "filename": filename,
                     "content": content
                 }
-                file_upload_request = FileUploadRequest(**request_dict)
+                upload_requests.append(FileUploadRequest(**request_dict))
             except ValidationError as e:
                 return func.HttpResponse(
                     json.dumps("Invalid request: " + str(e)),
                     status_code=400,
                     mimetype="application/json"
                 )
-        
-            # upload file to blob storage
-            blob_url = files_blob_service.upload_blob(
-                container_name=files_blob_service.container_name,
-                filename=file_upload_request.filename, 
-                content=file_upload_request.content
+
+        # Reserve quota for the whole batch in one atomic operation
+        if not user_repository.reserve_files(user_id, len(upload_requests)):
+            return func.HttpResponse(
+                json.dumps("File upload limit reached"),
+                status_code=403,
+                mimetype="application/json"
             )
-            # Save file metadata to database
-            try:
-                file_metadata = FileMetadataDb(
-                    id=uuid4(),
-                    filename=file_upload_request.filename,
-                    type=file_upload_request.type,
-                    user_id=user_id,
-                    url=blob_url
-                )
-                file_metadata = files_repository.upsert_file(file_metadata.model_dump(mode="json"))
-                # Increment the user's file count after successful upload
-                user_repository.increment_files_count(user_id)
-            except ValidationError as e:
-                logging.error(f"Validation error creating file metadata: {str(e)}")
-                return func.HttpResponse(
-                    json.dumps({"error": "Internal Server Error", "details": str(e)}),
-                    status_code=500,
-                    mimetype="application/json"
-                )        
-            # send to queue 'processing-queue'
-            queue_service = QueueService(connection_string=os.getenv("AZURE_STORAGE_CONNECTION_STRING"))
-            queue_service.create_queue_if_not_exists("processing-queue")
-            file_upload_queue_message = FileUploadOutputQueueMessage(**file_metadata.model_dump())
-            msg = file_upload_queue_message.model_dump_json()
-            queue_service.send_message("processing-queue", msg)
-            
-            # Add response
+
+        # Upload blobs and write metadata for all files concurrently
+        file_upload_responses = FileUploadResponses()
+        uploaded: list[tuple[FileMetadataDb, bool]] = []
+        with ThreadPoolExecutor(max_workers=min(MAX_UPLOAD_CONCURRENCY, len(upload_requests))) as executor:
+            futures = [
+                executor.submit(_upload_file, request, files_blob_service, files_repository, file_status_repository, outbox_dispatcher)
+                for request in upload_requests
+            ]
+            for request, future in zip(upload_requests, futures):
+                try:
+                    uploaded.append(future.result())
+                except Exception as e:
+                    logging.error(f"Failed to upload {request.filename}: {str(e)}", exc_info=True)
+                    file_upload_responses.failed.append(FileUploadFailure(filename=request.filename, error=str(e)))
+        to_process = [file_metadata for file_metadata, needs_processing in uploaded if needs_processing]
+
+        # Give back the quota reserved for files that failed or did not change
+        released = len(upload_requests) - len(to_process)
+        if released:
+            user_repository.decrement_files_count(user_id, count=released)
+
+        for file_metadata, needs_processing in uploaded:
             file_upload_responses.files.append(FileUploadResponse(
-                filename=file_metadata.filename,
-                url=file_metadata.url,
-                type=file_metadata.type,
-                user_id=file_metadata.user_id
+                **file_metadata.model_dump(),
+                unchanged=not needs_processing
             ))
-        
+
+        if not uploaded:
+            status_code = 500
+        elif file_upload_responses.failed:
+            status_code = 207
+        else:
+            status_code = 200
         return func.HttpResponse(
             file_upload_responses.model_dump_json(),
-            status_code=200,
+            status_code=status_code,
             mimetype="application/json"
         )
     except Exception as e:
@@ -236,4 +273,258 @@ def _files_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, f
             json.dumps({"error": "Internal Server Error", "details": str(e)}),
             status_code=500,
             mimetype="application/json"
-        )
\ No newline at end of file
+        )
+
+
+def _upload_file(request: FileUploadRequest, files_blob_service: FilesBlobService, files_repository: FilesRepository, file_status_repository: FileStatusRepository = None, outbox_dispatcher: OutboxDispatcher = None) -> tuple[FileMetadataDb, bool]:
+    """Store one file under its content hash and save its metadata to the database.
+
+    Returns the file and whether it needs processing: re-uploading content that
+    is already processed under the same filename leaves everything as it is.
+    """
+    container_name = files_blob_service.container_name
+    sha256, size, content = files_blob_service.hash_content(request.content, max_size=MAX_UPLOAD_SIZE)
+    blob_name = files_blob_service.content_blob_name(request.user_id, sha256, request.filename)
+    file_id = file_id_for(request.user_id, request.filename)
+
+    existing = files_repository.get_file_by_id(request.user_id, file_id)
+    if _is_processed(existing, blob_name):
+        logging.info(f"{request.filename} is unchanged, skipping upload and processing")
+        return existing, False
+
+    # identical bytes are stored once per user
+    if files_blob_service.blob_exists(container_name, blob_name):
+        url = files_blob_service.get_blob_url(container_name, blob_name)
+    else:
+        url = files_blob_service.upload_blob_stream(
+            container_name=container_name,
+            filename=blob_name,
+            content=content,
+            max_size=MAX_UPLOAD_SIZE
+        ).url
+    file_metadata = FileMetadataDb(
+        id=file_id,
+        filename=request.filename,
+        type=request.type,
+        user_id=request.user_id,
+        url=url,
+        blob_name=blob_name,
+        size=size,
+        sha256=sha256,
+        processing_state=ProcessingState.UPLOADED
+    )
+    # before the extract message goes out, so the status cannot overwrite a later stage
+    _report_uploaded(file_status_repository, file_metadata)
+    file_metadata = _save_with_extract_message(files_repository, file_metadata, outbox_dispatcher)
+    if existing:
+        _release_replaced_blob(files_blob_service, files_repository, existing, blob_name)
+    return file_metadata, True
+
+
+def _report_uploaded(file_status_repository: FileStatusRepository, file_metadata: FileMetadataDb) -> None:
+    """Record the uploaded stage clients poll; a failed update never fails the upload."""
+    if not file_status_repository:
+        return
+    try:
+        file_status_repository.set_stage(file_metadata.user_id, file_metadata.id, FileStage.UPLOADED)
+    except Exception as e:
+        logging.warning(f"Could not update the status of file {file_metadata.id}: {str(e)}")
+
+
+def _save_with_extract_message(files_repository: FilesRepository, file_metadata: FileMetadataDb, outbox_dispatcher: OutboxDispatcher = None) -> FileMetadataDb:
+    """Save a file document carrying the extract-stage message in its outbox, then send the message.
+
+    The message is written with the document, so the upload and the message
+    are never separated. It is sent right away; when that fails the outbox
+    dispatcher sends it.
+    """
+    document = file_metadata.model_dump(mode="json")
+    document["outbox"] = [outbox_entry(EXTRACT_QUEUE, FileUploadOutputQueueMessage(**file_metadata.model_dump()))]
+    document["outbox_pending"] = True
+    saved = files_repository.upsert_file(document)
+    if outbox_dispatcher:
+        try:
+            # upsert_file set the id the document was saved under
+            outbox_dispatcher.dispatch([document])
+        except Exception as e:
+            logging.warning(f"Outbox of file {document['id']} left to the dispatcher: {str(e)}")
+    return saved
+
+
+def _is_processed(file_metadata: FileMetadataDb | None, blob_name: str) -> bool:
+    """Whether the file already holds this content and has been processed."""
+    return (
+        file_metadata is not None
+        and file_metadata.blob_name == blob_name
+        and file_metadata.is_processed()
+    )
+
+
+def _release_replaced_blob(files_blob_service: FilesBlobService, files_repository: FilesRepository, previous: FileMetadataDb, blob_name: str):
+    """Delete the content blob a file pointed to before, once no other file of the user uses it."""
+    if not previous.blob_name or previous.blob_name == blob_name:
+        return
+    try:
+        if files_repository.count_files_with_blob(previous.user_id, previous.blob_name) == 0:
+            files_blob_service.delete_blob(files_blob_service.container_name, previous.blob_name)
+    except Exception as e:
+        logging.warning(f"Could not release blob {previous.blob_name}: {str(e)}")
+
+
+def _json_response(body, status_code: int) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps(body),
+        status_code=status_code,
+        mimetype="application/json"
+    )
+
+
+def _direct_upload_blob_name(user_id: str, file_id, filename: str) -> str:
+    """Per-user staging blob a direct upload URL grants write access to; completing the upload moves it to its content address."""
+    return f"users/{user_id}/uploads/{file_id}{os.path.splitext(filename)[1].lower()}"
+
+
+@file_upload_bp.route(route="files/upload-url", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+def create_upload_urls(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('Create upload URLs function processed a request.')
+    files_blob_service = FilesBlobService()
+    user_repository = UserRepository(get_cosmos_db_client())
+    return _create_upload_urls(req, files_blob_service, user_repository)
+
+
+def _create_upload_urls(req: func.HttpRequest, files_blob_service: FilesBlobService, user_repository: UserRepository) -> func.HttpResponse:
+    """Return short-lived SAS URLs the client uploads the files to directly."""
+    try:
+        user_id = get_user_id_from_claims(req)
+        if not user_id:
+            return _json_response("Unauthorized - Missing user claims", 401)
+
+        try:
+            upload_request = UploadUrlRequest(**req.get_json())
+        except ValueError as e:
+            return _json_response("Invalid request: " + str(e), 400)
+
+        unsupported = [file.filename for file in upload_request.files
+                       if os.path.splitext(file.filename)[1].lower() not in FILE_SIGNATURES]
+        if unsupported:
+            return _json_response(f"Unsupported file type: {', '.join(unsupported)}", 400)
+
+        try:
+            if not user_repository.can_upload_file(user_id):
+                return _json_response("File upload limit reached", 403)
+        except ValueError as e:
+            return _json_response(f"User not found: {str(e)}", 404)
+
+        expires_at = datetime.now(UTC) + UPLOAD_URL_TTL
+        response = UploadUrlResponse()
+        for file in upload_request.files:
+            file_id = file_id_for(user_id, file.filename)
+            blob_name = _direct_upload_blob_name(user_id, file_id, file.filename)
+            response.uploads.append(UploadUrl(
+                id=file_id,
+                filename=file.filename,
+                type=file.type,
+                blob_name=blob_name,
+                upload_url=files_blob_service.generate_upload_url(files_blob_service.container_name, blob_name, expires_at),
+                expires_at=expires_at,
+                max_size=MAX_UPLOAD_SIZE
+            ))
+        return func.HttpResponse(response.model_dump_json(), status_code=200, mimetype="application/json")
+    except Exception as e:
+        logging.error(f"Unexpected error creating upload URLs: {str(e)}", exc_info=True)
+        return _json_response({"error": "Internal Server Error", "details": str(e)}, 500)
+
+
+@file_upload_bp.route(route="files/{file_id}/complete", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+def complete_upload(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('Complete upload function processed a request.')
+    files_blob_service = FilesBlobService()
+    cosmos_db_client = get_cosmos_db_client()
+    files_repository = FilesRepository(cosmos_db_client)
+    user_repository = UserRepository(cosmos_db_client)
+    file_status_repository = FileStatusRepository(cosmos_db_client)
+    return _complete_upload(req, files_blob_service, files_repository, user_repository, file_status_repository, _outbox_dispatcher(files_repository))
+
+
+def _validate_uploaded_blob(files_blob_service: FilesBlobService, blob_name: str, filename: str, size: int) -> tuple[str, int] | None:
+    """Return an error message and status code when the uploaded blob is not acceptable."""
+    if size == 0:
+        return "Uploaded file is empty", 400
+    if size > MAX_UPLOAD_SIZE:
+        return f"Uploaded file exceeds the maximum upload size of {MAX_UPLOAD_SIZE} bytes", 413
+    extension = os.path.splitext(filename)[1].lower()
+    signature = FILE_SIGNATURES[extension]
+    head = files_blob_service.read_blob_range(files_blob_service.container_name, blob_name, 0, len(signature))
+    if head != signature:
+        return f"Uploaded file content is not a valid {extension} file", 400
+    return None
+
+
+def _complete_upload(req: func.HttpRequest, files_blob_service: FilesBlobService, files_repository: FilesRepository, user_repository: UserRepository, file_status_repository: FileStatusRepository = None, outbox_dispatcher: OutboxDispatcher = None) -> func.HttpResponse:
+    """Validate a directly uploaded blob, record its metadata and queue it for processing."""
+    try:
+        user_id = get_user_id_from_claims(req)
+        if not user_id:
+            return _json_response("Unauthorized - Missing user claims", 401)
+
+        file_id = req.route_params.get('file_id')
+        try:
+            complete_request = CompleteUploadRequest(**req.get_json())
+        except ValueError as e:
+            return _json_response("Invalid request: " + str(e), 400)
+
+        # The id is derived from the filename, so a client can only complete its own uploads
+        if file_id != str(file_id_for(user_id, complete_request.filename)):
+            return _json_response("File ID does not match the filename", 400)
+        if os.path.splitext(complete_request.filename)[1].lower() not in FILE_SIGNATURES:
+            return _json_response(f"Unsupported file type: {complete_request.filename}", 400)
+
+        container_name = files_blob_service.container_name
+        blob_name = _direct_upload_blob_name(user_id, file_id, complete_request.filename)
+        size = files_blob_service.get_blob_size(container_name, blob_name)
+        if size is None:
+            return _json_response("Uploaded file not found", 404)
+
+        rejection = _validate_uploaded_blob(files_blob_service, blob_name, complete_request.filename, size)
+        sha256 = None
+        if not rejection:
+            sha256 = files_blob_service.hash_blob(container_name, blob_name)
+            if complete_request.sha256 and complete_request.sha256.lower() != sha256:
+                rejection = ("Uploaded file does not match the provided sha256", 400)
+        if rejection:
+            files_blob_service.delete_blob(container_name, blob_name)
+            return _json_response(rejection[0], rejection[1])
+
+        # Keep the upload under its content hash; unchanged content is not processed again
+        content_blob_name = files_blob_service.content_blob_name(user_id, sha256, complete_request.filename)
+        existing = files_repository.get_file_by_id(user_id, file_id)
+        if _is_processed(existing, content_blob_name):
+            files_blob_service.delete_blob(container_name, blob_name)
+            response = FileUploadResponse(**existing.model_dump(), unchanged=True)
+            return func.HttpResponse(response.model_dump_json(), status_code=200, mimetype="application/json")
+
+        if not user_repository.reserve_files(user_id, 1):
+            files_blob_service.delete_blob(container_name, blob_name)
+            return _json_response("File upload limit reached", 403)
+
+        file_metadata = FileMetadataDb(
+            id=file_id,
+            filename=complete_request.filename,
+            type=complete_request.type,
+            user_id=user_id,
+            url=files_blob_service.move_blob(container_name, blob_name, content_blob_name),
+            blob_name=content_blob_name,
+            size=size,
+            sha256=sha256,
+            processing_state=ProcessingState.UPLOADED
+        )
+        _report_uploaded(file_status_repository, file_metadata)
+        file_metadata = _save_with_extract_message(files_repository, file_metadata, outbox_dispatcher)
+        if existing:
+            _release_replaced_blob(files_blob_service, files_repository, existing, content_blob_name)
+
+        response = FileUploadResponse(**file_metadata.model_dump())
+        return func.HttpResponse(response.model_dump_json(), status_code=200, mimetype="application/json")
+    except Exception as e:
+        logging.error(f"Unexpected error completing upload: {str(e)}", exc_info=True)
+        return _json_response({"error": "Internal Server Error", "details": str(e)}, 500)
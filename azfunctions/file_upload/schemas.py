@@ -1,6 +1,8 @@
 from enum import Enum
+from datetime import datetime
+from typing import Any, Optional
 from uuid import UUID, uuid4
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class FileType(str, Enum):
@@ -13,18 +15,67 @@ class FileUploadBase(BaseModel):
     user_id: str
 
 class FileUploadRequest(FileUploadBase):
-    content: bytes
+    # bytes, or a binary file-like object that is streamed to storage in blocks
+    content: Any
+
+    @field_validator('content')
+    @classmethod
+    def validate_content(cls, content):
+        if not isinstance(content, bytes) and not callable(getattr(content, 'read', None)):
+            raise ValueError("content must be bytes or a readable binary stream")
+        return content
 
 class FileUploadResponse(FileUploadBase):
     id: UUID = Field(default_factory=uuid4)
     url: str
+    blob_name: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    # the same content was already uploaded and processed under this filename
+    unchanged: bool = False
     
     # class Config:
     #     from_attributes = True
         
         
+class FileUploadFailure(BaseModel):
+    filename: str
+    error: str
+
+
 class FileUploadResponses(BaseModel):
     files: list[FileUploadResponse] = []
+    failed: list[FileUploadFailure] = []
         
 class FileUploadOutputQueueMessage(FileUploadResponse):
     pass
+
+
+class UploadUrlRequestFile(BaseModel):
+    filename: str
+    type: FileType
+
+
+class UploadUrlRequest(BaseModel):
+    files: list[UploadUrlRequestFile] = Field(min_length=1)
+
+
+class UploadUrl(BaseModel):
+    id: UUID
+    filename: str
+    type: FileType
+    blob_name: str
+    upload_url: str
+    expires_at: datetime
+    max_size: int
+
+
+class UploadUrlResponse(BaseModel):
+    uploads: list[UploadUrl] = []
+
+
+class CompleteUploadRequest(BaseModel):
+    filename: str
+    type: FileType
+    # optional sha256 computed by the client; the stored blob must match it
+    sha256: Optional[str] = None
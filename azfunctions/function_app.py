@@ -12,11 +12,14 @@ sys.path.append(str(Path(__file__).parent))
 
 # Import all function modules to register their blueprints
 from file_upload.file_upload import file_upload_bp
-from file_processing.file_processing import file_processing_bp
+from file_processing.file_processing import CHANGE_FEED_TRIGGER, MATCHING_TRIGGER, file_processing_bp
 from matching.matching import matching_bp
+from matching.matching_feed import matching_feed_bp
 from user_files.user_files import user_files_bp
 from matching_results.matching_results import matching_results_bp
 from users.users import users_bp
+from sync.sync import sync_bp
+from outbox.outbox import COSMOS_DB_CONNECTION_SETTING, outbox_bp, outbox_feed_bp
 
 # Create the app with explicit function names
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
@@ -25,6 +28,14 @@ app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 app.register_functions(file_upload_bp)
 app.register_functions(file_processing_bp)
 app.register_functions(matching_bp)
+if MATCHING_TRIGGER == CHANGE_FEED_TRIGGER:
+    app.register_functions(matching_feed_bp)
 app.register_functions(user_files_bp)
 app.register_functions(matching_results_bp)
 app.register_functions(users_bp)
+app.register_functions(sync_bp)
+app.register_functions(outbox_bp)
+if os.getenv(COSMOS_DB_CONNECTION_SETTING):
+    app.register_functions(outbox_feed_bp)
+else:
+    logging.warning(f"{COSMOS_DB_CONNECTION_SETTING} is not set: outboxes not sent by their writer wait for the outbox sweep")
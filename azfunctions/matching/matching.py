@@ -4,10 +4,14 @@ from pydantic import ValidationError
 
 from shared.matching_results_repository import MatchingResultsRepository
 from shared.files_repository import FilesRepository
+from shared.file_status_repository import FileStatusRepository
+from shared.models import FileStage
 from shared.user_repository import UserRepository
 from shared.db_service import get_cosmos_db_client
+from shared.blob_service import FilesBlobService
+from shared.extraction_store import FileExtractionStore
 from shared.openai_service.openai_service import OpenAIService
-from matching.schemas import FileModel, FileType, MatchingRequestMessage, MatchingResultModel
+from matching.schemas import FileRef, FileType, MatchingRequestMessage, MatchingResultModel
 
 # create blueprint with Queue trigger
 matching_bp = func.Blueprint()
@@ -25,10 +29,12 @@ def match_resume(msg: func.QueueMessage):
     cosmos_db_client = get_cosmos_db_client()
     files_repository = FilesRepository(cosmos_db_client)
     user_repository = UserRepository(cosmos_db_client)
+    extraction_store = FileExtractionStore(FilesBlobService())
     
     file_metadata_db = files_repository.get_file_by_id(matching_request.user_id, matching_request.id)
     if not file_metadata_db:
         raise ValueError(f"File with id {matching_request.id} not found in db")
+    file_metadata_db = extraction_store.load(file_metadata_db)
     if not file_metadata_db.text:
         raise ValueError(f"File with id {matching_request.id} has no text. Was not processed yet?")
     # delete exising matching results for file with same user_id and file name
@@ -39,7 +45,9 @@ def match_resume(msg: func.QueueMessage):
     files_from_db = files_repository.get_files_from_db(file_metadata_db.user_id, search_files_type)
     # call openai api to compare skills file by file and store matching result in db
     
+    matched_count = 0
     for file_from_db in files_from_db:
+        file_from_db = extraction_store.load(file_from_db)
         # call openai api
         openai_service = OpenAIService()
         matching_result = openai_service.match_cv_and_jd(cv_text=file_metadata_db.text, jd_text=file_from_db.text)
@@ -51,8 +59,8 @@ def match_resume(msg: func.QueueMessage):
             jd = file_from_db
         matching_result_db = MatchingResultModel(
             user_id=file_metadata_db.user_id,
-            cv=FileModel(**cv.model_dump(mode="json")),
-            jd=FileModel(**jd.model_dump(mode="json")),
+            cv=FileRef(id=cv.id, sha256=cv.sha256),
+            jd=FileRef(id=jd.id, sha256=jd.sha256),
             jd_requirements=matching_result.jd_requirements.model_dump(mode="json"),
             candidate_capabilities=matching_result.candidate_capabilities.model_dump(mode="json"),
             cv_match=matching_result.cv_match.model_dump(mode="json"),
@@ -60,5 +68,12 @@ def match_resume(msg: func.QueueMessage):
         )
         # store result in db
         matching_results_repository.upsert_result(matching_result_db.model_dump(mode="json"))
-        # increment matching count for user
-        user_repository.increment_matching_count(file_metadata_db.user_id)
\ No newline at end of file
+        matched_count += 1
+    # charge the whole batch to the user's matching count in one operation
+    if matched_count:
+        user_repository.increment_matching_count(file_metadata_db.user_id, count=matched_count)
+    # let clients polling the file status know matching is done
+    try:
+        FileStatusRepository(cosmos_db_client).set_stage(file_metadata_db.user_id, file_metadata_db.id, FileStage.MATCHED)
+    except Exception as e:
+        logging.warning(f"Could not update the status of file {file_metadata_db.id}: {str(e)}")
@@ -0,0 +1,120 @@
+import os
+import logging
+import time
+from typing import Iterable, Mapping
+import azure.functions as func
+
+from file_processing.schemas import FileProcessingOutputQueueMessage
+from shared.db_service import get_cosmos_db_client
+from shared.files_repository import FilesRepository
+from shared.file_status_repository import FileStatusRepository
+from shared.models import FileStage, ProcessingState
+from shared.queue_service import QueueService
+
+# Most file changes delivered to one invocation
+MATCHING_FEED_BATCH_SIZE = int(os.getenv("MATCHING_FEED_BATCH_SIZE", 100))
+# NCRONTAB schedule (with seconds) of the sweep for files the change feed gave up on
+MATCHING_SWEEP_SCHEDULE = os.getenv("MATCHING_SWEEP_SCHEDULE", "0 */10 * * * *")
+# A file persisted this long ago without being queued is scheduled by the sweep;
+# longer than the feed's retries take, so the sweep does not race them
+MATCHING_SWEEP_AFTER_SECONDS = int(os.getenv("MATCHING_SWEEP_AFTER_SECONDS", 15 * 60))
+
+# create blueprint with Cosmos DB change feed and Timer triggers; registered by function_app
+# only when MATCHING_TRIGGER is "change_feed"
+matching_feed_bp = func.Blueprint()
+
+
+@matching_feed_bp.retry(strategy="exponential_backoff", max_retry_count="5",
+                        minimum_interval="00:00:05", maximum_interval="00:05:00")
+@matching_feed_bp.cosmos_db_trigger(arg_name="documents", connection="CosmosDbConnection",
+                                    database_name="%COSMOS_DB_NAME%", container_name="files",
+                                    lease_container_name="leases", lease_container_prefix="matching-",
+                                    create_lease_container_if_not_exists=True,
+                                    max_items_per_invocation=MATCHING_FEED_BATCH_SIZE)
+def schedule_matching(documents: func.DocumentList):
+    """Schedule matching for the files of a change-feed batch that reached the persisted state.
+
+    The change feed is read through leases, so the partitions of the files
+    container are spread over the running instances and each batch is
+    delivered to one of them.
+    """
+    logging.info(f"schedule_matching received {len(documents)} file changes")
+    cosmos_db_client = get_cosmos_db_client()
+    _schedule_matching(
+        documents,
+        FilesRepository(cosmos_db_client),
+        QueueService(connection_string=os.getenv("AzureWebJobsStorage")),
+        FileStatusRepository(cosmos_db_client)
+    )
+
+
+@matching_feed_bp.timer_trigger(arg_name="timer", schedule=MATCHING_SWEEP_SCHEDULE, use_monitor=False)
+def sweep_persisted_files(timer: func.TimerRequest):
+    """Schedule matching for files left in the persisted state.
+
+    Once its retries are used up, the change feed checkpoints past a failed
+    batch and never delivers those files again: this sweep picks them up.
+    """
+    cosmos_db_client = get_cosmos_db_client()
+    _sweep_persisted_files(
+        FilesRepository(cosmos_db_client),
+        QueueService(connection_string=os.getenv("AzureWebJobsStorage")),
+        FileStatusRepository(cosmos_db_client)
+    )
+
+
+def _sweep_persisted_files(
+    files_repository: FilesRepository,
+    queue_service: QueueService,
+    file_status_repository: FileStatusRepository = None
+) -> int:
+    """Schedule matching for files persisted more than MATCHING_SWEEP_AFTER_SECONDS ago. Returns their number."""
+    stuck = files_repository.get_files_stuck_in_state(
+        ProcessingState.PERSISTED, int(time.time()) - MATCHING_SWEEP_AFTER_SECONDS, MATCHING_FEED_BATCH_SIZE
+    )
+    if stuck:
+        logging.warning(f"{len(stuck)} files were left in the persisted state, scheduling their matching")
+    return _schedule_matching(stuck, files_repository, queue_service, file_status_repository)
+
+
+def _schedule_matching(
+    documents: Iterable[Mapping],
+    files_repository: FilesRepository,
+    queue_service: QueueService,
+    file_status_repository: FileStatusRepository = None
+) -> int:
+    """Send one matching message per persisted file, then mark the files queued.
+
+    Messages are sent before the state changes: if the invocation fails in
+    between, the retried batch sends them again, and matching a file twice
+    only rewrites the same results. Returns the number of files scheduled.
+    """
+    persisted = {}
+    for document in documents:
+        if document.get("processing_state") == ProcessingState.PERSISTED.value:
+            # a batch holds the latest version of each changed document
+            persisted[document["id"]] = document
+    if not persisted:
+        return 0
+
+    messages = [
+        FileProcessingOutputQueueMessage(file_id=document["id"], user_id=document["user_id"], type=document["type"]).model_dump_json()
+        for document in persisted.values()
+    ]
+    queue_service.create_queue_if_not_exists("matching-queue")
+    queue_service.send_messages("matching-queue", messages)
+
+    for document in persisted.values():
+        # the state change is itself a change: it comes back in a later batch as queued and is skipped
+        if not files_repository.advance_processing_state(
+            document["user_id"], document["id"], ProcessingState.PERSISTED, ProcessingState.QUEUED, sha256=document.get("sha256")
+        ):
+            logging.info(f"File {document['id']} left the persisted state meanwhile")
+            continue
+        if file_status_repository:
+            try:
+                file_status_repository.set_stage(document["user_id"], document["id"], FileStage.QUEUED)
+            except Exception as e:
+                logging.warning(f"Could not update the status of file {document['id']}: {str(e)}")
+    logging.info(f"{len(messages)} files queued for matching")
+    return len(messages)
@@ -2,8 +2,8 @@ from datetime import datetime
 from enum import Enum
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field, model_validator
-from typing import List
+from pydantic import AliasChoices, BaseModel, Field, model_validator
+from typing import List, Optional
 
 
 class FileType(str, Enum):
@@ -35,7 +35,11 @@ class MatchingRequestBase(MatchingBaseModel):
     url: str
     
 class MatchingRequestMessage(MatchingRequestBase):
-    pass
+    # file processing sends the file id as `file_id`; together with user_id
+    # (the partition key) it is enough to point-read the file
+    id: UUID = Field(validation_alias=AliasChoices("id", "file_id"))
+    filename: Optional[str] = None
+    url: Optional[str] = None
 
 class MatchingRequestModel(MatchingBaseModel):
     id: UUID
@@ -54,6 +58,13 @@ class FileModel(MatchingBaseModel):
     url: str
     text: str
     
+class FileRef(BaseModel):
+    """Reference from a matching result to a matched file: its id and the content version matched."""
+    id: UUID
+    # sha256 of the file content the result was computed from
+    sha256: Optional[str] = None
+
+
 class JD_Requirements(MatchingBaseModel):
     id: UUID = Field(default_factory=uuid4)
     skills: List[str]
@@ -79,8 +90,9 @@ class CV_Match(MatchingBaseModel):
 class MatchingResultModel(MatchingBaseModel):
     id: UUID = Field(default_factory=uuid4)
     user_id: str
-    cv: FileModel
-    jd: FileModel
+    # only references: file summaries are joined in when results are returned
+    cv: FileRef
+    jd: FileRef
     jd_requirements: JD_Requirements
     candidate_capabilities: Candidate_Capabilities
     cv_match: CV_Match
@@ -89,8 +101,8 @@ class MatchingResultModel(MatchingBaseModel):
     # function to create model from json by creating nested models first
     @classmethod
     def from_json(cls, json_data):
-        cv = FileModel(**json_data['cv'])
-        jd = FileModel(**json_data['jd'])
+        cv = FileRef(**json_data['cv'])
+        jd = FileRef(**json_data['jd'])
         jd_requirements = JD_Requirements(**json_data['JD_Requirements'])
         candidate_capabilities = Candidate_Capabilities(**json_data['Candidate_Capabilities'])
         cv_match = CV_Match(**json_data['cv_match'])
@@ -2,10 +2,14 @@ import logging
 import json
 import base64
 from azure import functions as func
+from pydantic import ValidationError
 
 from matching_results.models import MatchingResultsRequest, MatchingResultsResponse
 from shared.db_service import get_cosmos_db_client
+from shared.file_summary_cache import join_file_summaries
+from shared.files_repository import FilesRepository
 from shared.matching_results_repository import MatchingResultsRepository
+from shared.pagination import DEFAULT_PAGE_SIZE
 
 matching_results_bp = func.Blueprint("matching_results", __name__)
 
@@ -43,19 +47,46 @@ def get_matching_results(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Get file_id and file_type from request parameters
-        request = MatchingResultsRequest(
-            file_id=req.params.get('file_id'),
-            file_type=req.params.get('file_type')
-        )
+        try:
+            request = MatchingResultsRequest(
+                file_id=req.params.get('file_id'),
+                file_type=req.params.get('file_type'),
+                page_size=req.params.get('page_size'),
+                continuation=req.params.get('continuation')
+            )
+        except ValidationError as e:
+            return func.HttpResponse(
+                body=json.dumps({"error": str(e)}),
+                mimetype="application/json",
+                status_code=400
+            )
 
         cosmos_db_client = get_cosmos_db_client()
         matching_results_repository = MatchingResultsRepository(cosmos_db_client)
-        results_from_db = matching_results_repository.get_results_by_file_type_and_id(
-            user_id, 
-            request.file_id, 
-            request.file_type
-        )
-        response = MatchingResultsResponse.from_json(results_from_db)
+        continuation = None
+        if request.page_size or request.continuation:
+            try:
+                results_from_db, continuation = matching_results_repository.get_results_page_by_file_type_and_id(
+                    user_id,
+                    request.file_id,
+                    request.file_type,
+                    page_size=request.page_size or DEFAULT_PAGE_SIZE,
+                    continuation=request.continuation
+                )
+            except ValueError as e:
+                return func.HttpResponse(
+                    body=json.dumps({"error": str(e)}),
+                    mimetype="application/json",
+                    status_code=400
+                )
+        else:
+            results_from_db = matching_results_repository.get_results_by_file_type_and_id(
+                user_id, 
+                request.file_id, 
+                request.file_type
+            )
+        results_from_db = join_file_summaries(FilesRepository(cosmos_db_client), user_id, results_from_db)
+        response = MatchingResultsResponse.from_json(results_from_db, continuation)
         return func.HttpResponse(response.model_dump_json(), mimetype="application/json")
     except Exception as e:
         logging.error(f"Error getting matching results: {str(e)}")
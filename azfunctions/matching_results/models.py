@@ -7,6 +7,7 @@ from typing import Optional
 from pydantic import BaseModel, Field, model_validator
 from typing import List
 
+from shared.pagination import MAX_PAGE_SIZE
 
 
 class FileType(str, Enum):
@@ -16,6 +17,9 @@ class FileType(str, Enum):
 class MatchingResultsRequest(BaseModel):
     file_id: str
     file_type: FileType
+    # Pagination is opt-in: without page_size or continuation all results are returned
+    page_size: Optional[int] = Field(default=None, ge=1, le=MAX_PAGE_SIZE)
+    continuation: Optional[str] = None
     
 class MatchingBaseModel(BaseModel):
     pass
@@ -103,8 +107,9 @@ class MatchingResultModel(MatchingBaseModel):
 
 class MatchingResultsResponse(BaseModel):
     results: List[MatchingResultModel]
+    continuation: Optional[str] = None
 
     @classmethod
-    def from_json(cls, list_of_dict):
+    def from_json(cls, list_of_dict, continuation=None):
         results = [MatchingResultModel.from_json(result) for result in list_of_dict]
-        return cls(results=results)
\ No newline at end of file
+        return cls(results=results, continuation=continuation)
\ No newline at end of file
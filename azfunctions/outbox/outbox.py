@@ -0,0 +1,47 @@
+import os
+import logging
+import azure.functions as func
+
+from shared.db_service import get_cosmos_db_client
+from shared.files_repository import FilesRepository
+from shared.outbox import OUTBOX_DISPATCH_BATCH_SIZE, OutboxDispatcher
+from shared.queue_service import QueueService
+
+# NCRONTAB schedule (with seconds) of the sweep for outboxes the change feed did not send
+OUTBOX_DISPATCH_SCHEDULE = os.getenv("OUTBOX_DISPATCH_SCHEDULE", "0 */5 * * * *")
+
+# Setting holding the Cosmos DB connection string the change-feed trigger reads with
+COSMOS_DB_CONNECTION_SETTING = "CosmosDbConnection"
+
+# create blueprints with Timer trigger and Cosmos DB change feed trigger; function_app
+# registers the change feed one only when COSMOS_DB_CONNECTION_SETTING is set
+outbox_bp = func.Blueprint()
+outbox_feed_bp = func.Blueprint()
+
+
+def _dispatcher() -> OutboxDispatcher:
+    return OutboxDispatcher(
+        FilesRepository(get_cosmos_db_client()),
+        # the connection the queue triggers listen on
+        QueueService(connection_string=os.getenv("AzureWebJobsStorage"))
+    )
+
+
+@outbox_feed_bp.cosmos_db_trigger(arg_name="documents", connection=COSMOS_DB_CONNECTION_SETTING,
+                                  database_name="%COSMOS_DB_NAME%", container_name="files",
+                                  lease_container_name="leases", lease_container_prefix="outbox-",
+                                  create_lease_container_if_not_exists=True,
+                                  max_items_per_invocation=OUTBOX_DISPATCH_BATCH_SIZE)
+def dispatch_outbox_changes(documents: func.DocumentList):
+    """Send the outboxes of changed file documents that their writer did not send itself."""
+    dispatched = _dispatcher().dispatch_changes(documents)
+    if dispatched:
+        logging.info(f"Dispatched {dispatched} outbox messages from the change feed")
+
+
+@outbox_bp.timer_trigger(arg_name="timer", schedule=OUTBOX_DISPATCH_SCHEDULE, use_monitor=False)
+def dispatch_outbox(timer: func.TimerRequest):
+    """Send the queue messages still waiting in the outbox of file documents."""
+    dispatched = _dispatcher().drain()
+    if dispatched:
+        logging.info(f"Dispatched {dispatched} outbox messages")
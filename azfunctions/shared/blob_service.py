@@ -1,5 +1,47 @@
+import base64
+import hashlib
+import io
 import os
-from azure.storage.blob import BlobServiceClient
+import threading
+from datetime import datetime, timedelta, UTC
+from typing import BinaryIO, Dict, Optional, Set, Tuple, Union
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.storage.blob import BlobBlock, BlobSasPermissions, BlobServiceClient, generate_blob_sas
+from pydantic import BaseModel
+
+# Size of the blocks staged by upload_blob_stream
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+# Lifetime of the SAS token a server-side copy reads its source with
+COPY_SOURCE_TTL = timedelta(minutes=5)
+
+# Process-wide clients per connection string; the SDK clients are thread-safe
+# and keep their connection pool warm across invocations.
+_blob_service_clients: Dict[str, BlobServiceClient] = {}
+# (account, container) pairs this process has already created or seen
+_provisioned_containers: Set[Tuple[str, str]] = set()
+_lock = threading.Lock()
+
+
+def get_blob_service_client(connection_string) -> BlobServiceClient:
+    """Return the process-wide BlobServiceClient for a connection string."""
+    client = _blob_service_clients.get(connection_string)
+    if client is None:
+        with _lock:
+            client = _blob_service_clients.get(connection_string)
+            if client is None:
+                client = BlobServiceClient.from_connection_string(connection_string)
+                _blob_service_clients[connection_string] = client
+    return client
+
+
+class FileTooLargeError(ValueError):
+    pass
+
+
+class UploadedBlob(BaseModel):
+    url: str
+    size: int
+    sha256: str
 
 
 class FilesBlobService:
@@ -10,18 +52,163 @@ class FilesBlobService:
     def create_files_blob_service_client(self):
         # Azure Blob Storage info
         connect_str = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
-        blob_service_client = BlobServiceClient.from_connection_string(connect_str)
+        blob_service_client = get_blob_service_client(connect_str)
         return blob_service_client
 
+    def ensure_container(self, container_name):
+        """Create the container if needed; only the first call per process reaches the service."""
+        key = (self.blob_service_client.account_name, container_name)
+        if key in _provisioned_containers:
+            return
+        try:
+            self.blob_service_client.create_container(container_name)
+        except ResourceExistsError:
+            pass
+        _provisioned_containers.add(key)
+
     def upload_blob(self, container_name, filename, content):
         # create container if doesn't exist
-        container_client = self.blob_service_client.get_container_client(container_name)
-        if not container_client.exists():
-            container_client.create_container()
+        self.ensure_container(container_name)
         blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=filename)
-        blob_client.upload_blob(content, overwrite=True)
+        try:
+            blob_client.upload_blob(content, overwrite=True)
+        except ResourceNotFoundError:
+            # the container was removed since it was provisioned: create it again and retry once
+            _provisioned_containers.discard((self.blob_service_client.account_name, container_name))
+            self.ensure_container(container_name)
+            blob_client.upload_blob(content, overwrite=True)
         return blob_client.url
     
+    @staticmethod
+    def content_blob_name(user_id: str, sha256: str, filename: str) -> str:
+        """Content-addressed blob name: identical bytes of one user share one blob."""
+        return f"users/{user_id}/sha256/{sha256}{os.path.splitext(filename)[1].lower()}"
+
+    @staticmethod
+    def hash_content(
+        content: Union[bytes, BinaryIO],
+        max_size: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE
+    ) -> Tuple[str, int, Union[bytes, BinaryIO]]:
+        """Return the sha256, the size and a rewound copy of ``content`` to upload.
+
+        Streams are hashed block by block and rewound; streams that cannot seek
+        are buffered in memory first. Raises FileTooLargeError past max_size.
+        """
+        if isinstance(content, bytes):
+            if max_size is not None and len(content) > max_size:
+                raise FileTooLargeError(f"Content exceeds the maximum upload size of {max_size} bytes")
+            return hashlib.sha256(content).hexdigest(), len(content), content
+        if not callable(getattr(content, 'seek', None)):
+            content = io.BytesIO(content.read())
+        digest = hashlib.sha256()
+        size = 0
+        while chunk := content.read(block_size):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise FileTooLargeError(f"Content exceeds the maximum upload size of {max_size} bytes")
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest(), size, content
+
+    def upload_blob_stream(
+        self,
+        container_name,
+        filename,
+        content: Union[bytes, BinaryIO],
+        max_size: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE
+    ) -> UploadedBlob:
+        """Upload bytes or a binary stream block by block, hashing it on the way.
+
+        Only one block is held in memory at a time. Raises FileTooLargeError as
+        soon as more than max_size bytes have been read; blocks staged until
+        then are never committed.
+        """
+        if isinstance(content, bytes):
+            if max_size is not None and len(content) > max_size:
+                raise FileTooLargeError(f"{filename} exceeds the maximum upload size of {max_size} bytes")
+            content = io.BytesIO(content)
+        self.ensure_container(container_name)
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=filename)
+        digest = hashlib.sha256()
+        size = 0
+        block_list = []
+        while chunk := content.read(block_size):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise FileTooLargeError(f"{filename} exceeds the maximum upload size of {max_size} bytes")
+            digest.update(chunk)
+            block_id = base64.b64encode(f"{len(block_list):08d}".encode()).decode()
+            blob_client.stage_block(block_id=block_id, data=chunk)
+            block_list.append(BlobBlock(block_id=block_id))
+        blob_client.commit_block_list(block_list)
+        return UploadedBlob(url=blob_client.url, size=size, sha256=digest.hexdigest())
+
+    def generate_upload_url(self, container_name, blob_name, expires_on: datetime) -> str:
+        """Return a URL with a SAS token that only allows writing this one blob until expires_on."""
+        self.ensure_container(container_name)
+        sas_token = generate_blob_sas(
+            account_name=self.blob_service_client.account_name,
+            container_name=container_name,
+            blob_name=blob_name,
+            account_key=self.blob_service_client.credential.account_key,
+            permission=BlobSasPermissions(create=True, write=True),
+            expiry=expires_on
+        )
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        return f"{blob_client.url}?{sas_token}"
+
+    def generate_download_url(self, container_name, blob_name, expires_on: datetime, download_filename: Optional[str] = None) -> str:
+        """Return a URL with a read-only SAS token for this one blob, valid until expires_on."""
+        sas_token = generate_blob_sas(
+            account_name=self.blob_service_client.account_name,
+            container_name=container_name,
+            blob_name=blob_name,
+            account_key=self.blob_service_client.credential.account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=expires_on,
+            content_disposition=f'attachment; filename="{download_filename}"' if download_filename else None
+        )
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        return f"{blob_client.url}?{sas_token}"
+
+    def move_blob(self, container_name, source_blob, target_blob) -> str:
+        """Move a blob within the container with a server-side copy and return the target URL.
+
+        When the target already exists it is kept as is: the targets are
+        content-addressed, so an existing target already holds the same bytes.
+        """
+        target_client = self.blob_service_client.get_blob_client(container=container_name, blob=target_blob)
+        if not target_client.exists():
+            source_url = self.generate_download_url(container_name, source_blob, datetime.now(UTC) + COPY_SOURCE_TTL)
+            target_client.upload_blob_from_url(source_url, overwrite=True)
+        self.delete_blob(container_name, source_blob)
+        return target_client.url
+
+    def get_blob_url(self, container_name, blob_name) -> str:
+        return self.blob_service_client.get_blob_client(container=container_name, blob=blob_name).url
+
+    def get_blob_size(self, container_name, blob_name) -> Optional[int]:
+        """Size of a blob in bytes, or None when it does not exist."""
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        try:
+            return blob_client.get_blob_properties().size
+        except ResourceNotFoundError:
+            return None
+
+    def read_blob_range(self, container_name, blob_name, offset: int, length: int) -> bytes:
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        return blob_client.download_blob(offset=offset, length=length).readall()
+
+    def hash_blob(self, container_name, blob_name) -> str:
+        """sha256 of a blob, computed over its download chunks."""
+        blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        digest = hashlib.sha256()
+        for chunk in blob_client.download_blob().chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
     def delete_blob(self, container_name, filename):
         blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=filename)
         blob_client.delete_blob()
@@ -0,0 +1,97 @@
+import os
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from azure.cosmos import ContainerProxy
+from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosResourceNotFoundError
+
+# Most operations Cosmos DB accepts in one transactional batch
+MAX_BATCH_OPERATIONS = 100
+# Transactional batches run at the same time by one bulk delete
+BULK_DELETE_CONCURRENCY = int(os.getenv("BULK_DELETE_CONCURRENCY", 4))
+
+
+def log_progress(deleted: int, total: int) -> None:
+    logging.info(f"Bulk delete: {deleted}/{total} items deleted")
+
+
+class BulkDeleter:
+    """Deletes many documents of a container with transactional batches.
+
+    Only the id and the partition key of the matching documents are read.
+    Deletes are grouped per partition into batches of up to 100 operations,
+    and the batches run on a bounded thread pool. ``progress`` is called with
+    (deleted, total) after each batch.
+    """
+
+    def __init__(
+        self,
+        container: ContainerProxy,
+        partition_key_field: str = "user_id",
+        max_concurrency: int = BULK_DELETE_CONCURRENCY,
+        progress: Callable[[int, int], None] = log_progress
+    ):
+        self.container = container
+        self.partition_key_field = partition_key_field
+        self.max_concurrency = max_concurrency
+        self.progress = progress
+
+    def delete_where(self, condition: Optional[str] = None, parameters: Optional[list] = None, partition_key: Optional[str] = None) -> List[dict]:
+        """Delete the documents matching ``condition`` (all documents without one).
+
+        The query stays in ``partition_key`` when given. Returns the
+        {id, partition key} of the documents this call deleted, leaving out
+        those deleted by someone else meanwhile.
+        """
+        query = f"SELECT c.id, c.{self.partition_key_field} FROM c"
+        if condition:
+            query += f" WHERE {condition}"
+        if partition_key is not None:
+            items = self.container.query_items(query, parameters=parameters, partition_key=partition_key)
+        else:
+            items = self.container.query_items(query, parameters=parameters, enable_cross_partition_query=True)
+        return self._delete(list(items))
+
+    def delete_items(self, items: List[dict]) -> int:
+        """Delete documents given as {id, partition key}. Returns the number deleted."""
+        return len(self._delete(items))
+
+    def _delete(self, items: List[dict]) -> List[dict]:
+        by_partition: Dict[str, List[str]] = defaultdict(list)
+        for item in items:
+            by_partition[item[self.partition_key_field]].append(item["id"])
+        batches: List[Tuple[str, List[str]]] = [
+            (partition_key, ids[start:start + MAX_BATCH_OPERATIONS])
+            for partition_key, ids in by_partition.items()
+            for start in range(0, len(ids), MAX_BATCH_OPERATIONS)
+        ]
+        if not batches:
+            return []
+
+        deleted = []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = {executor.submit(self._delete_batch, partition_key, ids): partition_key for partition_key, ids in batches}
+            for future in as_completed(futures):
+                deleted += [{"id": item_id, self.partition_key_field: futures[future]} for item_id in future.result()]
+                if self.progress:
+                    self.progress(len(deleted), len(items))
+        return deleted
+
+    def _delete_batch(self, partition_key: str, ids: List[str]) -> List[str]:
+        """Delete one batch of a partition. Returns the ids deleted."""
+        try:
+            self.container.execute_item_batch([("delete", (item_id,)) for item_id in ids], partition_key=partition_key)
+            return ids
+        except CosmosBatchOperationError as e:
+            # A batch fails as a whole, e.g. when one item was deleted meanwhile:
+            # delete its items one by one, skipping those already gone
+            logging.warning(f"Batch delete in partition {partition_key} failed at operation {e.error_index}, deleting items one by one")
+            deleted = []
+            for item_id in ids:
+                try:
+                    self.container.delete_item(item=item_id, partition_key=partition_key)
+                    deleted.append(item_id)
+                except CosmosResourceNotFoundError:
+                    pass
+            return deleted
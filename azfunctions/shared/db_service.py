@@ -1,13 +1,56 @@
 import os
-from azure.cosmos import CosmosClient, PartitionKey
-
-def get_cosmos_db_client():
-    # read url and key from environment variables
-    url = os.environ.get("COSMOS_URL")
-    cosmos_key = os.environ.get("COSMOS_KEY")
-    db_name = os.environ.get("COSMOS_DB_NAME")
-    # create a CosmosClient
-    client = CosmosClient(url=url, credential=(cosmos_key))
-    # create db if not exists
-    client.create_database_if_not_exists(db_name)
-    return client.get_database_client(db_name)
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from azure.cosmos import ContainerProxy, CosmosClient, DatabaseProxy, PartitionKey
+
+# Process-wide Cosmos handles: the client keeps its connection pool warm
+# across invocations, so it is created once per worker and shared.
+_database: Optional[DatabaseProxy] = None
+_containers: Dict[Tuple[str, str], ContainerProxy] = {}
+_lock = threading.Lock()
+
+
+def _provisioning_enabled() -> bool:
+    """Containers are created on first use unless COSMOS_PROVISION_CONTAINERS is false."""
+    return os.environ.get("COSMOS_PROVISION_CONTAINERS", "true").lower() != "false"
+
+
+def get_cosmos_db_client() -> DatabaseProxy:
+    """Return the process-wide database proxy, creating the client on first use."""
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                # read url and key from environment variables
+                url = os.environ.get("COSMOS_URL")
+                cosmos_key = os.environ.get("COSMOS_KEY")
+                db_name = os.environ.get("COSMOS_DB_NAME")
+                # create a CosmosClient
+                client = CosmosClient(url=url, credential=(cosmos_key))
+                # create db if not exists
+                if _provisioning_enabled():
+                    client.create_database_if_not_exists(db_name)
+                _database = client.get_database_client(db_name)
+    return _database
+
+
+def get_container(database: DatabaseProxy, container_id: str, **container_options) -> ContainerProxy:
+    """Return a container proxy, provisioning the container only the first time this process uses it.
+
+    ``container_options`` (partition_key, unique_key_policy, ...) are passed to
+    ``create_container_if_not_exists``.
+    """
+    key = (database.id, container_id)
+    container = _containers.get(key)
+    if container is None:
+        with _lock:
+            container = _containers.get(key)
+            if container is None:
+                if _provisioning_enabled():
+                    logging.info(f"Provisioning Cosmos container {container_id}")
+                    container = database.create_container_if_not_exists(id=container_id, **container_options)
+                else:
+                    container = database.get_container_client(container_id)
+                _containers[key] = container
+    return container
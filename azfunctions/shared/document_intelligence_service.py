@@ -6,7 +6,8 @@ from azure.ai.formrecognizer import DocumentAnalysisClient
 from typing import Dict, List, Optional
 import logging
 
-from shared.models import DocumentPage, DocumentStyle, FileMetadataDb, TableCell, Line
+from shared.models import DocumentPage, FileMetadataDb, TableCell, Line
+from shared.style_table import StyleTable
 
 class DocumentIntelligenceService:
     def __init__(self, key, endpoint):
@@ -15,14 +16,15 @@ class DocumentIntelligenceService:
         self.credential = AzureKeyCredential(key=key)
         self.client = DocumentAnalysisClient(endpoint=endpoint, credential=self.credential)
         
-    def process_analysis_result(self, result) -> dict:
+    @staticmethod
+    def process_analysis_result(result) -> dict:
         try:
             logging.info("Processing Document Intelligence analysis result")
             
             # Initialize structured data containers
             pages = []
             tables = []
-            styles = {}
+            style_table = StyleTable()
             
             # Debug log the result object structure
             logging.info(f"Result object has {len(result.pages)} pages")
@@ -86,20 +88,20 @@ class DocumentIntelligenceService:
                                 logging.warning(f"Line in page {page.page_number} has no content attribute")
                                 continue
                                 
-                            line_info = Line(content=line.content)
-                            page_lines.append(line_info)
-                            
                             # Extract style information if available
+                            style_id = None
                             if hasattr(line, 'appearance'):
-                                style_name = f"style_{len(styles)}"
-                                styles[style_name] = DocumentStyle(
-                                    name=style_name,
-                                    font_name=line.appearance.style.font_family if hasattr(line.appearance.style, 'font_family') else None,
-                                    font_size=float(line.appearance.style.font_size) if hasattr(line.appearance.style, 'font_size') else None,
-                                    is_bold=line.appearance.style.is_bold if hasattr(line.appearance.style, 'is_bold') else None,
-                                    is_italic=line.appearance.style.is_italic if hasattr(line.appearance.style, 'is_italic') else None,
-                                    is_underline=line.appearance.style.is_underline if hasattr(line.appearance.style, 'is_underline') else None
+                                style = line.appearance.style
+                                style_id = style_table.intern(
+                                    font_name=style.font_family if hasattr(style, 'font_family') else None,
+                                    font_size=float(style.font_size) if hasattr(style, 'font_size') else None,
+                                    is_bold=style.is_bold if hasattr(style, 'is_bold') else None,
+                                    is_italic=style.is_italic if hasattr(style, 'is_italic') else None,
+                                    is_underline=style.is_underline if hasattr(style, 'is_underline') else None
                                 )
+
+                            line_info = Line(content=line.content, style=style_id)
+                            page_lines.append(line_info)
                         except Exception as e:
                             logging.error(f"Error processing line on page {page.page_number}: {str(e)}")
                             continue
@@ -128,13 +130,13 @@ class DocumentIntelligenceService:
                 'pages': pages,
                 'paragraphs': paragraphs,
                 'tables': tables,
-                'styles': styles,
+                'styles': style_table.styles,
                 'headers': None,  # PDF doesn't have explicit headers/footers
                 'footers': None,
                 'languages': result.languages if hasattr(result, 'languages') else None
             }
             
-            logging.info(f"Document processing completed. Extracted {len(pages)} pages, {len(paragraphs)} paragraphs, {len(tables)} tables, and {len(styles)} styles")
+            logging.info(f"Document processing completed. Extracted {len(pages)} pages, {len(paragraphs)} paragraphs, {len(tables)} tables, and {len(style_table)} distinct styles")
             
             return structured_info
             
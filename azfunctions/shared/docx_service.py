@@ -2,38 +2,45 @@ import io
 from docx import Document
 from typing import Dict, List, Optional
 
-from shared.models import DocumentPage, DocumentStyle, Line, TableCell
+from shared.models import DocumentPage, Line, TableCell
+from shared.style_table import StyleTable
 
 
 class DocxService:
+    @staticmethod
+    def _intern_style(style_table: StyleTable, style) -> Optional[str]:
+        """Intern the font attributes of a paragraph style and return its style ID."""
+        font = style.font if style is not None and hasattr(style, 'font') else None
+        if not font:
+            return None
+        return style_table.intern(
+            font_name=font.name,
+            font_size=float(font.size.pt) if font.size else None,
+            is_bold=font.bold,
+            is_italic=font.italic,
+            is_underline=bool(font.underline) if font.underline is not None else None
+        )
+
     @staticmethod
     def get_text_from_docx(document_content) -> dict:
         doc = Document(io.BytesIO(document_content))
         full_text = []
+        lines = []
         paragraphs = []
         tables = []
-        styles = {}
+        style_table = StyleTable()
         headers = []
         footers = []
         pages = []  # Note: python-docx doesn't provide direct page information
         
-        # Extract styles
-        for style in doc.styles:
-            if hasattr(style, 'name') and style.name:
-                font = style.font if hasattr(style, 'font') else None
-                styles[style.name] = DocumentStyle(
-                    name=style.name,
-                    font_name=font.name if font and hasattr(font, 'name') else None,
-                    font_size=float(font.size.pt) if font and hasattr(font, 'size') and font.size else None,
-                    is_bold=font.bold if font and hasattr(font, 'bold') else None,
-                    is_italic=font.italic if font and hasattr(font, 'italic') else None,
-                    is_underline=font.underline if font and hasattr(font, 'underline') else None
-                )
+        def add_line(text, style=None):
+            full_text.append(text)
+            lines.append(Line(content=text, style=DocxService._intern_style(style_table, style)))
         
-        # Extract paragraphs
+        # Extract paragraphs, referencing only the styles actually in use
         for para in doc.paragraphs:
             if para.text.strip():
-                full_text.append(para.text)
+                add_line(para.text, para.style)
                 paragraphs.append(para.text)
         
         # Extract tables
@@ -43,7 +50,7 @@ class DocxService:
                 row_data = []
                 for cell in row.cells:
                     row_data.append(TableCell(text=cell.text))
-                    full_text.append(cell.text)
+                    add_line(cell.text)
                 table_data.append(row_data)
             tables.append(table_data)
         
@@ -52,7 +59,7 @@ class DocxService:
             if shape.text_frame:
                 for paragraph in shape.text_frame.paragraphs:
                     if paragraph.text.strip():
-                        full_text.append(paragraph.text)
+                        add_line(paragraph.text)
                         paragraphs.append(paragraph.text)
         
         if hasattr(doc, 'shapes'):
@@ -60,7 +67,7 @@ class DocxService:
                 if shape.has_text_frame:
                     for paragraph in shape.text_frame.paragraphs:
                         if paragraph.text.strip():
-                            full_text.append(paragraph.text)
+                            add_line(paragraph.text)
                             paragraphs.append(paragraph.text)
         
         # Extract headers and footers from sections
@@ -70,20 +77,20 @@ class DocxService:
                     header_text = paragraph.text.strip()
                     if header_text:
                         headers.append(header_text)
-                        full_text.append(header_text)
+                        add_line(header_text, paragraph.style)
             
             if section.footer:
                 for paragraph in section.footer.paragraphs:
                     footer_text = paragraph.text.strip()
                     if footer_text:
                         footers.append(footer_text)
-                        full_text.append(footer_text)
+                        add_line(footer_text, paragraph.style)
         
         # Create a single page since python-docx doesn't provide page information
         pages.append(DocumentPage(
             page_number=1,
             content='\n'.join(full_text),
-            lines=[Line(content=text) for text in full_text],
+            lines=lines,
             tables=tables
         ))
         
@@ -93,7 +100,7 @@ class DocxService:
             'pages': pages,
             'paragraphs': paragraphs,
             'tables': tables,
-            'styles': styles,
+            'styles': style_table.styles,
             'headers': headers,
             'footers': footers
         }
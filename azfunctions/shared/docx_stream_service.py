@@ -0,0 +1,345 @@
+import io
+import posixpath
+import zipfile
+from typing import Dict, List, Optional
+
+from lxml import etree
+
+from shared.models import DocumentPage, Line, TableCell
+from shared.style_table import StyleTable
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+W_BODY = _w("body")
+W_P = _w("p")
+W_R = _w("r")
+W_HYPERLINK = _w("hyperlink")
+W_TBL = _w("tbl")
+W_TBL_GRID = _w("tblGrid")
+W_GRID_COL = _w("gridCol")
+W_TR = _w("tr")
+W_TC = _w("tc")
+W_TC_PR = _w("tcPr")
+W_GRID_SPAN = _w("gridSpan")
+W_V_MERGE = _w("vMerge")
+W_P_PR = _w("pPr")
+W_P_STYLE = _w("pStyle")
+W_SECT_PR = _w("sectPr")
+W_HEADER_REFERENCE = _w("headerReference")
+W_FOOTER_REFERENCE = _w("footerReference")
+W_STYLE = _w("style")
+W_R_PR = _w("rPr")
+W_R_FONTS = _w("rFonts")
+W_VAL = _w("val")
+
+# Run inner-content elements and their text equivalents, as python-docx renders them
+_RUN_TEXT = {
+    _w("t"): None,  # element text
+    _w("tab"): "\t",
+    _w("ptab"): "\t",
+    _w("cr"): "\n",
+    _w("noBreakHyphen"): "-",
+    _w("br"): None,  # depends on break type
+}
+
+_OFF_VALUES = ("0", "false", "off")
+
+
+class DocxStreamService:
+    """DOCX text extractor that stream-parses the package XML parts with lxml.
+
+    Produces the same ``structured_info`` dict as ``DocxService.get_text_from_docx``
+    without building the python-docx object model. Only ``word/document.xml``,
+    ``styles.xml`` and the referenced headers/footers are read; images and other
+    parts of the package are never loaded.
+    """
+
+    @staticmethod
+    def get_text_from_docx(document_content) -> dict:
+        with zipfile.ZipFile(io.BytesIO(document_content)) as package:
+            document_part = DocxStreamService._main_document_part(package)
+            relationships = DocxStreamService._read_relationships(package, document_part)
+            styles_part = next(
+                (target for rel_type, target in relationships.values() if rel_type.endswith("/styles")),
+                None
+            )
+            paragraph_styles, default_style = DocxStreamService._read_styles(package, styles_part)
+
+            style_table = StyleTable()
+
+            def style_id_for(style_name: Optional[str]) -> Optional[str]:
+                attributes = paragraph_styles.get(style_name) if style_name else None
+                if attributes is None:
+                    attributes = paragraph_styles.get(default_style)
+                return style_table.intern(**attributes) if attributes else None
+
+            paragraph_lines: List[Line] = []
+            paragraphs: List[str] = []
+            table_lines: List[Line] = []
+            tables = []
+            sections = []
+
+            with package.open(document_part) as stream:
+                for _, elem in etree.iterparse(stream, events=("end",), tag=(W_P, W_TBL, W_SECT_PR)):
+                    parent = elem.getparent()
+                    if elem.tag == W_SECT_PR:
+                        if DocxStreamService._is_section_properties(elem):
+                            sections.append(DocxStreamService._section_references(elem))
+                        continue
+                    if parent is None or parent.tag != W_BODY:
+                        # Paragraphs and tables nested in cells are handled with their table
+                        continue
+
+                    if elem.tag == W_P:
+                        text = DocxStreamService._paragraph_text(elem)
+                        if text.strip():
+                            paragraph_lines.append(Line(content=text, style=style_id_for(DocxStreamService._paragraph_style(elem))))
+                            paragraphs.append(text)
+                    else:
+                        table_data = DocxStreamService._table_cells(elem)
+                        for row in table_data:
+                            for cell in row:
+                                table_lines.append(Line(content=cell.text))
+                        tables.append(table_data)
+
+                    # Drop processed body content so memory stays bounded by the largest block
+                    elem.clear(keep_tail=True)
+                    while elem.getprevious() is not None:
+                        del parent[0]
+
+            headers, header_lines = DocxStreamService._read_header_footer_text(
+                package, relationships, [refs["header"] for refs in sections], style_id_for
+            )
+            footers, footer_lines = DocxStreamService._read_header_footer_text(
+                package, relationships, [refs["footer"] for refs in sections], style_id_for
+            )
+
+        # Keep the python-docx extractor's ordering: paragraphs, table cells, headers, footers
+        lines = paragraph_lines + table_lines
+        for header_line, footer_line in zip(header_lines, footer_lines):
+            lines.extend(header_line)
+            lines.extend(footer_line)
+        full_text = '\n'.join(line.content for line in lines)
+
+        return {
+            'text': full_text,
+            'pages': [DocumentPage(
+                page_number=1,
+                content=full_text,
+                lines=lines,
+                tables=tables
+            )],
+            'paragraphs': paragraphs,
+            'tables': tables,
+            'styles': style_table.styles,
+            'headers': headers,
+            'footers': footers
+        }
+
+    @staticmethod
+    def _main_document_part(package: zipfile.ZipFile) -> str:
+        try:
+            root = etree.fromstring(package.read("_rels/.rels"))
+        except KeyError:
+            return "word/document.xml"
+        for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+            if rel.get("Type") == OFFICE_DOCUMENT_REL:
+                return rel.get("Target").lstrip("/")
+        return "word/document.xml"
+
+    @staticmethod
+    def _read_relationships(package: zipfile.ZipFile, part_name: str) -> Dict[str, tuple]:
+        """Map relationship IDs of a part to (type, part name) pairs."""
+        base_dir, filename = posixpath.split(part_name)
+        rels_name = posixpath.join(base_dir, "_rels", f"{filename}.rels")
+        try:
+            root = etree.fromstring(package.read(rels_name))
+        except KeyError:
+            return {}
+        relationships = {}
+        for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = rel.get("Target")
+            if target.startswith("/"):
+                target = target.lstrip("/")
+            else:
+                target = posixpath.normpath(posixpath.join(base_dir, target))
+            relationships[rel.get("Id")] = (rel.get("Type"), target)
+        return relationships
+
+    @staticmethod
+    def _read_styles(package: zipfile.ZipFile, styles_part: Optional[str]):
+        """Read the font attributes each paragraph style defines directly, and the default style ID."""
+        paragraph_styles: Dict[str, dict] = {}
+        default_style = None
+        if not styles_part:
+            return paragraph_styles, default_style
+        try:
+            stream = package.open(styles_part)
+        except KeyError:
+            return paragraph_styles, default_style
+
+        with stream:
+            for _, style in etree.iterparse(stream, events=("end",), tag=W_STYLE):
+                if style.get(_w("type")) == "paragraph":
+                    style_id = style.get(_w("styleId"))
+                    paragraph_styles[style_id] = DocxStreamService._font_attributes(style.find(W_R_PR))
+                    if style.get(_w("default")) in ("1", "true", "on"):
+                        default_style = style_id
+                style.clear(keep_tail=True)
+        return paragraph_styles, default_style
+
+    @staticmethod
+    def _font_attributes(r_pr) -> dict:
+        if r_pr is None:
+            return {}
+
+        def on_off(tag: str) -> Optional[bool]:
+            element = r_pr.find(_w(tag))
+            if element is None:
+                return None
+            return element.get(W_VAL) not in _OFF_VALUES
+
+        r_fonts = r_pr.find(W_R_FONTS)
+        size = r_pr.find(_w("sz"))
+        underline = r_pr.find(_w("u"))
+        return {
+            'font_name': r_fonts.get(_w("ascii")) if r_fonts is not None else None,
+            'font_size': int(size.get(W_VAL)) / 2 if size is not None and size.get(W_VAL) else None,
+            'is_bold': on_off("b"),
+            'is_italic': on_off("i"),
+            'is_underline': underline.get(W_VAL) != "none" if underline is not None else None
+        }
+
+    @staticmethod
+    def _is_section_properties(sect_pr) -> bool:
+        """True for the body's section properties, not revision-tracking copies."""
+        parent = sect_pr.getparent()
+        if parent is None:
+            return False
+        if parent.tag == W_BODY:
+            return True
+        paragraph = parent.getparent() if parent.tag == W_P_PR else None
+        return paragraph is not None and paragraph.tag == W_P and paragraph.getparent() is not None \
+            and paragraph.getparent().tag == W_BODY
+
+    @staticmethod
+    def _section_references(sect_pr) -> dict:
+        references = {"header": None, "footer": None}
+        for tag, key in ((W_HEADER_REFERENCE, "header"), (W_FOOTER_REFERENCE, "footer")):
+            for reference in sect_pr.iterfind(tag):
+                if reference.get(_w("type"), "default") == "default":
+                    references[key] = reference.get(f"{{{R_NS}}}id")
+        return references
+
+    @staticmethod
+    def _read_header_footer_text(package, relationships, section_rel_ids, style_id_for):
+        """Return the stripped paragraph texts and lines of each section's default header or footer.
+
+        Like python-docx, a section without its own definition inherits the previous one.
+        """
+        texts = []
+        lines_per_section = []
+        parsed: Dict[str, List[tuple]] = {}
+        current = None
+        for rel_id in section_rel_ids:
+            if rel_id and rel_id in relationships:
+                current = relationships[rel_id][1]
+            section_lines = []
+            if current:
+                if current not in parsed:
+                    parsed[current] = DocxStreamService._read_story_paragraphs(package, current)
+                for text, style_name in parsed[current]:
+                    texts.append(text)
+                    section_lines.append(Line(content=text, style=style_id_for(style_name)))
+            lines_per_section.append(section_lines)
+        return texts, lines_per_section
+
+    @staticmethod
+    def _read_story_paragraphs(package: zipfile.ZipFile, part_name: str) -> List[tuple]:
+        paragraphs = []
+        try:
+            stream = package.open(part_name)
+        except KeyError:
+            return paragraphs
+        with stream:
+            for _, elem in etree.iterparse(stream, events=("end",), tag=W_P):
+                parent = elem.getparent()
+                if parent is not None and parent.getparent() is None:
+                    text = DocxStreamService._paragraph_text(elem).strip()
+                    if text:
+                        paragraphs.append((text, DocxStreamService._paragraph_style(elem)))
+                    elem.clear(keep_tail=True)
+        return paragraphs
+
+    @staticmethod
+    def _paragraph_style(paragraph) -> Optional[str]:
+        p_pr = paragraph.find(W_P_PR)
+        if p_pr is None:
+            return None
+        p_style = p_pr.find(W_P_STYLE)
+        return p_style.get(W_VAL) if p_style is not None else None
+
+    @staticmethod
+    def _paragraph_text(paragraph) -> str:
+        parts = []
+        for child in paragraph:
+            if child.tag == W_R:
+                DocxStreamService._append_run_text(child, parts)
+            elif child.tag == W_HYPERLINK:
+                for run in child.iterfind(W_R):
+                    DocxStreamService._append_run_text(run, parts)
+        return "".join(parts)
+
+    @staticmethod
+    def _append_run_text(run, parts: List[str]) -> None:
+        for child in run:
+            if child.tag not in _RUN_TEXT:
+                continue
+            text = _RUN_TEXT[child.tag]
+            if text is not None:
+                parts.append(text)
+            elif child.tag == _w("t"):
+                parts.append(child.text or "")
+            elif child.get(_w("type"), "textWrapping") == "textWrapping":
+                parts.append("\n")
+
+    @staticmethod
+    def _table_cells(table) -> List[List[TableCell]]:
+        """Lay out table cells on the grid the way python-docx ``row.cells`` does,
+        repeating horizontally and vertically merged cells."""
+        grid = table.find(W_TBL_GRID)
+        column_count = len(grid.findall(W_GRID_COL)) if grid is not None else 0
+        cells: List[TableCell] = []
+        rows: List[List[TableCell]] = []
+        for row in table.iterfind(W_TR):
+            row_start = len(cells)
+            for tc in row.iterfind(W_TC):
+                tc_pr = tc.find(W_TC_PR)
+                grid_span, v_merge = 1, None
+                if tc_pr is not None:
+                    span = tc_pr.find(W_GRID_SPAN)
+                    if span is not None:
+                        grid_span = int(span.get(W_VAL, 1))
+                    merge = tc_pr.find(W_V_MERGE)
+                    if merge is not None:
+                        v_merge = merge.get(W_VAL, "continue")
+                for span_index in range(grid_span):
+                    if v_merge == "continue" and column_count and len(cells) >= column_count:
+                        cells.append(cells[-column_count])
+                    elif span_index > 0:
+                        cells.append(cells[-1])
+                    else:
+                        text = "\n".join(DocxStreamService._paragraph_text(p) for p in tc.iterfind(W_P))
+                        cells.append(TableCell(text=text))
+            rows.append(cells[row_start:])
+        return rows
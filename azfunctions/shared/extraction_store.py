@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import logging
+
+from shared.blob_service import FilesBlobService
+from shared.models import EXTRACTION_FIELDS, FileExtraction, FileMetadataDb
+
+
+class FileExtractionStore:
+    """Stores the heavy extraction payload of a file as a gzipped JSON blob.
+
+    The Cosmos file document keeps only slim metadata plus ``extraction_blob``
+    and ``extraction_hash``; consumers that need text, pages or the document
+    analysis call ``load`` to fetch the sidecar lazily.
+    """
+
+    container_name = "resume-match-pro-extractions"
+
+    def __init__(self, blob_service: FilesBlobService):
+        self.blob_service = blob_service
+
+    @staticmethod
+    def blob_name(user_id: str, file_id) -> str:
+        return f"{user_id}/{file_id}.json.gz"
+
+    def save(self, file: FileMetadataDb) -> FileMetadataDb:
+        """Upload the extraction fields of ``file`` and return the slim document to persist."""
+        extraction = FileExtraction(**file.model_dump(include=EXTRACTION_FIELDS))
+        payload = extraction.model_dump_json(exclude_none=True).encode('utf-8')
+        blob_name = self.blob_name(file.user_id, file.id)
+        self.blob_service.upload_blob(
+            container_name=self.container_name,
+            filename=blob_name,
+            content=gzip.compress(payload)
+        )
+        logging.info(f"Stored extraction for file {file.id} ({len(payload)} bytes uncompressed) in {blob_name}")
+        slim = file.model_copy(update={field: None for field in EXTRACTION_FIELDS})
+        slim.extraction_blob = blob_name
+        slim.extraction_hash = hashlib.sha256(payload).hexdigest()
+        return slim
+
+    def load(self, file: FileMetadataDb) -> FileMetadataDb:
+        """Return ``file`` with its extraction fields populated from the sidecar.
+
+        Documents written before the split keep their fields inline and are returned unchanged.
+        """
+        if not file.extraction_blob:
+            return file
+        payload = gzip.decompress(self.blob_service.get_file_content(
+            container_name=self.container_name,
+            filename=file.extraction_blob
+        ))
+        if file.extraction_hash and hashlib.sha256(payload).hexdigest() != file.extraction_hash:
+            raise ValueError(f"Extraction sidecar {file.extraction_blob} does not match the hash of file {file.id}")
+        extraction = FileExtraction.model_validate_json(payload)
+        return file.model_copy(update=dict(extraction))
+
+    def delete(self, file: FileMetadataDb) -> None:
+        if not file.extraction_blob:
+            return
+        try:
+            self.blob_service.delete_blob(container_name=self.container_name, filename=file.extraction_blob)
+        except Exception as e:
+            logging.warning(f"Could not delete extraction sidecar {file.extraction_blob}: {str(e)}")
@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime, UTC
+from typing import List, Optional, Tuple
+from uuid import UUID
+from azure.cosmos import DatabaseProxy, PartitionKey
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+import shared.db_service as db_service
+from shared.models import STAGE_PROGRESS, FileStage, FileStatusDb
+
+# Upper bound on the changes returned by one get_changes call
+MAX_CHANGES = 100
+
+
+def _etag_digest(etag: str) -> str:
+    return hashlib.sha1(etag.encode()).hexdigest()[:8]
+
+
+def _encode_cursor(ts: int, seen: List[str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"ts": ts, "seen": seen}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, List[str]]:
+    """Split a change cursor into its ``_ts`` and the digests of the versions seen at that second.
+
+    Raises ValueError for a cursor this repository did not issue.
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(decoded["ts"]), [str(digest) for digest in decoded["seen"]]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid status cursor: {cursor}") from e
+
+
+def status_timestamp() -> str:
+    """Current UTC time with a fixed width, so timestamps compare correctly as strings."""
+    return datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class FileStatusRepository:
+    """Per-file status records (stage, progress, error), one small document per file.
+
+    Clients poll these instead of the file documents: a status read is a
+    point read of a document well under 1 KB.
+    """
+
+    def __init__(self, db_client: DatabaseProxy):
+        self.container = db_service.get_container(
+            db_client,
+            "file-status",
+            partition_key=PartitionKey(path="/user_id")
+        )
+
+    def set_stage(self, user_id: str, file_id: str | UUID, stage: FileStage) -> FileStatusDb:
+        """Record that a file reached a stage, clearing any previous error."""
+        status = FileStatusDb(
+            id=file_id,
+            user_id=user_id,
+            stage=stage,
+            progress=STAGE_PROGRESS[stage],
+            updated_at=status_timestamp()
+        )
+        self.container.upsert_item(status.model_dump(mode="json"))
+        return status
+
+    def set_error(self, user_id: str, file_id: str | UUID, error: str) -> None:
+        """Record the error of the current stage, keeping the stage and progress."""
+        try:
+            self.container.patch_item(
+                item=str(file_id),
+                partition_key=user_id,
+                patch_operations=[
+                    {"op": "set", "path": "/error", "value": error},
+                    {"op": "set", "path": "/updated_at", "value": status_timestamp()}
+                ]
+            )
+        except CosmosResourceNotFoundError:
+            logging.warning(f"No status record for file {file_id} to report error: {error}")
+
+    def get_status(self, user_id: str, file_id: str | UUID) -> Optional[FileStatusDb]:
+        try:
+            return FileStatusDb(**self.container.read_item(item=str(file_id), partition_key=user_id))
+        except CosmosResourceNotFoundError:
+            return None
+
+    def get_changes(self, user_id: str, cursor: Optional[str] = None) -> Tuple[List[FileStatusDb], Optional[str]]:
+        """Statuses of the user's files changed after ``cursor``, oldest first, and the cursor to pass next.
+
+        Changes are ordered by the server-assigned ``_ts``, so clocks of the
+        instances that wrote them do not matter. ``_ts`` has one-second
+        resolution and a write can commit in the second the previous read
+        ended in, so the cursor re-reads its last second and skips the
+        versions (by ``_etag``) it already returned.
+        """
+        since, seen = _decode_cursor(cursor) if cursor else (None, [])
+        query = f"SELECT TOP {MAX_CHANGES + len(seen)} * FROM c WHERE c.user_id = @user_id"
+        parameters = [{"name": "@user_id", "value": user_id}]
+        if since is not None:
+            query += " AND c._ts >= @since"
+            parameters.append({"name": "@since", "value": since})
+        query += " ORDER BY c._ts"
+        items = self.container.query_items(query, parameters=parameters, partition_key=user_id)
+        seen_set = set(seen)
+        changes = [
+            status for status in (FileStatusDb(**item) for item in items)
+            if not (status.ts == since and _etag_digest(status.etag) in seen_set)
+        ][:MAX_CHANGES]
+        if not changes:
+            return changes, cursor
+
+        last_ts = changes[-1].ts
+        last_seen = [_etag_digest(status.etag) for status in changes if status.ts == last_ts]
+        if last_ts == since:
+            last_seen = seen + last_seen
+        return changes, _encode_cursor(last_ts, last_seen)
+
+    def delete_status(self, user_id: str, file_id: str | UUID) -> None:
+        try:
+            self.container.delete_item(item=str(file_id), partition_key=user_id)
+        except CosmosResourceNotFoundError:
+            pass
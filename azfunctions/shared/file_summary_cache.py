@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from shared.models import FileSummaryDb
+
+# How long a file summary is served from memory; writes through this worker drop it sooner
+FILE_SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("FILE_SUMMARY_CACHE_TTL_SECONDS", 60))
+FILE_SUMMARY_CACHE_MAX_ENTRIES = 10000
+
+# Process-wide cache of file summaries by (user_id, file_id), least recently used first
+_summaries: "OrderedDict[Tuple[str, str], Tuple[float, FileSummaryDb]]" = OrderedDict()
+# Bumped by every invalidation: a read that overlapped one may hold a replaced summary and is not cached
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_file_summaries(files_repository, user_id: str, file_ids: Iterable) -> Dict[str, FileSummaryDb]:
+    """Summaries of the given files of a user by file id; files that do not exist are left out.
+
+    Summaries missing from the cache are read with a single query.
+    """
+    now = time.monotonic()
+    found = {}
+    missing = []
+    with _lock:
+        generation = _generation
+        for file_id in {str(file_id) for file_id in file_ids}:
+            cached = _summaries.get((user_id, file_id))
+            if cached and cached[0] > now:
+                _summaries.move_to_end((user_id, file_id))
+                found[file_id] = cached[1]
+            else:
+                missing.append(file_id)
+    if missing:
+        summaries = files_repository.get_file_summaries(user_id, missing)
+        expires_at = now + FILE_SUMMARY_CACHE_TTL_SECONDS
+        with _lock:
+            for summary in summaries:
+                found[str(summary.id)] = summary
+                if generation == _generation:
+                    _summaries[(user_id, str(summary.id))] = (expires_at, summary)
+                    _summaries.move_to_end((user_id, str(summary.id)))
+            while len(_summaries) > FILE_SUMMARY_CACHE_MAX_ENTRIES:
+                _summaries.popitem(last=False)
+    return found
+
+
+def invalidate_file_summary(user_id: str, file_id) -> None:
+    """Drop a file's summary; call it after the write that changes the file."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _summaries.pop((user_id, str(file_id)), None)
+
+
+def join_file_summaries(files_repository, user_id: str, results: List[dict]) -> List[dict]:
+    """Fill the ``cv`` and ``jd`` references of matching results with the summaries of their files.
+
+    Results store only file references; results written before that still
+    embed the file and keep it when the file cannot be found. Results whose
+    file no longer exists are left out, and so are results computed from
+    content the file no longer holds (another ``sha256``) until matching
+    rewrites them for the current content.
+    """
+    file_ids = [result[side]["id"] for result in results for side in ("cv", "jd")]
+    summaries = get_file_summaries(files_repository, user_id, file_ids)
+    joined = []
+    for result in results:
+        for side in ("cv", "jd"):
+            summary = summaries.get(str(result[side]["id"]))
+            if summary:
+                matched_sha256 = result[side].get("sha256")
+                if matched_sha256 and summary.sha256 and matched_sha256 != summary.sha256:
+                    break
+                result[side] = {**result[side], **summary.model_dump(mode="json", exclude={"sha256"})}
+            elif "filename" not in result[side]:
+                break
+        else:
+            joined.append(result)
+    return joined
@@ -1,12 +1,21 @@
 from uuid import UUID, uuid4
 from azure.cosmos import DatabaseProxy, PartitionKey
-from shared.models import FileMetadataDb
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError, CosmosResourceExistsError, CosmosResourceNotFoundError
+from shared.models import FileMetadataDb, FileSummaryDb, FileView, OutboxMessage, ProcessingState, SyncEntity
+from shared.file_summary_cache import invalidate_file_summary
+from shared.natural_keys import file_id_for
+from shared.tombstone_repository import TombstoneRepository
 import shared.db_service as db_service
+from shared.bulk_delete import BulkDeleter
+from shared.pagination import DEFAULT_PAGE_SIZE, query_page
 import logging
-from typing import Optional
+import re
+from typing import List, Optional, Tuple
 
 
 class FilesRepository:
+    SUMMARY_FIELDS = list(FileSummaryDb.model_fields)
+
     def __init__(self, db_client: DatabaseProxy):
         container_id = "files"
         unique_key_policy = {
@@ -15,32 +24,54 @@ class FilesRepository:
             ]
         }
         partition_key = PartitionKey(path="/user_id")
-        self.container = db_client.create_container_if_not_exists(
-            id=container_id,
+        self.container = db_service.get_container(
+            db_client,
+            container_id,
             unique_key_policy=unique_key_policy,
             partition_key=partition_key
         )
+        self.tombstones = TombstoneRepository(db_client)
         
     def upsert_file(self, file: dict):
-        # Query to check if a document with the same user_id and filename exists
-        query = "SELECT * FROM c WHERE c.user_id = @user_id AND c.filename = @filename"
-        parameters = [
-            {"name": "@user_id", "value": file["user_id"]},
-            {"name": "@filename", "value": file["filename"]}
-        ]
-        items = list(self.container.query_items(query, parameters=parameters))
-        if items:
-            # Update the existing document
-            file["id"] = items[0]["id"]
+        """Write a file document with a single blind upsert keyed by its natural key.
+
+        The id is derived from (user_id, filename), so re-uploading a file
+        overwrites the same document without looking it up first.
+        """
+        file["id"] = str(file_id_for(file["user_id"], file["filename"]))
+        try:
             result = self.container.upsert_item(file)
-        else:
-            # Create a new document
+        except CosmosResourceExistsError:
+            # A document written before natural-key ids holds the (user_id, filename)
+            # unique key under a random id: keep updating it under that id.
+            legacy_id = self._find_legacy_file_id(file["user_id"], file["filename"])
+            if not legacy_id:
+                raise
+            logging.info(f"Updating legacy file document {legacy_id} for {file['filename']}")
+            file["id"] = legacy_id
             result = self.container.upsert_item(file)
+        # after the write, so a concurrent read cannot cache the replaced summary again
+        invalidate_file_summary(file["user_id"], file["id"])
         return FileMetadataDb(**result)
-            
-            
-    def get_files_from_db(self, user_id, file_type=None) -> list[FileMetadataDb]:
-        query = "SELECT * FROM c"
+
+    def _find_legacy_file_id(self, user_id: str, filename: str) -> Optional[str]:
+        query = "SELECT c.id FROM c WHERE c.user_id = @user_id AND c.filename = @filename"
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@filename", "value": filename}
+        ]
+        items = list(self.container.query_items(query, parameters=parameters, partition_key=user_id))
+        return items[0]["id"] if items else None
+
+    def _build_files_query(self, user_id, file_type=None, fields: Optional[List[str]] = None):
+        if fields:
+            unknown = set(fields) - set(FileMetadataDb.model_fields)
+            if unknown:
+                raise ValueError(f"Unknown file fields: {', '.join(sorted(unknown))}")
+            projection = ", ".join(f"c.{field}" for field in fields)
+        else:
+            projection = "*"
+        query = f"SELECT {projection} FROM c"
         parameters = []
         if user_id:
             query += " WHERE c.user_id = @user_id"
@@ -51,14 +82,56 @@ class FilesRepository:
             else:
                 query += " WHERE c.type = @file_type"
             parameters.append({"name": "@file_type", "value": file_type})
-        items = list(self.container.query_items(query, parameters=parameters))
-        items = [FileMetadataDb(**item) for item in items]
-        return items
+        return query, parameters
+
+    def query_files(self, user_id, file_type=None, fields: Optional[List[str]] = None) -> list[dict]:
+        """Query a user's files, projecting only the given fields when provided."""
+        query, parameters = self._build_files_query(user_id, file_type, fields)
+        return list(self.container.query_items(query, parameters=parameters))
+
+    def _to_models(self, items: list[dict], view: FileView) -> list[FileMetadataDb] | list[FileSummaryDb]:
+        model = FileSummaryDb if view == FileView.SUMMARY else FileMetadataDb
+        return [model(**item) for item in items]
+
+    def _view_fields(self, view: FileView) -> Optional[List[str]]:
+        return self.SUMMARY_FIELDS if view == FileView.SUMMARY else None
+
+    def get_files_from_db(self, user_id, file_type=None, view: FileView = FileView.FULL) -> list[FileMetadataDb] | list[FileSummaryDb]:
+        items = self.query_files(user_id, file_type, fields=self._view_fields(view))
+        return self._to_models(items, view)
+
+    def get_files_page(
+        self,
+        user_id: str,
+        file_type=None,
+        view: FileView = FileView.SUMMARY,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        continuation: Optional[str] = None
+    ) -> Tuple[list[FileMetadataDb] | list[FileSummaryDb], Optional[str]]:
+        """Return one page of a user's files and the cursor of the next page (None on the last page)."""
+        query, parameters = self._build_files_query(user_id, file_type, self._view_fields(view))
+        items, next_continuation = query_page(self.container, query, parameters, user_id, page_size, continuation)
+        return self._to_models(items, view), next_continuation
+
+    def get_file_summaries(self, user_id: str, file_ids: List[str]) -> list[FileSummaryDb]:
+        """Summaries of the given files of a user, read with one query in the user's partition."""
+        query, parameters = self._build_files_query(user_id, fields=self.SUMMARY_FIELDS)
+        query += " AND ARRAY_CONTAINS(@file_ids, c.id)"
+        parameters.append({"name": "@file_ids", "value": [str(file_id) for file_id in file_ids]})
+        items = self.container.query_items(query, parameters=parameters, partition_key=user_id)
+        return self._to_models(list(items), FileView.SUMMARY)
+
+    def get_files_changed_since(self, user_id: str, since: Optional[int] = None) -> list[FileSummaryDb]:
+        """Summaries of the user's files created or updated at or after ``since`` (Cosmos ``_ts``, epoch seconds)."""
+        query, parameters = self._build_files_query(user_id, fields=self.SUMMARY_FIELDS)
+        if since is not None:
+            query += " AND c._ts >= @since"
+            parameters.append({"name": "@since", "value": since})
+        items = self.container.query_items(query, parameters=parameters, partition_key=user_id)
+        return self._to_models(list(items), FileView.SUMMARY)
     
     def delete_all(self):
-        items = list(self.container.read_all_items())
-        for item in items:
-            self.container.delete_item(item, partition_key=item["user_id"])
+        BulkDeleter(self.container).delete_where()
     
     def delete_file(self, user_id: str, file_id: str = None, filename: str = None):
         """Delete a file from the database by user_id and either file_id or filename."""
@@ -70,66 +143,154 @@ class FilesRepository:
                 {"name": "@user_id", "value": user_id},
                 {"name": "@filename", "value": filename}
             ]
-            items = list(self.container.query_items(query, parameters=parameters))
+            items = list(self.container.query_items(query, parameters=parameters, partition_key=user_id))
             file = FileMetadataDb(**items[0]) if items else None
         else:
             raise ValueError("Either file_id or filename must be provided")
 
         if file:
             self.container.delete_item(item=str(file.id), partition_key=user_id)
+            invalidate_file_summary(user_id, file.id)
+            self.tombstones.add(user_id, SyncEntity.FILE, [file.id])
             return True
         return False
     
     def get_file_by_id(self, user_id: str, file_id: str | UUID):
-        """Get a file by user_id and file_id."""
+        """Get a file by user_id and file_id with a point read in the user's partition.
+
+        Files are partitioned by user_id, so a file owned by another user is not
+        visible here and is reported as not found.
+        """
         if isinstance(file_id, UUID):
             file_id = str(file_id)
         try:
-            # First check if file exists for any user
-            query = "SELECT * FROM c WHERE c.id = @file_id"
-            parameters = [{"name": "@file_id", "value": file_id}]
-            items = list(self.container.query_items(query, parameters=parameters, enable_cross_partition_query=True))
-            if not items:
-                return None
-            
-            file = FileMetadataDb(**items[0])
+            item = self.container.read_item(item=file_id, partition_key=user_id)
+            file = FileMetadataDb(**item)
             if file.user_id != user_id:
                 raise PermissionError("You don't have permission to access this file")
-            
+
             return file
+        except CosmosResourceNotFoundError:
+            return None
         except PermissionError:
             raise
         except Exception as e:
             logging.error(f"Error getting file by ID: {str(e)}")
             return None
 
+    def find_processed_file_by_sha256(self, user_id: str, sha256: str, exclude_id: str | UUID = None) -> Optional[FileMetadataDb]:
+        """Return another already processed file of the user with the same content hash, if any."""
+        # mirrors FileMetadataDb.is_processed
+        query = ("SELECT TOP 1 * FROM c WHERE c.user_id = @user_id AND c.sha256 = @sha256 AND c.id != @exclude_id"
+                 " AND (c.processing_state IN ('persisted', 'queued')"
+                 " OR (NOT IS_DEFINED(c.processing_state) OR IS_NULL(c.processing_state))"
+                 " AND (c.extraction_blob != null OR c.document_analysis != null))")
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@sha256", "value": sha256},
+            {"name": "@exclude_id", "value": str(exclude_id) if exclude_id else ""}
+        ]
+        items = list(self.container.query_items(query, parameters=parameters, partition_key=user_id))
+        return FileMetadataDb(**items[0]) if items else None
+
+    def advance_processing_state(
+        self,
+        user_id: str,
+        file_id: str | UUID,
+        from_state: ProcessingState,
+        to_state: ProcessingState,
+        sha256: Optional[str] = None,
+        **fields
+    ) -> bool:
+        """Record that a file completed a processing step, together with the step outputs.
+
+        The patch only applies while the file is still in ``from_state`` and, when
+        given, still holds the content ``sha256``. Returns False when another
+        worker advanced the file or its content was replaced meanwhile.
+        """
+        condition = f"c.processing_state = '{from_state.value}'"
+        if from_state == ProcessingState.UPLOADED:
+            # documents written before processing was tracked have no state
+            condition = f"(NOT IS_DEFINED(c.processing_state) OR IS_NULL(c.processing_state) OR {condition})"
+        if sha256:
+            if not re.fullmatch(r"[0-9a-f]+", sha256):
+                raise ValueError(f"Invalid sha256: {sha256}")
+            condition += f" AND c.sha256 = '{sha256}'"
+        if "outbox" in fields:
+            fields["outbox_pending"] = bool(fields["outbox"])
+        operations = [{"op": "set", "path": "/processing_state", "value": to_state.value}]
+        operations += [{"op": "set", "path": f"/{field}", "value": value} for field, value in fields.items()]
+        try:
+            self.container.patch_item(
+                item=str(file_id),
+                partition_key=user_id,
+                patch_operations=operations,
+                filter_predicate=f"FROM c WHERE {condition}"
+            )
+            return True
+        except CosmosAccessConditionFailedError:
+            return False
+
+    def get_files_stuck_in_state(self, state: ProcessingState, before: int, max_items: int) -> list[dict]:
+        """Up to ``max_items`` files of any user that are in ``state`` and unchanged since ``before`` (epoch seconds)."""
+        query = (
+            "SELECT TOP @max_items c.id, c.user_id, c.type, c.sha256, c.processing_state FROM c "
+            "WHERE c.processing_state = @state AND c._ts < @before"
+        )
+        parameters = [
+            {"name": "@max_items", "value": max_items},
+            {"name": "@state", "value": state.value},
+            {"name": "@before", "value": before}
+        ]
+        return list(self.container.query_items(query, parameters=parameters, enable_cross_partition_query=True))
+
+    def get_pending_outboxes(self, max_items: int) -> list[dict]:
+        """Id, user_id and outbox of up to ``max_items`` files with messages waiting to be sent.
+
+        Filters on the ``outbox_pending`` flag, an equality the index serves,
+        rather than on the outbox array itself.
+        """
+        query = "SELECT TOP @max_items c.id, c.user_id, c.outbox FROM c WHERE c.outbox_pending = true"
+        parameters = [{"name": "@max_items", "value": max_items}]
+        return list(self.container.query_items(query, parameters=parameters, enable_cross_partition_query=True))
+
+    def get_pending_outboxes_of(self, user_id: str, file_ids: List[str]) -> list[dict]:
+        """Id, user_id and outbox of those of the user's files that still have messages waiting to be sent."""
+        query = "SELECT c.id, c.user_id, c.outbox FROM c WHERE c.outbox_pending = true AND ARRAY_CONTAINS(@file_ids, c.id)"
+        parameters = [{"name": "@file_ids", "value": [str(file_id) for file_id in file_ids]}]
+        return list(self.container.query_items(query, parameters=parameters, partition_key=user_id))
+
+    def clear_outbox(self, user_id: str, file_id: str | UUID, messages: List[OutboxMessage]) -> bool:
+        """Empty the outbox of a file once ``messages`` are sent.
+
+        Only applies while the outbox still holds exactly those messages:
+        returns False when the file was written again or deleted meanwhile,
+        leaving any newer messages in place.
+        """
+        first_id = str(UUID(messages[0].id))
+        try:
+            self.container.patch_item(
+                item=str(file_id),
+                partition_key=user_id,
+                patch_operations=[
+                    {"op": "set", "path": "/outbox", "value": []},
+                    {"op": "set", "path": "/outbox_pending", "value": False}
+                ],
+                filter_predicate=f"FROM c WHERE ARRAY_LENGTH(c.outbox) = {len(messages)} AND c.outbox[0].id = '{first_id}'"
+            )
+            return True
+        except (CosmosAccessConditionFailedError, CosmosResourceNotFoundError):
+            return False
+
+    def count_files_with_blob(self, user_id: str, blob_name: str) -> int:
+        """Number of the user's files stored in the given (content-addressed) blob."""
+        query = "SELECT VALUE COUNT(1) FROM c WHERE c.user_id = @user_id AND c.blob_name = @blob_name"
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@blob_name", "value": blob_name}
+        ]
+        return next(iter(self.container.query_items(query, parameters=parameters, partition_key=user_id)), 0)
+
     def get_file(self, file_id: str, user_id: str) -> Optional[FileMetadataDb]:
         """Get a file by ID and verify the user has access to it."""
-        try:
-            # Query for the file with the given ID
-            query = "SELECT * FROM c WHERE c.id = @file_id"
-            parameters = [{"name": "@file_id", "value": file_id}]
-            items = list(self.container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
-            ))
-            
-            # If no file found, return None
-            if not items:
-                return None
-            
-            file = FileMetadataDb(**items[0])
-            
-            # Check if the user has access to this file
-            if file.user_id != user_id:
-                logging.error("Error getting file by ID: You don't have permission to access this file")
-                raise PermissionError("You don't have permission to access this file")
-            
-            return file
-            
-        except PermissionError as e:
-            raise
-        except Exception as e:
-            logging.error(f"Error getting file by ID: {str(e)}")
-            return None
\ No newline at end of file
+        return self.get_file_by_id(user_id, file_id)
@@ -1,6 +1,13 @@
+from typing import Optional
 from uuid import UUID, uuid4
 from azure.cosmos import DatabaseProxy, PartitionKey
+from azure.cosmos.exceptions import CosmosResourceExistsError
 import shared.db_service as db_service
+from shared.bulk_delete import BulkDeleter
+from shared.models import SyncEntity
+from shared.tombstone_repository import TombstoneRepository
+from shared.natural_keys import matching_result_id_for
+from shared.pagination import DEFAULT_PAGE_SIZE, query_page
 
 class MatchingResultsRepository:
     def __init__(self, db_client: DatabaseProxy):
@@ -11,42 +18,61 @@ class MatchingResultsRepository:
             ]
         }
         partition_key = PartitionKey(path="/user_id")
-        self.container = db_client.create_container_if_not_exists(
-            id=container_id,
+        self.container = db_service.get_container(
+            db_client,
+            container_id,
             unique_key_policy=unique_key_policy,
             partition_key=partition_key
         )
+        self.tombstones = TombstoneRepository(db_client)
 
     # def add_result(self, matching_result: dict):
     #     self.container.create_item(matching_result)
         
     def upsert_result(self, matching_result: dict):
-        # Query to check if a document with the same user_id, cv_id and jd_id exists
-        query = "SELECT * FROM c WHERE c.user_id = @user_id AND c.cv.id = @cv_id AND c.jd.id = @jd_id"
-        parameters = [
-            {"name": "@user_id", "value": matching_result["user_id"]},
-            {"name": "@cv_id", "value": matching_result["cv"]["id"]},
-            {"name": "@jd_id", "value": matching_result["jd"]["id"]}
-        ]
-        items = list(self.container.query_items(query, parameters=parameters))
-        if items:
-            # Update the existing document
-            matching_result["id"] = items[0]["id"]
+        """Write a matching result with a single blind upsert keyed by (user_id, cv_id, jd_id)."""
+        user_id = matching_result["user_id"]
+        cv_id = matching_result["cv"]["id"]
+        jd_id = matching_result["jd"]["id"]
+        matching_result["id"] = str(matching_result_id_for(user_id, cv_id, jd_id))
+        try:
             self.container.upsert_item(matching_result)
-        else:
-            # Create a new document
+        except CosmosResourceExistsError:
+            # Results written before natural-key ids hold the unique key under a random id
+            query = "SELECT c.id FROM c WHERE c.user_id = @user_id AND c.cv.id = @cv_id AND c.jd.id = @jd_id"
+            parameters = [
+                {"name": "@user_id", "value": user_id},
+                {"name": "@cv_id", "value": cv_id},
+                {"name": "@jd_id", "value": jd_id}
+            ]
+            items = list(self.container.query_items(query, parameters=parameters, partition_key=user_id))
+            if not items:
+                raise
+            matching_result["id"] = items[0]["id"]
             self.container.upsert_item(matching_result)
             
-    def delete_matching_results_by_file(self, user_id, file_id):
+    def delete_matching_results_by_file(self, user_id, file_id, sha256: Optional[str] = None) -> int:
+        """Delete the results of a file with transactional batches. Returns the number deleted.
+
+        With ``sha256`` only the results computed from that content of the
+        file go, plus results old enough not to record one: a file re-uploaded
+        under the same id keeps the results of its new content.
+        """
         if isinstance(user_id, UUID):
             user_id = str(user_id)
         if isinstance(file_id, UUID):
             file_id = str(file_id)
-        query = "SELECT * FROM c WHERE c.user_id = @user_id AND (c.cv.id = @file_id OR c.jd.id = @file_id)"
-        parameters = [{"name": "@user_id", "value": user_id}, {"name": "@file_id", "value": file_id}]
-        items = list(self.container.query_items(query, parameters=parameters))
-        for item in items:
-            self.container.delete_item(item, partition_key=item["user_id"])
+        parameters = [{"name": "@file_id", "value": file_id}]
+        condition = "c.cv.id = @file_id OR c.jd.id = @file_id"
+        if sha256:
+            parameters.append({"name": "@sha256", "value": sha256})
+            condition = " OR ".join(
+                f"(c.{side}.id = @file_id AND (c.{side}.sha256 = @sha256 OR NOT IS_DEFINED(c.{side}.sha256)))"
+                for side in ("cv", "jd")
+            )
+        deleted = BulkDeleter(self.container).delete_where(condition, parameters, partition_key=user_id)
+        self.tombstones.add(user_id, SyncEntity.MATCHING_RESULT, [item["id"] for item in deleted])
+        return len(deleted)
         
     def get_results_by_file_type_and_id(self, user_id, file_id, file_type):
         if file_type == "CV":
@@ -56,30 +82,42 @@ class MatchingResultsRepository:
         else:
             raise ValueError("Invalid file type")
 
-    def get_results_by_cv_id(self, user_id, cv_id):
+    def get_results_page_by_file_type_and_id(self, user_id, file_id, file_type, page_size=DEFAULT_PAGE_SIZE, continuation=None):
+        """Return one page of results for a file, best match first, and the cursor of the next page."""
+        if file_type not in ("CV", "JD"):
+            raise ValueError("Invalid file type")
+        query, parameters = self._build_results_query(user_id, file_id, "cv" if file_type == "CV" else "jd")
+        return query_page(self.container, query, parameters, str(user_id), page_size, continuation)
+
+    def get_results_changed_since(self, user_id, since=None):
+        """The user's matching results created or updated at or after ``since`` (Cosmos ``_ts``, epoch seconds)."""
+        query = "SELECT * FROM c WHERE c.user_id = @user_id"
+        parameters = [{"name": "@user_id", "value": str(user_id)}]
+        if since is not None:
+            query += " AND c._ts >= @since"
+            parameters.append({"name": "@since", "value": since})
+        return list(self.container.query_items(query, parameters=parameters, partition_key=str(user_id)))
+
+    def _build_results_query(self, user_id, file_id, file_field):
         if isinstance(user_id, UUID):
             user_id = str(user_id)
-        if isinstance(cv_id, UUID):
+        if isinstance(file_id, UUID):
             # if the obj is uuid, we simply return the value of uuid
-            cv_id = str(cv_id)
+            file_id = str(file_id)
         #  order by overall_match_percentage desc
-        query = "SELECT * FROM c WHERE c.user_id = @user_id AND c.cv.id = @cv_id order by c.overall_match_percentage desc"
-        parameters = [{"name": "@user_id", "value": user_id}, {"name": "@cv_id", "value": cv_id}]
+        query = f"SELECT * FROM c WHERE c.user_id = @user_id AND c.{file_field}.id = @file_id order by c.overall_match_percentage desc"
+        parameters = [{"name": "@user_id", "value": user_id}, {"name": "@file_id", "value": file_id}]
+        return query, parameters
+
+    def get_results_by_cv_id(self, user_id, cv_id):
+        query, parameters = self._build_results_query(user_id, cv_id, "cv")
         items = list(self.container.query_items(query, parameters=parameters))
         return items
     
     def get_results_by_jd_id(self, user_id, jd_id):
-        if isinstance(user_id, UUID):
-            user_id = str(user_id)
-        if isinstance(jd_id, UUID):
-            # if the obj is uuid, we simply return the value of uuid
-            jd_id = str(jd_id)
-        query = "SELECT * FROM c WHERE c.user_id = @user_id AND c.jd.id = @jd_id order by c.overall_match_percentage desc"
-        parameters = [{"name": "@user_id", "value": user_id}, {"name": "@jd_id", "value": jd_id}]
+        query, parameters = self._build_results_query(user_id, jd_id, "jd")
         items = list(self.container.query_items(query, parameters=parameters))
         return items
     
     def delete_all(self):
-        items = list(self.container.read_all_items())
-        for item in items:
-            self.container.delete_item(item, partition_key=item["user_id"])
+        BulkDeleter(self.container).delete_where()
@@ -6,4 +6,8 @@ class MockQueueService:
         pass
 
     def send_message(self, queue_name, message):
-        self.messages.append((queue_name, message)) 
\ No newline at end of file
+        self.messages.append((queue_name, message)) 
+
+    def send_messages(self, queue_name, messages):
+        for message in messages:
+            self.send_message(queue_name, message)
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 from shared.openai_service.models import DocumentAnalysis
 
@@ -9,8 +9,21 @@ class FileType(str, Enum):
     CV = "CV"
     JD = "JD"
 
+class FileView(str, Enum):
+    SUMMARY = "summary"
+    FULL = "full"
+
+class ProcessingState(str, Enum):
+    """Steps of file processing, in order; a file records the last one it completed."""
+    UPLOADED = "uploaded"
+    EXTRACTED = "extracted"
+    ANALYZED = "analyzed"
+    PERSISTED = "persisted"
+    QUEUED = "queued"
+
 class Line(BaseModel):
     content: str
+    style: Optional[str] = None  # key into FileMetadataDb.styles
 
 class TableCell(BaseModel):
     text: str
@@ -29,6 +42,150 @@ class DocumentStyle(BaseModel):
     is_italic: Optional[bool] = None
     is_underline: Optional[bool] = None
 
+class PageLayout(BaseModel):
+    page_number: int
+    offset: int
+    length: int
+    # Lines as parallel columns of spans, which keeps the stored JSON small
+    line_offsets: List[int] = []
+    line_lengths: List[int] = []
+    line_styles: Optional[List[Optional[str]]] = None
+    table_indices: Optional[List[int]] = None  # indices into FileMetadataDb.tables
+
+class DocumentLayout(BaseModel):
+    """Pages, lines and paragraphs stored as spans into the document text, so the text is kept once.
+
+    Spans index into ``text + extra_text``; ``extra_text`` only holds fragments that do not
+    occur verbatim in the document text.
+    """
+    pages: List[PageLayout] = []
+    paragraph_offsets: List[int] = []
+    paragraph_lengths: List[int] = []
+    extra_text: str = ""
+
+    @classmethod
+    def from_structure(cls, text: str, pages: Optional[list], paragraphs: Optional[List[str]], tables: Optional[list]) -> "DocumentLayout":
+        extra_parts = []
+        extra_length = 0
+
+        def locate(fragment: str, start: int) -> int:
+            """Offset of fragment, preferring the first occurrence at or after start."""
+            nonlocal extra_length
+            offset = text.find(fragment, start)
+            if offset == -1:
+                offset = text.find(fragment)
+            if offset == -1:
+                extra_offset = "".join(extra_parts).find(fragment)
+                if extra_offset != -1:
+                    return len(text) + extra_offset
+                offset = len(text) + extra_length
+                extra_parts.append(fragment)
+                extra_length += len(fragment)
+            return offset
+
+        def next_cursor(cursor: int, offset: int, length: int) -> int:
+            return offset + length if offset < len(text) else cursor
+
+        raw_tables = tables or []
+        tables = _TABLES_ADAPTER.validate_python(raw_tables)
+        index_by_identity = {id(table): i for i, table in enumerate(raw_tables)}
+        indices_by_content: Dict[bytes, List[int]] = {}
+        for i, table in enumerate(tables):
+            indices_by_content.setdefault(_TABLE_ADAPTER.dump_json(table), []).append(i)
+
+        def table_indices(page_tables: list) -> List[int]:
+            """Indices of a page's tables: the same object, else the next equal table not yet taken by the page."""
+            indices = []
+            taken: Dict[bytes, int] = {}
+            for table in page_tables:
+                if id(table) in index_by_identity:
+                    indices.append(index_by_identity[id(table)])
+                    continue
+                key = _TABLE_ADAPTER.dump_json(_TABLE_ADAPTER.validate_python(table))
+                candidates = indices_by_content.get(key)
+                if candidates:
+                    indices.append(candidates[min(taken.get(key, 0), len(candidates) - 1)])
+                    taken[key] = taken.get(key, 0) + 1
+            return indices
+
+        page_layouts = []
+        cursor = 0
+        for page in pages or []:
+            raw_page_tables = page.get("tables") if isinstance(page, dict) else page.tables
+            page = DocumentPage.model_validate(page)
+            page_offset = locate(page.content, cursor)
+            line_cursor = page_offset if page_offset < len(text) else cursor
+            line_offsets = []
+            for line in page.lines:
+                line_offset = locate(line.content, line_cursor)
+                line_cursor = next_cursor(line_cursor, line_offset, len(line.content))
+                line_offsets.append(line_offset)
+            line_styles = [line.style for line in page.lines]
+            page_layouts.append(PageLayout(
+                page_number=page.page_number,
+                offset=page_offset,
+                length=len(page.content),
+                line_offsets=line_offsets,
+                line_lengths=[len(line.content) for line in page.lines],
+                line_styles=line_styles if any(line_styles) else None,
+                table_indices=table_indices(raw_page_tables) if raw_page_tables is not None else None
+            ))
+            cursor = next_cursor(cursor, page_offset, len(page.content))
+
+        paragraph_offsets = []
+        cursor = 0
+        for paragraph in paragraphs or []:
+            offset = locate(paragraph, cursor)
+            cursor = next_cursor(cursor, offset, len(paragraph))
+            paragraph_offsets.append(offset)
+
+        return cls(
+            pages=page_layouts,
+            paragraph_offsets=paragraph_offsets,
+            paragraph_lengths=[len(paragraph) for paragraph in paragraphs or []],
+            extra_text="".join(extra_parts)
+        )
+
+    def get_pages(self, text: str, tables: Optional[list] = None) -> List[DocumentPage]:
+        buffer = text + self.extra_text
+        tables = tables or []
+        pages = []
+        for page in self.pages:
+            styles = page.line_styles or [None] * len(page.line_offsets)
+            pages.append(DocumentPage(
+                page_number=page.page_number,
+                content=buffer[page.offset:page.offset + page.length],
+                lines=[
+                    Line(content=buffer[offset:offset + length], style=style)
+                    for offset, length, style in zip(page.line_offsets, page.line_lengths, styles)
+                ],
+                tables=[tables[i] for i in page.table_indices] if page.table_indices is not None else None
+            ))
+        return pages
+
+    def get_paragraphs(self, text: str) -> List[str]:
+        buffer = text + self.extra_text
+        return [buffer[offset:offset + length] for offset, length in zip(self.paragraph_offsets, self.paragraph_lengths)]
+
+_TABLE_ADAPTER = TypeAdapter(List[List[TableCell]])
+_TABLES_ADAPTER = TypeAdapter(List[List[List[TableCell]]])
+
+class FileExtraction(BaseModel):
+    """Heavy extraction payload, stored in a compressed blob sidecar instead of the files container."""
+    text: Optional[str] = None
+    pages: Optional[List[DocumentPage]] = None
+    paragraphs: Optional[List[str]] = None
+    tables: Optional[List[List[List[TableCell]]]] = None
+    styles: Optional[Dict[str, DocumentStyle]] = None
+    sections: Optional[List[str]] = None
+    headers: Optional[List[str]] = None
+    footers: Optional[List[str]] = None
+    languages: Optional[List[str]] = None
+    layout: Optional[DocumentLayout] = None
+    document_analysis: Optional[DocumentAnalysis] = None
+
+EXTRACTION_FIELDS = set(FileExtraction.model_fields)
+
 class FileMetadataDb(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     filename: str
@@ -37,6 +194,11 @@ class FileMetadataDb(BaseModel):
     url: str
     text: Optional[str] = None
     content_type: Optional[str] = None
+    # Size in bytes and sha256 of the uploaded file, recorded while it is streamed to storage
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    # Name of the uploaded blob when it is not the filename (direct uploads)
+    blob_name: Optional[str] = None
     
     # Structured document information
     pages: Optional[List[DocumentPage]] = None
@@ -47,12 +209,114 @@ class FileMetadataDb(BaseModel):
     headers: Optional[List[str]] = None
     footers: Optional[List[str]] = None
     languages: Optional[List[str]] = None
+    # Compact form of pages and paragraphs as spans into text; see get_pages/get_paragraphs
+    layout: Optional[DocumentLayout] = None
     
     # Document analysis results
     document_analysis: Optional[DocumentAnalysis] = None
     
+    # Pointer to the blob sidecar holding the extraction fields above, and the
+    # sha256 of its uncompressed JSON. Set when the extraction is offloaded.
+    extraction_blob: Optional[str] = None
+    extraction_hash: Optional[str] = None
+
+    # Last processing step completed for the content with this sha256.
+    # None on documents written before processing was tracked.
+    processing_state: Optional[ProcessingState] = None
+    
+    def is_processed(self) -> bool:
+        """Whether extraction and analysis of the current content are stored."""
+        if self.processing_state is not None:
+            return self.processing_state in (ProcessingState.PERSISTED, ProcessingState.QUEUED)
+        return bool(self.extraction_blob or self.document_analysis)
+
+    def get_blob_name(self) -> str:
+        """Name of the uploaded file in the files container."""
+        return self.blob_name or self.filename
+
+    def get_pages(self) -> Optional[List[DocumentPage]]:
+        """Pages of the document, rebuilt from the layout when they are not stored inline."""
+        if self.pages is not None:
+            return self.pages
+        if self.layout is not None and self.text is not None:
+            return self.layout.get_pages(self.text, self.tables)
+        return None
+
+    def get_paragraphs(self) -> Optional[List[str]]:
+        """Paragraphs of the document, rebuilt from the layout when they are not stored inline."""
+        if self.paragraphs is not None:
+            return self.paragraphs
+        if self.layout is not None and self.text is not None:
+            return self.layout.get_paragraphs(self.text)
+        return None
+
     class Config:
         json_encoders = {UUID: str}
         exclude_none = True
-    
-    
\ No newline at end of file
+
+
+class FileSummaryDb(BaseModel):
+    """Projection of FileMetadataDb with only the fields needed to list files."""
+    id: UUID
+    filename: str
+    type: FileType
+    user_id: str
+    url: str
+    content_type: Optional[str] = None
+    sha256: Optional[str] = None
+
+
+class FileStage(str, Enum):
+    """Stage reported to clients: the processing states followed by matching."""
+    UPLOADED = "uploaded"
+    EXTRACTED = "extracted"
+    ANALYZED = "analyzed"
+    PERSISTED = "persisted"
+    QUEUED = "queued"
+    MATCHED = "matched"
+
+# Progress in percent reported once a stage is reached
+STAGE_PROGRESS = {
+    FileStage.UPLOADED: 0,
+    FileStage.EXTRACTED: 40,
+    FileStage.ANALYZED: 70,
+    FileStage.PERSISTED: 80,
+    FileStage.QUEUED: 90,
+    FileStage.MATCHED: 100,
+}
+
+
+class OutboxMessage(BaseModel):
+    """Queue message stored on the file document until the outbox dispatcher sends it."""
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    queue: str
+    body: str
+
+
+class FileStatusDb(BaseModel):
+    """Small per-file status record polled by clients instead of the file documents."""
+    id: UUID  # the file id
+    user_id: str
+    stage: FileStage
+    progress: int = 0
+    error: Optional[str] = None
+    # fixed-width UTC timestamp (see file_status_repository.status_timestamp), for display
+    updated_at: str
+    # Cosmos last-modified time and version; read for change cursors, never written
+    ts: Optional[int] = Field(default=None, alias="_ts", exclude=True)
+    etag: Optional[str] = Field(default=None, alias="_etag", exclude=True)
+
+
+class SyncEntity(str, Enum):
+    FILE = "file"
+    MATCHING_RESULT = "matching_result"
+
+
+class TombstoneDb(BaseModel):
+    """Marker left behind when a file or matching result is deleted, so delta syncs can report the delete."""
+    id: str
+    user_id: str
+    kind: SyncEntity
+    entity_id: str
+    # Cosmos last-modified time in epoch seconds, i.e. when the entity was deleted
+    ts: Optional[int] = Field(default=None, alias="_ts")
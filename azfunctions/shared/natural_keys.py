@@ -0,0 +1,15 @@
+from uuid import UUID, uuid5
+
+# Fixed namespace for document ids derived from natural keys. Changing it
+# re-keys every document, so it must never change.
+NATURAL_KEY_NAMESPACE = UUID("6f1c7a52-2d0e-4c55-9a3b-8e4d2f6b1c90")
+
+
+def file_id_for(user_id: str, filename: str) -> UUID:
+    """Deterministic id of a user's file, derived from the (user_id, filename) unique key."""
+    return uuid5(NATURAL_KEY_NAMESPACE, f"file/{user_id}/{filename}")
+
+
+def matching_result_id_for(user_id: str, cv_id, jd_id) -> UUID:
+    """Deterministic id of a matching result, derived from the (user_id, cv_id, jd_id) unique key."""
+    return uuid5(NATURAL_KEY_NAMESPACE, f"matching-result/{user_id}/{cv_id}/{jd_id}")
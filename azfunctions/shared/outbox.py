@@ -0,0 +1,93 @@
+import os
+import logging
+from collections import defaultdict
+from typing import Iterable, List, Mapping
+from pydantic import BaseModel
+
+from shared.models import OutboxMessage
+
+# Most file documents with pending messages read by one dispatch round
+OUTBOX_DISPATCH_BATCH_SIZE = int(os.getenv("OUTBOX_DISPATCH_BATCH_SIZE", 100))
+# Rounds one drain runs at most, so a timer invocation ends even when sends keep failing
+OUTBOX_MAX_ROUNDS = 10
+
+
+def outbox_entry(queue_name: str, message: BaseModel) -> dict:
+    """Outbox entry, as stored in the file document, for a message to ``queue_name``."""
+    return OutboxMessage(queue=queue_name, body=message.model_dump_json()).model_dump(mode="json")
+
+
+class OutboxDispatcher:
+    """Sends the queue messages recorded in the ``outbox`` of file documents.
+
+    A message is written to the outbox in the same write as the file document
+    change it announces, so the change and the message are never separated by
+    a crash, together with ``outbox_pending: true``, the indexed flag pending
+    outboxes are found by. Messages are sent in one ``send_messages`` batch
+    per queue and the outbox is cleared afterwards: delivery is at least once,
+    and consumers already ignore messages for steps a file has completed.
+    """
+
+    def __init__(self, files_repository, queue_service, batch_size: int = OUTBOX_DISPATCH_BATCH_SIZE):
+        self.files_repository = files_repository
+        self.queue_service = queue_service
+        self.batch_size = batch_size
+
+    def dispatch(self, documents: Iterable[Mapping]) -> int:
+        """Send the outbox of each document ({id, user_id, outbox}) and clear it.
+
+        A document keeps its outbox when one of its queues fails, or when it
+        was written again meanwhile. Returns the number of messages cleared.
+        """
+        documents = [document for document in documents if document.get("outbox")]
+        by_queue = defaultdict(list)
+        for document in documents:
+            for message in document["outbox"]:
+                by_queue[message["queue"]].append(message["body"])
+
+        failed_queues = set()
+        for queue_name, bodies in by_queue.items():
+            try:
+                self.queue_service.create_queue_if_not_exists(queue_name)
+                self.queue_service.send_messages(queue_name, bodies)
+            except Exception as e:
+                logging.error(f"Could not send {len(bodies)} outbox messages to {queue_name}: {str(e)}")
+                failed_queues.add(queue_name)
+
+        dispatched = 0
+        for document in documents:
+            messages: List[OutboxMessage] = [OutboxMessage(**message) for message in document["outbox"]]
+            if any(message.queue in failed_queues for message in messages):
+                continue
+            if self.files_repository.clear_outbox(document["user_id"], document["id"], messages):
+                dispatched += len(messages)
+        return dispatched
+
+    def dispatch_changes(self, documents: Iterable[Mapping]) -> int:
+        """Dispatch the outboxes of file documents delivered by the change feed.
+
+        The change feed lags the writes it reports, and the writer usually
+        sent its outbox right away: pending outboxes are read again, one
+        query per user, so only those still waiting are sent.
+        """
+        file_ids_by_user = defaultdict(list)
+        for document in documents:
+            if document.get("outbox_pending"):
+                file_ids_by_user[document["user_id"]].append(document["id"])
+        pending = []
+        for user_id, file_ids in file_ids_by_user.items():
+            pending += self.files_repository.get_pending_outboxes_of(user_id, file_ids)
+        return self.dispatch(pending) if pending else 0
+
+    def drain(self) -> int:
+        """Dispatch pending outboxes until none is left. Returns the number of messages cleared."""
+        dispatched = 0
+        for _ in range(OUTBOX_MAX_ROUNDS):
+            documents = self.files_repository.get_pending_outboxes(self.batch_size)
+            if not documents:
+                break
+            cleared = self.dispatch(documents)
+            dispatched += cleared
+            if len(documents) < self.batch_size or not cleared:
+                break
+        return dispatched
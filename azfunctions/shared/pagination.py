@@ -0,0 +1,35 @@
+import base64
+import binascii
+from typing import Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_continuation(token: Optional[str]) -> Optional[str]:
+    """Wrap a Cosmos continuation token into an opaque, URL-safe cursor."""
+    if not token:
+        return None
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+
+
+def decode_continuation(cursor: Optional[str]) -> Optional[str]:
+    """Unwrap a cursor produced by encode_continuation. Raises ValueError if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError("Invalid continuation token") from e
+
+
+def query_page(container, query: str, parameters: list, partition_key, page_size: int, continuation: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """Run a single-partition query and return one page of items plus the cursor of the next page."""
+    pages = container.query_items(
+        query,
+        parameters=parameters,
+        partition_key=partition_key,
+        max_item_count=page_size
+    ).by_page(decode_continuation(continuation))
+    items = list(next(pages, []))
+    return items, encode_continuation(pages.continuation_token)
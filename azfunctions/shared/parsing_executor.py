@@ -0,0 +1,153 @@
+import faulthandler
+import logging
+import os
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+def _to_plain(value):
+    """Convert extraction output to plain dicts/lists so nothing Pydantic crosses the process boundary."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {key: _to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+def _warm_up_worker():
+    """Pool initializer: import the parsing stack once per worker process."""
+    import shared.docx_service  # noqa: F401
+    import shared.docx_stream_service  # noqa: F401
+    import shared.document_intelligence_service  # noqa: F401
+
+
+class _DeadlineExceeded(BaseException):
+    """Raised into a task at its deadline; a BaseException so parsing code cannot swallow it."""
+
+
+def _raise_deadline_exceeded(signum, frame):
+    raise _DeadlineExceeded()
+
+
+def _run_with_deadline(fn, timeout: float, kill_grace: float, *args):
+    """Run ``fn`` in a worker with a deadline that starts when the task starts.
+
+    The deadline raises TimeoutError in the task, leaving the worker and the
+    tasks of other workers untouched. A task stuck in native code never sees
+    that exception, so the worker exits ``kill_grace`` seconds later as a last
+    resort, which breaks the pool.
+    """
+    if timeout <= 0 or not hasattr(signal, "setitimer"):
+        return fn(*args)
+    previous_handler = signal.signal(signal.SIGALRM, _raise_deadline_exceeded)
+    faulthandler.dump_traceback_later(timeout + kill_grace, exit=True)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    except _DeadlineExceeded:
+        raise TimeoutError(f"Document parsing timed out after {timeout} seconds") from None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        faulthandler.cancel_dump_traceback_later()
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _extract_docx(content: bytes, extractor: str) -> dict:
+    if extractor == "stream":
+        from shared.docx_stream_service import DocxStreamService
+        return _to_plain(DocxStreamService.get_text_from_docx(content))
+    from shared.docx_service import DocxService
+    return _to_plain(DocxService.get_text_from_docx(content))
+
+
+def _process_analysis_result(result: dict) -> dict:
+    from azure.ai.formrecognizer import AnalyzeResult
+    from shared.document_intelligence_service import DocumentIntelligenceService
+    return _to_plain(DocumentIntelligenceService.process_analysis_result(AnalyzeResult.from_dict(result)))
+
+
+class ParsingExecutor:
+    """Runs CPU-bound document parsing in a warm process pool.
+
+    Tasks take bytes or plain dicts in and return plain dicts out. With a pool
+    size of 0 the work runs inline in the calling process. ``task_timeout``
+    is enforced inside the worker and counts from the start of the task, not
+    from its submission, so time spent queued behind other tasks is free.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, task_timeout: Optional[float] = None, kill_grace: float = 10):
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv("PARSING_POOL_SIZE", os.cpu_count() or 1))
+        self.task_timeout = task_timeout if task_timeout is not None else float(os.getenv("PARSING_TASK_TIMEOUT", 120))
+        self.kill_grace = kill_grace
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def extract_docx(self, content: bytes, extractor: str = "python-docx") -> dict:
+        """Extract structured information from DOCX bytes."""
+        return self._run(_extract_docx, content, extractor)
+
+    def process_analysis_result(self, result) -> dict:
+        """Walk a Document Intelligence AnalyzeResult into structured information."""
+        return self._run(_process_analysis_result, result.to_dict())
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                logging.info(f"Starting parsing process pool with {self.max_workers} workers")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up_worker
+                )
+            return self._pool
+
+    def _reset_pool(self, broken_pool: ProcessPoolExecutor):
+        """Discard ``broken_pool`` unless another caller already replaced it."""
+        with self._lock:
+            if self._pool is not broken_pool:
+                return
+            self._pool = None
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if self.max_workers <= 0:
+            return fn(*args)
+        pool = self._get_pool()
+        try:
+            future = pool.submit(_run_with_deadline, fn, self.task_timeout, self.kill_grace, *args)
+            return future.result()
+        except TimeoutError:
+            logging.error(f"Parsing task {fn.__name__} timed out after {self.task_timeout}s")
+            raise
+        except BrokenProcessPool:
+            logging.error(f"Parsing pool broke while running {fn.__name__}, restarting it")
+            self._reset_pool(pool)
+            raise
+
+
+_parsing_executor: Optional[ParsingExecutor] = None
+_parsing_executor_lock = threading.Lock()
+
+
+def get_parsing_executor() -> ParsingExecutor:
+    """Return the process-wide parsing executor, creating it on first use."""
+    global _parsing_executor
+    if _parsing_executor is None:
+        with _parsing_executor_lock:
+            if _parsing_executor is None:
+                _parsing_executor = ParsingExecutor()
+    return _parsing_executor
@@ -1,27 +1,72 @@
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Set, Tuple
 from azure.storage.queue import QueueServiceClient
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 
+# Process-wide clients per connection string; the SDK clients are thread-safe
+# and keep their connection pool warm across invocations.
+_queue_service_clients: Dict[str, QueueServiceClient] = {}
+# (account, queue) pairs this process has already created or seen
+_provisioned_queues: Set[Tuple[str, str]] = set()
+_lock = threading.Lock()
+
+# Upper bound on concurrent sends in one send_messages call
+MAX_SEND_CONCURRENCY = 8
+
+
+def get_queue_service_client(connection_string) -> QueueServiceClient:
+    """Return the process-wide QueueServiceClient for a connection string."""
+    client = _queue_service_clients.get(connection_string)
+    if client is None:
+        with _lock:
+            client = _queue_service_clients.get(connection_string)
+            if client is None:
+                client = QueueServiceClient.from_connection_string(connection_string)
+                _queue_service_clients[connection_string] = client
+    return client
+
+
 class QueueService:
     def __init__(self, connection_string):
         # self.connection_string = connection_string
         # default_credential = DefaultAzureCredential()
-        self.queue_service_client = QueueServiceClient.from_connection_string(connection_string)
+        self.queue_service_client = get_queue_service_client(connection_string)
+
+    def _queue_key(self, queue_name) -> Tuple[str, str]:
+        return (self.queue_service_client.account_name, queue_name)
 
     def create_queue_if_not_exists(self, queue_name):
-        # check if queue exists
+        # only the first call per process reaches the service
+        key = self._queue_key(queue_name)
+        if key in _provisioned_queues:
+            return
         queue_client = self.queue_service_client.get_queue_client(queue_name)
         try:
             queue_client.create_queue()
         except ResourceExistsError:
             pass
-        
+        _provisioned_queues.add(key)
 
     def send_message(self, queue_name, message):
         queue_client = self.queue_service_client.get_queue_client(queue_name)
         message = base64.b64encode(message.encode('utf-8')).decode('utf-8')
         queue_client.send_message(message)
 
+    def send_messages(self, queue_name, messages: Iterable[str]):
+        """Send several messages over one queue client, overlapping the round trips."""
+        messages = list(messages)
+        if len(messages) <= 1:
+            for message in messages:
+                self.send_message(queue_name, message)
+            return
+        queue_client = self.queue_service_client.get_queue_client(queue_name)
+        encoded = [base64.b64encode(message.encode('utf-8')).decode('utf-8') for message in messages]
+        with ThreadPoolExecutor(max_workers=min(MAX_SEND_CONCURRENCY, len(encoded))) as executor:
+            # consume the results so a failed send raises here
+            list(executor.map(queue_client.send_message, encoded))
+
     # def receive_message(self, queue_name):
     #     queue_client = self.queue_service_client.get_queue_client(queue_name)
     #     messages = queue_client.receive_messages()
@@ -29,6 +74,7 @@ class QueueService:
     def delete_queue(self, queue_name):
         queue_client = self.queue_service_client.get_queue_client(queue_name)
         queue_client.delete_queue()
+        _provisioned_queues.discard(self._queue_key(queue_name))
         
     def exists(self, queue_name):
         queue_client = self.queue_service_client.get_queue_client(queue_name)
@@ -36,4 +82,4 @@ class QueueService:
             queue_client.get_queue_properties()
         except ResourceNotFoundError:
             return False
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,45 @@
+from typing import Dict, Optional
+
+from shared.models import DocumentStyle
+
+
+class StyleTable:
+    """Interns document styles so that each distinct combination of style
+    attributes is stored once and lines reference it by style ID."""
+
+    def __init__(self):
+        self._style_ids: Dict[tuple, str] = {}
+        self.styles: Dict[str, DocumentStyle] = {}
+
+    def intern(
+        self,
+        font_name: Optional[str] = None,
+        font_size: Optional[float] = None,
+        is_bold: Optional[bool] = None,
+        is_italic: Optional[bool] = None,
+        is_underline: Optional[bool] = None
+    ) -> Optional[str]:
+        """Return the style ID for the given attributes, adding it to the table if new.
+
+        Returns None when no attribute is set, so unstyled lines carry no reference.
+        """
+        key = (font_name, font_size, is_bold, is_italic, is_underline)
+        if all(value is None for value in key):
+            return None
+
+        style_id = self._style_ids.get(key)
+        if style_id is None:
+            style_id = f"style_{len(self._style_ids)}"
+            self._style_ids[key] = style_id
+            self.styles[style_id] = DocumentStyle(
+                name=style_id,
+                font_name=font_name,
+                font_size=font_size,
+                is_bold=is_bold,
+                is_italic=is_italic,
+                is_underline=is_underline
+            )
+        return style_id
+
+    def __len__(self) -> int:
+        return len(self.styles)
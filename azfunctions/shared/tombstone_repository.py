@@ -0,0 +1,47 @@
+import os
+from typing import Iterable, List, Optional
+from uuid import UUID
+from azure.cosmos import DatabaseProxy, PartitionKey
+import shared.db_service as db_service
+from shared.bulk_delete import MAX_BATCH_OPERATIONS
+from shared.models import SyncEntity, TombstoneDb
+
+# Tombstones expire after this many days; a client that last synced earlier must resync from scratch
+TOMBSTONE_TTL_DAYS = int(os.getenv("SYNC_TOMBSTONE_TTL_DAYS", 30))
+TOMBSTONE_TTL_SECONDS = TOMBSTONE_TTL_DAYS * 24 * 60 * 60
+
+
+class TombstoneRepository:
+    """Records deletes of files and matching results for delta syncs.
+
+    Deleted documents disappear from their containers, so neither ``_ts``
+    queries nor the change feed can report them: each delete leaves a small
+    tombstone here instead, removed by the container TTL.
+    """
+
+    def __init__(self, db_client: DatabaseProxy):
+        self.container = db_service.get_container(
+            db_client,
+            "tombstones",
+            partition_key=PartitionKey(path="/user_id"),
+            default_ttl=TOMBSTONE_TTL_SECONDS
+        )
+
+    def add(self, user_id: str, kind: SyncEntity, entity_ids: Iterable[str | UUID]) -> None:
+        """Record deletes, writing the tombstones of a user with transactional batches."""
+        operations = []
+        for entity_id in entity_ids:
+            tombstone = TombstoneDb(id=f"{kind.value}-{entity_id}", user_id=user_id, kind=kind, entity_id=str(entity_id))
+            operations.append(("upsert", (tombstone.model_dump(mode="json", exclude={"ts"}),)))
+        for start in range(0, len(operations), MAX_BATCH_OPERATIONS):
+            self.container.execute_item_batch(operations[start:start + MAX_BATCH_OPERATIONS], partition_key=user_id)
+
+    def get_since(self, user_id: str, since: Optional[int] = None) -> List[TombstoneDb]:
+        """Tombstones of the user written at or after ``since`` (epoch seconds)."""
+        query = "SELECT * FROM c WHERE c.user_id = @user_id"
+        parameters = [{"name": "@user_id", "value": user_id}]
+        if since is not None:
+            query += " AND c._ts >= @since"
+            parameters.append({"name": "@since", "value": since})
+        items = self.container.query_items(query, parameters=parameters, partition_key=user_id)
+        return [TombstoneDb(**item) for item in items]
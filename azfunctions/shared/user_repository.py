@@ -1,14 +1,22 @@
 from datetime import datetime, timedelta, UTC
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from azure.core import MatchConditions
 from azure.cosmos import DatabaseProxy, PartitionKey, ContainerProxy
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError, CosmosResourceNotFoundError
+import shared.db_service as db_service
 from users.models import UserDb
 
+MATCHING_RESET_PERIOD = timedelta(days=30)
+# Attempts at a conditional update before giving up under heavy contention
+MAX_CONDITIONAL_RETRIES = 5
+
 class UserRepository:
     def __init__(self, db_client: DatabaseProxy):
         container_id = "users"
         partition_key = PartitionKey(path="/userId")
-        self.container = db_client.create_container_if_not_exists(
-            id=container_id,
+        self.container = db_service.get_container(
+            db_client,
+            container_id,
             partition_key=partition_key
         )
         
@@ -30,47 +38,118 @@ class UserRepository:
         result = self.container.upsert_item(user.model_dump())
         return UserDb(**result)
     
-    def increment_files_count(self, user_id: str) -> UserDb:
-        """Increment user's files count"""
-        user = self.get_user(user_id)
-        if not user:
+    def _read_user(self, user_id: str) -> Tuple[UserDb, str]:
+        """Read a user together with the ETag of the document"""
+        try:
+            item = self.container.read_item(item=user_id, partition_key=user_id)
+        except CosmosResourceNotFoundError:
             raise ValueError(f"User {user_id} not found")
-        user.filesCount += 1
-        return self.update_user(user)
-    
-    def decrement_files_count(self, user_id: str) -> UserDb:
-        """Decrement user's files count"""
-        user = self.get_user(user_id)
-        if not user:
+        return UserDb(**item), item["_etag"]
+
+    def _patch_user(self, user_id: str, operations: List[dict], **kwargs) -> UserDb:
+        """Apply partial document update operations to a user in a single round trip"""
+        try:
+            result = self.container.patch_item(
+                item=user_id,
+                partition_key=user_id,
+                patch_operations=operations,
+                **kwargs
+            )
+        except CosmosResourceNotFoundError:
             raise ValueError(f"User {user_id} not found")
-        user.filesCount = max(0, user.filesCount - 1)
-        return self.update_user(user)
+        return UserDb(**result)
+
+    @staticmethod
+    def _matching_reset_due(user: UserDb) -> bool:
+        return datetime.now(UTC) - user.lastMatchingReset > MATCHING_RESET_PERIOD
+
+    @staticmethod
+    def _matching_reset_operations(used_count: int) -> List[dict]:
+        return [
+            {"op": "set", "path": "/matchingUsedCount", "value": used_count},
+            {"op": "set", "path": "/lastMatchingReset", "value": datetime.now(UTC).isoformat()}
+        ]
+
+    def increment_files_count(self, user_id: str, count: int = 1) -> UserDb:
+        """Atomically increment user's files count by count"""
+        return self._patch_user(user_id, [{"op": "incr", "path": "/filesCount", "value": count}])
     
-    def increment_matching_count(self, user_id: str) -> UserDb:
-        """Increment user's matching count, reset if 30 days passed"""
-        user = self.get_user(user_id)
-        if not user:
-            raise ValueError(f"User {user_id} not found")
-            
-        # Reset matching count if 30 days passed
-        if datetime.now(UTC) - user.lastMatchingReset > timedelta(days=30):
-            user.matchingUsedCount = 0
-            user.lastMatchingReset = datetime.now(UTC)
-            
-        user.matchingUsedCount += 1
-        return self.update_user(user)
+    def reserve_files(self, user_id: str, count: int) -> bool:
+        """Atomically add count to user's files count if it stays within the files limit"""
+        try:
+            self._patch_user(
+                user_id,
+                [{"op": "incr", "path": "/filesCount", "value": count}],
+                filter_predicate=f"FROM c WHERE c.filesCount + {int(count)} <= c.filesLimit"
+            )
+        except CosmosAccessConditionFailedError:
+            return False
+        return True
+    
+    def decrement_files_count(self, user_id: str, count: int = 1) -> UserDb:
+        """Atomically decrement user's files count by count, never going below zero"""
+        for _ in range(MAX_CONDITIONAL_RETRIES):
+            try:
+                return self._patch_user(
+                    user_id,
+                    [{"op": "incr", "path": "/filesCount", "value": -count}],
+                    filter_predicate=f"FROM c WHERE c.filesCount >= {int(count)}"
+                )
+            except CosmosAccessConditionFailedError:
+                pass
+            try:
+                return self._patch_user(
+                    user_id,
+                    [{"op": "set", "path": "/filesCount", "value": 0}],
+                    filter_predicate=f"FROM c WHERE NOT IS_DEFINED(c.filesCount) OR c.filesCount < {int(count)}"
+                )
+            except CosmosAccessConditionFailedError:
+                # files count changed concurrently between the two patches, try again
+                continue
+        raise RuntimeError(f"Could not decrement files count of user {user_id}: too many concurrent updates")
+    
+    def increment_matching_count(self, user_id: str, count: int = 1) -> UserDb:
+        """Atomically increment user's matching count by count, reset if 30 days passed"""
+        for _ in range(MAX_CONDITIONAL_RETRIES):
+            # Fast path: a single patch while the current 30-day period is still running
+            cutoff = (datetime.now(UTC) - MATCHING_RESET_PERIOD).isoformat()
+            try:
+                return self._patch_user(
+                    user_id,
+                    [{"op": "incr", "path": "/matchingUsedCount", "value": count}],
+                    filter_predicate=f"FROM c WHERE c.lastMatchingReset > '{cutoff}'"
+                )
+            except CosmosAccessConditionFailedError:
+                pass
+
+            # The period may have ended: reset it, conditioned on the ETag we read
+            user, etag = self._read_user(user_id)
+            if self._matching_reset_due(user):
+                operations = self._matching_reset_operations(count)
+            else:
+                operations = [{"op": "incr", "path": "/matchingUsedCount", "value": count}]
+            try:
+                return self._patch_user(user_id, operations, etag=etag, match_condition=MatchConditions.IfNotModified)
+            except CosmosAccessConditionFailedError:
+                continue
+        raise RuntimeError(f"Could not increment matching count of user {user_id}: too many concurrent updates")
     
     def can_upload_file(self, user_id: str) -> bool:
         """Check if user can upload more files"""
-        user = self.get_user(user_id)
-        if not user:
-            raise ValueError(f"User {user_id} not found")
+        user, etag = self._read_user(user_id)
             
         # Reset matching count if 30 days passed
-        if datetime.now(UTC) - user.lastMatchingReset > timedelta(days=30):
-            user.matchingUsedCount = 0
-            user.lastMatchingReset = datetime.now(UTC)
-            user = self.update_user(user)
+        if self._matching_reset_due(user):
+            try:
+                user = self._patch_user(
+                    user_id,
+                    self._matching_reset_operations(0),
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified
+                )
+            except CosmosAccessConditionFailedError:
+                # Updated concurrently (possibly reset already), use the current state
+                user = self.get_user(user_id)
             
         return user.filesCount < user.filesLimit and user.matchingUsedCount < user.matchingLimit
     
@@ -81,7 +160,7 @@ class UserRepository:
             raise ValueError(f"User {user_id} not found")
             
         # Reset matching count if 30 days passed
-        if datetime.now(UTC) - user.lastMatchingReset > timedelta(days=30):
+        if self._matching_reset_due(user):
             return True
             
         return user.matchingUsedCount < user.matchingLimit
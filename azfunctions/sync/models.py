@@ -0,0 +1,23 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+from matching_results.models import MatchingResultModel
+from shared.models import FileSummaryDb, SyncEntity
+
+
+class SyncDelete(BaseModel):
+    kind: SyncEntity
+    id: str
+    # epoch seconds of the delete
+    deleted_at: Optional[int] = None
+
+
+class SyncResponse(BaseModel):
+    files: List[FileSummaryDb]
+    results: List[MatchingResultModel]
+    deleted: List[SyncDelete]
+    # pass as ?since= on the next sync
+    token: str
+    # True when the token was older than the tombstone retention: the response is a full
+    # snapshot and the client must drop anything it holds that is not in it
+    reset: bool = False
@@ -0,0 +1,105 @@
+import os
+import json
+import logging
+import time
+import azure.functions as func
+
+from matching_results.models import MatchingResultModel
+from shared.db_service import get_cosmos_db_client
+from shared.file_summary_cache import join_file_summaries
+from shared.files_repository import FilesRepository
+from shared.matching_results_repository import MatchingResultsRepository
+from shared.models import SyncEntity
+from shared.tombstone_repository import TOMBSTONE_TTL_SECONDS, TombstoneRepository
+from sync.models import SyncDelete, SyncResponse
+from user_files.user_files import get_user_id_from_claims
+
+# The next token starts this many seconds before the sync began, so writes in flight
+# while it ran (and clock differences with Cosmos) are picked up by the next sync
+SYNC_CLOCK_SKEW_SECONDS = int(os.getenv("SYNC_CLOCK_SKEW_SECONDS", 5))
+
+# create blueprint
+sync_bp = func.Blueprint("sync", __name__)
+
+
+@sync_bp.route(route="sync", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def sync(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('sync function processed a request.')
+    try:
+        cosmos_db_client = get_cosmos_db_client()
+        return _sync(
+            req,
+            FilesRepository(cosmos_db_client),
+            MatchingResultsRepository(cosmos_db_client),
+            TombstoneRepository(cosmos_db_client)
+        )
+    except Exception as e:
+        logging.error(f"Error in sync wrapper: {str(e)}")
+        return func.HttpResponse(
+            body=json.dumps({"error": "Internal Server Error"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def _sync(
+    req: func.HttpRequest,
+    files_repository: FilesRepository,
+    matching_results_repository: MatchingResultsRepository,
+    tombstone_repository: TombstoneRepository
+) -> func.HttpResponse:
+    """Return the user's files and matching results changed since the ``since`` token.
+
+    Without a token every file and result is returned. Changes are found by
+    the Cosmos ``_ts`` of each document and deletes by their tombstones.
+    Tokens overlap by SYNC_CLOCK_SKEW_SECONDS, so clients must apply changes
+    idempotently (by id).
+    """
+    user_id = get_user_id_from_claims(req)
+    if not user_id:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Unauthorized - Missing user claims"}),
+            mimetype="application/json",
+            status_code=401
+        )
+
+    since = req.params.get('since')
+    if since:
+        try:
+            since = int(since)
+        except ValueError:
+            return func.HttpResponse(
+                body=json.dumps({"error": "Invalid sync token"}),
+                mimetype="application/json",
+                status_code=400
+            )
+    else:
+        since = None
+
+    started_at = int(time.time())
+    # Deletes older than the tombstone retention are lost: resync from scratch
+    reset = since is not None and since < started_at - TOMBSTONE_TTL_SECONDS
+    if reset:
+        since = None
+
+    files = files_repository.get_files_changed_since(user_id, since)
+    results = matching_results_repository.get_results_changed_since(user_id, since)
+    deleted = []
+    if since is not None:
+        # an entity deleted and then written again under the same natural key is live
+        live = {(SyncEntity.FILE, str(file.id)) for file in files}
+        live |= {(SyncEntity.MATCHING_RESULT, result["id"]) for result in results}
+        deleted = [
+            SyncDelete(kind=tombstone.kind, id=tombstone.entity_id, deleted_at=tombstone.ts)
+            for tombstone in tombstone_repository.get_since(user_id, since)
+            if (tombstone.kind, tombstone.entity_id) not in live
+        ]
+
+    response = SyncResponse(
+        files=files,
+        results=[MatchingResultModel.from_json(result) for result in join_file_summaries(files_repository, user_id, results)],
+        deleted=deleted,
+        token=str(started_at - SYNC_CLOCK_SKEW_SECONDS),
+        reset=reset
+    )
+    return func.HttpResponse(response.model_dump_json(), mimetype="application/json")
@@ -0,0 +1,134 @@
+import base64
+import json
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import azure.functions as func
+from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosResourceNotFoundError
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from shared.bulk_delete import BulkDeleter
+from shared.matching_results_repository import MatchingResultsRepository
+from shared.models import FileMetadataDb, SyncEntity
+from user_files.models import FileCleanupMessage
+from user_files.user_files import FILE_CLEANUP_QUEUE, _clean_up_deleted_file, _delete_file
+
+
+def _items(count, user_id="user-1"):
+    return [{"id": f"{user_id}-{i}", "user_id": user_id} for i in range(count)]
+
+
+def test_deletes_in_batches_of_100_per_partition_and_reports_progress():
+    container = MagicMock()
+    progress = []
+
+    deleted = BulkDeleter(container, max_concurrency=2, progress=lambda done, total: progress.append((done, total))).delete_items(
+        _items(250) + _items(3, "user-2")
+    )
+
+    assert deleted == 253
+    batches = sorted((call.kwargs["partition_key"], len(call.args[0])) for call in container.execute_item_batch.call_args_list)
+    assert batches == [("user-1", 50), ("user-1", 100), ("user-1", 100), ("user-2", 3)]
+    assert all(operation[0] == "delete" for call in container.execute_item_batch.call_args_list for operation in call.args[0])
+    assert len(progress) == 4 and progress[-1] == (253, 253)
+
+
+def test_failed_batch_falls_back_to_single_deletes():
+    container = MagicMock()
+    container.execute_item_batch.side_effect = CosmosBatchOperationError(error_index=1, headers={}, status_code=404, message="Not Found")
+    container.delete_item.side_effect = [None, CosmosResourceNotFoundError(), None]
+
+    progress = []
+
+    deleted = BulkDeleter(container, progress=lambda done, total: progress.append((done, total))).delete_items(_items(3))
+
+    # the item already gone is not counted
+    assert deleted == 2
+    assert container.delete_item.call_count == 3
+    assert progress == [(2, 3)]
+
+
+def test_delete_where_reads_only_ids_and_partition_keys():
+    container = MagicMock()
+    container.query_items.return_value = _items(2)
+
+    deleted = BulkDeleter(container, progress=None).delete_where("c.cv.id = @file_id", [{"name": "@file_id", "value": "f"}], partition_key="user-1")
+
+    assert deleted == _items(2)
+    assert container.query_items.call_args[0][0] == "SELECT c.id, c.user_id FROM c WHERE c.cv.id = @file_id"
+    assert container.query_items.call_args.kwargs["partition_key"] == "user-1"
+
+
+def test_deleting_results_of_a_file_uses_batches_and_leaves_tombstones():
+    repository = MatchingResultsRepository.__new__(MatchingResultsRepository)
+    repository.container = MagicMock()
+    repository.tombstones = MagicMock()
+    repository.container.query_items.return_value = _items(120)
+
+    assert repository.delete_matching_results_by_file("user-1", "file-1") == 120
+
+    assert repository.container.execute_item_batch.call_count == 2
+    repository.container.delete_item.assert_not_called()
+    repository.tombstones.add.assert_called_once_with("user-1", SyncEntity.MATCHING_RESULT, [item["id"] for item in _items(120)])
+
+
+def test_delete_file_queues_clean_up_of_its_results():
+    file = FileMetadataDb(filename="cv.pdf", type="CV", user_id="user-1", url="https://storage/cv.pdf", blob_name="users/user-1/sha256/abc.pdf", sha256="abc")
+    files_repository = MagicMock()
+    files_repository.get_file_by_id.return_value = file
+    files_repository.count_files_with_blob.return_value = 0
+    queue_service = MagicMock()
+    claims = {"claims": [{"typ": "http://schemas.xmlsoap.org/ws/2005/05/identity/claims/nameidentifier", "val": "user-1"}]}
+    req = func.HttpRequest(
+        method="DELETE", url=f"/api/files/{file.id}", body=None, route_params={"file_id": str(file.id)},
+        headers={"X-MS-CLIENT-PRINCIPAL": base64.b64encode(json.dumps(claims).encode()).decode()}
+    )
+
+    response = _delete_file(req, MagicMock(), files_repository, cleanup_queue_service=queue_service)
+
+    assert response.status_code == 204
+    queue_name, message = queue_service.send_message.call_args[0]
+    assert queue_name == FILE_CLEANUP_QUEUE
+    assert json.loads(message) == {"file_id": str(file.id), "user_id": "user-1", "sha256": "abc"}
+
+
+def test_clean_up_deletes_results_of_the_file():
+    matching_results_repository = MagicMock()
+    matching_results_repository.delete_matching_results_by_file.return_value = 2000
+
+    assert _clean_up_deleted_file(FileCleanupMessage(file_id="file-1", user_id="user-1"), matching_results_repository) == 2000
+    matching_results_repository.delete_matching_results_by_file.assert_called_once_with("user-1", "file-1", None)
+
+
+def test_clean_up_keeps_results_of_a_file_uploaded_again():
+    message = FileCleanupMessage(file_id="file-1", user_id="user-1", sha256="old")
+    files_repository = MagicMock()
+    matching_results_repository = MagicMock()
+    matching_results_repository.delete_matching_results_by_file.return_value = 5
+
+    # uploaded again with new content: only the results of the deleted content go
+    files_repository.get_file_by_id.return_value = MagicMock(sha256="new")
+    assert _clean_up_deleted_file(message, matching_results_repository, files_repository) == 5
+    matching_results_repository.delete_matching_results_by_file.assert_called_once_with("user-1", "file-1", "old")
+
+    # uploaded again with the same content: its results are current
+    matching_results_repository.reset_mock()
+    files_repository.get_file_by_id.return_value = MagicMock(sha256="old")
+    assert _clean_up_deleted_file(message, matching_results_repository, files_repository) == 0
+    matching_results_repository.delete_matching_results_by_file.assert_not_called()
+
+
+def test_deleting_results_of_a_file_version_filters_on_its_sha256():
+    repository = MatchingResultsRepository.__new__(MatchingResultsRepository)
+    repository.container = MagicMock()
+    repository.tombstones = MagicMock()
+    repository.container.query_items.return_value = _items(1)
+
+    repository.delete_matching_results_by_file("user-1", "file-1", "abc")
+
+    query = repository.container.query_items.call_args[0][0]
+    assert "(c.cv.id = @file_id AND (c.cv.sha256 = @sha256 OR NOT IS_DEFINED(c.cv.sha256)))" in query
+    assert "(c.jd.id = @file_id AND (c.jd.sha256 = @sha256 OR NOT IS_DEFINED(c.jd.sha256)))" in query
+    assert {"name": "@sha256", "value": "abc"} in repository.container.query_items.call_args.kwargs["parameters"]
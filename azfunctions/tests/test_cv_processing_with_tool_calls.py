@@ -7,13 +7,14 @@ import sys
 import importlib
 
 import pytest
-from shared.models import FileType, FileMetadataDb
+from shared.models import FileType, FileMetadataDb, ProcessingState
 from shared.openai_service.openai_service import OpenAIService
 from shared.blob_service import FilesBlobService
 from shared.document_intelligence_service import DocumentIntelligenceService
 from shared.files_repository import FilesRepository
 from shared.queue_service import QueueService
-from file_processing.file_processing import _parse_queue_message, _extract_document_content, _create_file_metadata, _queue_for_matching
+from file_processing.file_processing import FileProcessingPipeline, PERSIST_QUEUE, _parse_stage_message, _extract_document_content, _create_file_metadata
+from file_processing.schemas import FileProcessingRequest
 
 class MockOpenAIServiceWithToolCalls:
     """Mock OpenAI service that returns responses with tool calls for CV analysis."""
@@ -182,8 +183,9 @@ def test_cv_processing_with_tool_calls():
     
     # Step 1: Parse the queue message
     print("Step 1: Parsing queue message")
-    request = _parse_queue_message(mock_msg)
-    assert str(request.id) == str(file_id)
+    message = _parse_stage_message(mock_msg)
+    assert str(message.file_id) == str(file_id)
+    request = FileProcessingRequest(**request_data)
     assert request.filename == "test_cv.pdf"
     print(f"Request parsed successfully: {request}")
     
@@ -289,18 +291,15 @@ def test_cv_processing_with_tool_calls():
         assert saved_metadata["type"] == "CV"
         print("Repository operations completed successfully")
         
-        # Step 6: Test queue service
-        print("Step 6: Testing queue service")
-        mock_queue_service = MagicMock(spec=QueueService)
-        
-        # Patch the QueueService in the _queue_for_matching function
-        with patch('file_processing.file_processing.QueueService', return_value=mock_queue_service):
-            _queue_for_matching(str(file_id), "test_user", file_type)
-            
-            # Assert expected behavior for queue service
-            assert mock_queue_service.create_queue_if_not_exists.call_count == 1
-            assert mock_queue_service.send_message.call_count == 1
-            print("Queue service operations completed successfully")
+        # Step 6: Test the matching message the persist stage writes to the outbox
+        print("Step 6: Testing the matching message")
+        pipeline = FileProcessingPipeline(mock_repository, mock_blob_service, MagicMock(), MagicMock(spec=QueueService))
+        outbox = pipeline._outbox_for(file_metadata, ProcessingState.QUEUED, PERSIST_QUEUE)
+        assert [entry["queue"] for entry in outbox] == ["matching-queue"]
+        matching_message = json.loads(outbox[0]["body"])
+        assert matching_message["file_id"] == str(file_id)
+        assert matching_message["type"] == file_type.value
+        print("Matching message written successfully")
         
         print("All steps of CV file processing with tool calls tested successfully!")
         
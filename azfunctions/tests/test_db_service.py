@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from shared import db_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_handles(monkeypatch):
+    monkeypatch.setattr(db_service, "_database", None)
+    monkeypatch.setattr(db_service, "_containers", {})
+    monkeypatch.delenv("COSMOS_PROVISION_CONTAINERS", raising=False)
+
+
+def _database(database_id="db"):
+    database = MagicMock()
+    database.id = database_id
+    return database
+
+
+def test_get_cosmos_db_client_creates_client_once(monkeypatch):
+    monkeypatch.setenv("COSMOS_DB_NAME", "db")
+    with patch.object(db_service, "CosmosClient") as cosmos_client:
+        first = db_service.get_cosmos_db_client()
+        second = db_service.get_cosmos_db_client()
+
+    assert first is second
+    cosmos_client.assert_called_once()
+    cosmos_client.return_value.create_database_if_not_exists.assert_called_once_with("db")
+
+
+def test_get_container_provisions_once_per_process():
+    database = _database()
+
+    first = db_service.get_container(database, "files", partition_key="/user_id")
+    second = db_service.get_container(database, "files", partition_key="/user_id")
+
+    assert first is second
+    database.create_container_if_not_exists.assert_called_once_with(id="files", partition_key="/user_id")
+
+
+def test_get_container_skips_provisioning_when_disabled(monkeypatch):
+    monkeypatch.setenv("COSMOS_PROVISION_CONTAINERS", "false")
+    database = _database()
+
+    container = db_service.get_container(database, "files", partition_key="/user_id")
+
+    assert container is database.get_container_client.return_value
+    database.create_container_if_not_exists.assert_not_called()
@@ -0,0 +1,73 @@
+import io
+import json
+
+from docx import Document
+
+from shared.docx_service import DocxService
+from shared.models import DocumentLayout, DocumentPage, FileMetadataDb, Line, TableCell
+
+
+def _docx_structured_info(paragraph_count: int = 200) -> dict:
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Jane Doe"
+    for i in range(paragraph_count):
+        doc.add_paragraph(f"Delivered project {i} with Python, Azure Functions and Cosmos DB", style='Heading 1' if i % 10 == 0 else None)
+    table = doc.add_table(rows=2, cols=2)
+    for row_idx, row in enumerate(table.rows):
+        for col_idx, cell in enumerate(row.cells):
+            cell.text = f"cell {row_idx} {col_idx}"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return DocxService.get_text_from_docx(buffer.getvalue())
+
+
+def test_layout_round_trips_docx_structure():
+    info = _docx_structured_info()
+    layout = DocumentLayout.from_structure(info['text'], info['pages'], info['paragraphs'], info['tables'])
+
+    assert layout.extra_text == ""
+    assert layout.get_pages(info['text'], info['tables']) == info['pages']
+    assert layout.get_paragraphs(info['text']) == info['paragraphs']
+
+
+def test_layout_keeps_fragments_missing_from_text():
+    text = "Python Developer\nAzure"
+    pages = [DocumentPage(
+        page_number=1,
+        content="Python Developer\nAzure",
+        lines=[Line(content="Python Developer", style="style_0"), Line(content="Azure"), Line(content="Footer note")],
+        tables=[[[TableCell(text="Skill")]]]
+    )]
+    tables = [[[TableCell(text="Skill")]]]
+    layout = DocumentLayout.from_structure(text, pages, ["Azure", "Footer note"], tables)
+
+    assert layout.extra_text == "Footer note"
+    assert layout.get_pages(text, tables) == pages
+    assert layout.get_paragraphs(text) == ["Azure", "Footer note"]
+
+
+def test_file_metadata_accessors_and_stored_size():
+    info = _docx_structured_info()
+    inline = FileMetadataDb(filename="cv.docx", type="CV", user_id="user", url="https://blob/cv.docx", **info)
+    compact = FileMetadataDb(
+        filename="cv.docx", type="CV", user_id="user", url="https://blob/cv.docx",
+        text=info['text'], tables=info['tables'], styles=info['styles'],
+        layout=DocumentLayout.from_structure(info['text'], info['pages'], info['paragraphs'], info['tables'])
+    )
+
+    assert compact.get_pages() == inline.get_pages()
+    assert compact.get_paragraphs() == inline.get_paragraphs()
+
+    inline_size = len(json.dumps(inline.model_dump(mode="json", exclude_none=True)))
+    compact_size = len(json.dumps(compact.model_dump(mode="json", exclude_none=True)))
+    assert compact_size * 2 < inline_size
+
+
+def test_layout_keeps_identical_tables_apart():
+    table = [[TableCell(text="Skill"), TableCell(text="Python")]]
+    tables = [table, [[TableCell(text="Skill"), TableCell(text="Python")]]]
+    pages = [DocumentPage(page_number=1, content="Tables", lines=[Line(content="Tables")], tables=tables)]
+    layout = DocumentLayout.from_structure("Tables", pages, [], tables)
+
+    assert layout.pages[0].table_indices == [0, 1]
+    assert layout.get_pages("Tables", tables) == pages
@@ -0,0 +1,89 @@
+import io
+
+import pytest
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.shared import Pt
+
+from shared.docx_service import DocxService
+from shared.docx_stream_service import DocxStreamService
+
+
+def _save(doc) -> bytes:
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def sample_docx() -> bytes:
+    doc = Document()
+    doc.styles['Heading 1'].font.size = Pt(18)
+    doc.styles['Heading 1'].font.bold = True
+    doc.sections[0].header.paragraphs[0].text = "John Doe - Curriculum Vitae"
+    doc.sections[0].footer.paragraphs[0].text = "Page footer"
+
+    doc.add_paragraph("Professional Experience", style='Heading 1')
+    paragraph = doc.add_paragraph("Senior Developer\tat Acme")
+    paragraph.add_run().add_break()
+    paragraph.add_run("Built things")
+    doc.add_paragraph("   ")
+
+    table = doc.add_table(rows=3, cols=3)
+    for row_idx, row in enumerate(table.rows):
+        for col_idx, cell in enumerate(row.cells):
+            cell.text = f"r{row_idx}c{col_idx}"
+    table.cell(0, 0).merge(table.cell(0, 1))
+    table.cell(1, 2).merge(table.cell(2, 2))
+    table.cell(1, 0).add_paragraph("second line")
+
+    doc.add_section(WD_SECTION.NEW_PAGE)
+    doc.add_paragraph("Education", style='Heading 1')
+    doc.add_paragraph("MSc Computer Science")
+    return _save(doc)
+
+
+def _plain(structured_info: dict) -> dict:
+    return {
+        key: [item.model_dump() if hasattr(item, 'model_dump') else item for item in value]
+        if isinstance(value, list) else value
+        for key, value in structured_info.items()
+        if key != 'styles'
+    }
+
+
+def test_stream_extractor_matches_python_docx(sample_docx):
+    expected = DocxService.get_text_from_docx(sample_docx)
+    actual = DocxStreamService.get_text_from_docx(sample_docx)
+
+    assert actual['text'] == expected['text']
+    assert actual['paragraphs'] == expected['paragraphs']
+    assert actual['headers'] == expected['headers']
+    assert actual['footers'] == expected['footers']
+    assert [[[c.text for c in row] for row in t] for t in actual['tables']] == \
+        [[[c.text for c in row] for row in t] for t in expected['tables']]
+    assert _plain(actual) == _plain(expected)
+
+
+def test_stream_extractor_resolves_paragraph_styles(sample_docx):
+    expected = DocxService.get_text_from_docx(sample_docx)
+    actual = DocxStreamService.get_text_from_docx(sample_docx)
+
+    def styles_by_line(structured_info):
+        styles = structured_info['styles']
+        return [
+            styles[line.style].model_dump(exclude={'name'}) if line.style else None
+            for line in structured_info['pages'][0].lines
+        ]
+
+    assert styles_by_line(actual) == styles_by_line(expected)
+    heading = actual['pages'][0].lines[0]
+    assert actual['styles'][heading.style].font_size == 18.0
+    assert actual['styles'][heading.style].is_bold is True
+
+
+def test_stream_extractor_handles_empty_document():
+    content = _save(Document())
+    expected = DocxService.get_text_from_docx(content)
+    actual = DocxStreamService.get_text_from_docx(content)
+    assert _plain(actual) == _plain(expected)
@@ -0,0 +1,93 @@
+import gzip
+from unittest.mock import MagicMock
+
+import pytest
+
+from shared.blob_service import FilesBlobService
+from shared.extraction_store import FileExtractionStore
+from shared.models import DocumentPage, FileMetadataDb, Line, TableCell
+from shared.openai_service.models import DocumentAnalysis, DocumentStructure
+
+
+@pytest.fixture
+def blob_service():
+    blobs = {}
+    service = MagicMock(spec=FilesBlobService)
+    service.upload_blob.side_effect = lambda container_name, filename, content: blobs.__setitem__((container_name, filename), content)
+    service.get_file_content.side_effect = lambda container_name, filename: blobs[(container_name, filename)]
+    service.delete_blob.side_effect = lambda container_name, filename: blobs.pop((container_name, filename))
+    service.blobs = blobs
+    return service
+
+
+@pytest.fixture
+def processed_file() -> FileMetadataDb:
+    return FileMetadataDb(
+        user_id="user-1",
+        filename="cv.pdf",
+        type="CV",
+        url="https://blob/cv.pdf",
+        text="Python Developer\nAzure",
+        pages=[DocumentPage(page_number=1, content="Python Developer\nAzure",
+                            lines=[Line(content="Python Developer"), Line(content="Azure")])],
+        paragraphs=["Python Developer", "Azure"],
+        tables=[[[TableCell(text="Skill"), TableCell(text="Python")]]],
+        document_analysis=DocumentAnalysis(
+            document_type="CV",
+            structure=DocumentStructure(
+                personal_details=[{"type": "name", "text": "Jane"}],
+                professional_summary="Developer",
+                skills=["Python"],
+                experience=[],
+                education=[]
+            )
+        )
+    )
+
+
+def test_save_returns_slim_document(blob_service, processed_file):
+    store = FileExtractionStore(blob_service)
+    slim = store.save(processed_file)
+
+    assert slim.text is None
+    assert slim.pages is None
+    assert slim.document_analysis is None
+    assert slim.extraction_blob == f"user-1/{processed_file.id}.json.gz"
+    assert len(slim.extraction_hash) == 64
+    assert slim.filename == processed_file.filename
+    blob = blob_service.blobs[(FileExtractionStore.container_name, slim.extraction_blob)]
+    assert b"Python Developer" in gzip.decompress(blob)
+
+
+def test_load_restores_extraction(blob_service, processed_file):
+    store = FileExtractionStore(blob_service)
+    slim = FileMetadataDb(**store.save(processed_file).model_dump(mode="json"))
+
+    loaded = store.load(slim)
+
+    assert loaded.text == processed_file.text
+    assert loaded.pages == processed_file.pages
+    assert loaded.tables == processed_file.tables
+    assert loaded.document_analysis.structure.skills == ["Python"]
+
+
+def test_load_rejects_hash_mismatch(blob_service, processed_file):
+    store = FileExtractionStore(blob_service)
+    slim = store.save(processed_file)
+    slim.extraction_hash = "0" * 64
+
+    with pytest.raises(ValueError):
+        store.load(slim)
+
+
+def test_inline_documents_are_returned_unchanged(blob_service, processed_file):
+    store = FileExtractionStore(blob_service)
+    assert store.load(processed_file) is processed_file
+    blob_service.get_file_content.assert_not_called()
+
+
+def test_delete_removes_sidecar(blob_service, processed_file):
+    store = FileExtractionStore(blob_service)
+    slim = store.save(processed_file)
+    store.delete(slim)
+    assert blob_service.blobs == {}
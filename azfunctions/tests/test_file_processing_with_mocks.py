@@ -7,13 +7,15 @@ import sys
 import importlib
 
 import pytest
-from shared.models import FileType, FileMetadataDb
+from shared.models import FileStage, FileType, FileMetadataDb, ProcessingState
 from shared.openai_service.openai_service import OpenAIService
 from shared.blob_service import FilesBlobService
 from shared.document_intelligence_service import DocumentIntelligenceService
 from shared.files_repository import FilesRepository
 from shared.queue_service import QueueService
-from file_processing.file_processing import _parse_queue_message, _extract_document_content, _create_file_metadata, _queue_for_matching
+from file_processing.file_processing import FileProcessingPipeline, _parse_stage_message, _extract_document_content, _create_file_metadata, _reuse_processed_duplicate, ANALYZE_QUEUE, CHANGE_FEED_TRIGGER, EXTRACT_QUEUE, PERSIST_QUEUE
+from file_processing.local_runner import LocalPipelineRunner
+from file_processing.schemas import FileProcessingRequest, FileStageMessage
 
 class MockOpenAIService:
     """Mock OpenAI service that returns a predetermined response."""
@@ -112,8 +114,9 @@ def test_file_processing_core_workflow():
     
     # Step 1: Parse the queue message
     print("Step 1: Parsing queue message")
-    request = _parse_queue_message(mock_msg)
-    assert str(request.id) == str(file_id)
+    message = _parse_stage_message(mock_msg)
+    assert str(message.file_id) == str(file_id)
+    request = FileProcessingRequest(**request_data)
     assert request.filename == "test_jd.docx"
     print(f"Request parsed successfully: {request}")
     
@@ -214,18 +217,15 @@ def test_file_processing_core_workflow():
         assert saved_metadata["type"] == "JD"
         print("Repository operations completed successfully")
         
-        # Step 6: Test queue service
-        print("Step 6: Testing queue service")
-        mock_queue_service = MagicMock(spec=QueueService)
-        
-        # Patch the QueueService in the _queue_for_matching function
-        with patch('file_processing.file_processing.QueueService', return_value=mock_queue_service):
-            _queue_for_matching(str(file_id), "test_user", file_type)
-            
-            # Assert expected behavior for queue service
-            assert mock_queue_service.create_queue_if_not_exists.call_count == 1
-            assert mock_queue_service.send_message.call_count == 1
-            print("Queue service operations completed successfully")
+        # Step 6: Test the matching message the persist stage writes to the outbox
+        print("Step 6: Testing the matching message")
+        pipeline = FileProcessingPipeline(mock_repository, mock_blob_service, MagicMock(), MagicMock(spec=QueueService))
+        outbox = pipeline._outbox_for(file_metadata, ProcessingState.QUEUED, PERSIST_QUEUE)
+        assert [entry["queue"] for entry in outbox] == ["matching-queue"]
+        matching_message = json.loads(outbox[0]["body"])
+        assert matching_message["file_id"] == str(file_id)
+        assert matching_message["type"] == file_type.value
+        print("Matching message written successfully")
         
         print("All steps of file processing tested successfully!")
         
@@ -233,5 +233,184 @@ def test_file_processing_core_workflow():
         # Restore original method
         DocxService.get_text_from_docx = original_get_text
 
+def test_reuse_processed_duplicate_copies_extraction_of_same_content():
+    """A file whose content was already processed under another filename is not analyzed again."""
+    analysis = MockOpenAIService().analyze_document("", [], [])
+    duplicate = FileMetadataDb(
+        filename="original.docx", type=FileType.JD, user_id="test_user", url="https://original",
+        sha256="abc", extraction_blob="test_user/original.json.gz"
+    )
+    repository = MagicMock(spec=FilesRepository)
+    repository.find_processed_file_by_sha256.return_value = duplicate
+    extraction_store = MagicMock()
+    extraction_store.load.return_value = duplicate.model_copy(update={"text": "Job text", "document_analysis": analysis})
+    request = FileProcessingRequest(
+        filename="copy.docx", type="JD", user_id="test_user", url="https://copy", sha256="abc"
+    )
+
+    file_metadata = _reuse_processed_duplicate(request, repository, extraction_store)
+
+    repository.find_processed_file_by_sha256.assert_called_once_with("test_user", "abc", exclude_id=request.id)
+    assert file_metadata.id == request.id and file_metadata.filename == "copy.docx"
+    assert file_metadata.text == "Job text" and file_metadata.document_analysis == analysis
+    assert file_metadata.extraction_blob is None
+
+
+def test_reuse_processed_duplicate_requires_hash():
+    repository = MagicMock(spec=FilesRepository)
+    request = FileProcessingRequest(filename="cv.docx", type="CV", user_id="test_user", url="https://cv")
+
+    assert _reuse_processed_duplicate(request, repository, MagicMock()) is None
+    repository.find_processed_file_by_sha256.assert_not_called()
+
+
+class InMemoryProcessingRepository:
+    """Files repository double that keeps one file document and applies state patches."""
+
+    def __init__(self, file: FileMetadataDb):
+        self.file = file
+        self.transitions = []
+        self.outbox = []
+
+    def get_file_by_id(self, user_id, file_id):
+        return self.file.model_copy()
+
+    def find_processed_file_by_sha256(self, user_id, sha256, exclude_id=None):
+        return None
+
+    def advance_processing_state(self, user_id, file_id, from_state, to_state, sha256=None, outbox=None, **fields):
+        if (self.file.processing_state or ProcessingState.UPLOADED) != from_state or (sha256 and self.file.sha256 != sha256):
+            return False
+        self.file = self.file.model_copy(update={"processing_state": to_state, **fields})
+        self.transitions.append(to_state)
+        self.outbox = outbox or []
+        return True
+
+    def clear_outbox(self, user_id, file_id, messages):
+        if [message.id for message in messages] != [message["id"] for message in self.outbox]:
+            return False
+        self.outbox = []
+        return True
+
+
+class InMemoryExtractionStore:
+    def __init__(self):
+        self.saved = None
+
+    def save(self, file):
+        self.saved = file.model_copy()
+        return file.model_copy(update={"text": None, "document_analysis": None, "extraction_blob": "sidecar", "extraction_hash": "hash"})
+
+    def load(self, file):
+        return self.saved.model_copy(update={"extraction_blob": file.extraction_blob})
+
+
+def _stage_message(file: FileMetadataDb, sha256=None) -> FileStageMessage:
+    return FileStageMessage(file_id=file.id, user_id=file.user_id, sha256=sha256 or file.sha256)
+
+
+def _uploaded_file(state=ProcessingState.UPLOADED) -> FileMetadataDb:
+    return FileMetadataDb(
+        filename="test_jd.docx", type=FileType.JD, user_id="test_user", url="https://jd",
+        sha256="abc", processing_state=state
+    )
+
+
+def test_local_runner_drives_every_stage():
+    file = _uploaded_file()
+    repository = InMemoryProcessingRepository(file)
+    blob_service = MagicMock(container_name="files")
+    blob_service.get_file_content.return_value = b"docx"
+    runner = LocalPipelineRunner(repository, blob_service, InMemoryExtractionStore())
+
+    with patch("file_processing.file_processing._extract_document_content", return_value={"text": "Job text"}) as extract, \
+            patch("file_processing.file_processing.OpenAIService", return_value=MockOpenAIService()), \
+            patch("file_processing.file_processing._get_document_intelligence_service"):
+        delivered = runner.run(_stage_message(file))
+
+    assert [queue for queue, _ in delivered] == [EXTRACT_QUEUE, ANALYZE_QUEUE, PERSIST_QUEUE]
+    # stage messages are claim checks: ids and the content hash only
+    assert json.loads(delivered[1][1]) == {"file_id": str(file.id), "user_id": "test_user", "sha256": "abc"}
+    assert repository.transitions == [
+        ProcessingState.EXTRACTED, ProcessingState.ANALYZED, ProcessingState.PERSISTED, ProcessingState.QUEUED
+    ]
+    extract.assert_called_once()
+    assert [queue for queue, _ in runner.queue_service.messages] == ["matching-queue"]
+    # every message was sent from the outbox written with its state
+    assert repository.outbox == []
+
+
+def test_stage_message_survives_a_failed_send_in_the_outbox():
+    file = _uploaded_file(ProcessingState.ANALYZED)
+    repository = InMemoryProcessingRepository(file)
+    runner = LocalPipelineRunner(repository, MagicMock(), InMemoryExtractionStore())
+    runner.queue_service.send_messages = MagicMock(side_effect=RuntimeError("queue unavailable"))
+
+    runner.run(_stage_message(file), PERSIST_QUEUE)
+
+    assert repository.transitions == [ProcessingState.PERSISTED, ProcessingState.QUEUED]
+    assert [message["queue"] for message in repository.outbox] == ["matching-queue"]
+    assert json.loads(repository.outbox[0]["body"])["file_id"] == str(file.id)
+
+
+def test_change_feed_trigger_leaves_matching_to_the_feed():
+    file = _uploaded_file(ProcessingState.ANALYZED)
+    repository = InMemoryProcessingRepository(file)
+    runner = LocalPipelineRunner(repository, MagicMock(), InMemoryExtractionStore(), matching_trigger=CHANGE_FEED_TRIGGER)
+
+    delivered = runner.run(_stage_message(file), PERSIST_QUEUE)
+
+    assert [queue for queue, _ in delivered] == [PERSIST_QUEUE]
+    assert repository.transitions == [ProcessingState.PERSISTED]
+    assert runner.queue_service.messages == []
+
+
+def test_stages_report_status_and_errors():
+    file = _uploaded_file()
+    status_repository = MagicMock()
+    blob_service = MagicMock(container_name="files")
+    blob_service.get_file_content.return_value = b"docx"
+    runner = LocalPipelineRunner(InMemoryProcessingRepository(file), blob_service, InMemoryExtractionStore(), status_repository)
+
+    with patch("file_processing.file_processing._extract_document_content", return_value={"text": "Job text"}), \
+            patch("file_processing.file_processing._get_document_intelligence_service"), \
+            patch("file_processing.file_processing.OpenAIService") as openai_service:
+        openai_service.return_value.analyze_document.side_effect = RuntimeError("rate limited")
+        with pytest.raises(RuntimeError):
+            runner.run(_stage_message(file))
+
+    status_repository.set_stage.assert_called_once_with("test_user", file.id, FileStage.EXTRACTED)
+    status_repository.set_error.assert_called_once_with("test_user", file.id, "analyze-queue failed: rate limited")
+
+
+def test_stage_forwards_file_to_the_stage_of_its_next_step():
+    file = _uploaded_file(ProcessingState.PERSISTED)
+    repository = InMemoryProcessingRepository(file)
+    blob_service = MagicMock(container_name="files")
+    runner = LocalPipelineRunner(repository, blob_service, InMemoryExtractionStore())
+
+    with patch("file_processing.file_processing._extract_document_content") as extract, \
+            patch("file_processing.file_processing.OpenAIService") as openai_service:
+        delivered = runner.run(_stage_message(file))
+
+    assert [queue for queue, _ in delivered] == [EXTRACT_QUEUE, PERSIST_QUEUE]
+    extract.assert_not_called()
+    openai_service.assert_not_called()
+    blob_service.get_file_content.assert_not_called()
+    assert repository.transitions == [ProcessingState.QUEUED]
+
+
+def test_stage_ignores_completed_and_stale_messages():
+    for file, sha256 in [(_uploaded_file(ProcessingState.QUEUED), "abc"), (_uploaded_file(), "old")]:
+        repository = InMemoryProcessingRepository(file)
+        runner = LocalPipelineRunner(repository, MagicMock(), InMemoryExtractionStore())
+
+        delivered = runner.run(_stage_message(file, sha256))
+
+        assert len(delivered) == 1
+        assert runner.queue_service.messages == []
+        assert repository.transitions == []
+
+
 if __name__ == "__main__":
     test_file_processing_core_workflow() 
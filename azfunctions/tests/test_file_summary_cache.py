@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from shared import file_summary_cache
+from shared.file_summary_cache import get_file_summaries, invalidate_file_summary, join_file_summaries
+from shared.models import FileSummaryDb
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(file_summary_cache, "_summaries", file_summary_cache.OrderedDict())
+
+
+def _summary(file_type="CV", sha256=None):
+    return FileSummaryDb(id=uuid4(), filename=f"{file_type.lower()}.pdf", type=file_type, user_id="user-1", url="https://storage/f.pdf", sha256=sha256)
+
+
+def _result(cv_id, jd_id, cv_sha256="abc", jd_sha256="def"):
+    return {"id": str(uuid4()), "cv": {"id": str(cv_id), "sha256": cv_sha256}, "jd": {"id": str(jd_id), "sha256": jd_sha256}}
+
+
+def test_summaries_are_read_once_and_then_served_from_cache():
+    cv, jd = _summary("CV"), _summary("JD")
+    files_repository = MagicMock()
+    files_repository.get_file_summaries.return_value = [cv, jd]
+
+    first = get_file_summaries(files_repository, "user-1", [cv.id, jd.id, cv.id])
+    second = get_file_summaries(files_repository, "user-1", [cv.id, jd.id])
+
+    assert first == second == {str(cv.id): cv, str(jd.id): jd}
+    files_repository.get_file_summaries.assert_called_once()
+    assert sorted(files_repository.get_file_summaries.call_args[0][1]) == sorted([str(cv.id), str(jd.id)])
+
+
+def test_invalidated_summary_is_read_again():
+    cv = _summary()
+    files_repository = MagicMock()
+    files_repository.get_file_summaries.return_value = [cv]
+    get_file_summaries(files_repository, "user-1", [cv.id])
+
+    invalidate_file_summary("user-1", cv.id)
+    get_file_summaries(files_repository, "user-1", [cv.id])
+
+    assert files_repository.get_file_summaries.call_count == 2
+
+
+def test_join_fills_references_and_drops_results_of_deleted_files():
+    cv, jd = _summary("CV"), _summary("JD")
+    files_repository = MagicMock()
+    files_repository.get_file_summaries.return_value = [cv, jd]
+    kept = _result(cv.id, jd.id)
+    orphan = _result(cv.id, uuid4())
+    legacy = _result(cv.id, uuid4())
+    legacy["jd"].update(filename="old.pdf", type="JD", url="https://storage/old.pdf")
+
+    joined = join_file_summaries(files_repository, "user-1", [kept, orphan, legacy])
+
+    assert [result["id"] for result in joined] == [kept["id"], legacy["id"]]
+    assert joined[0]["cv"]["filename"] == "cv.pdf" and joined[0]["cv"]["sha256"] == "abc"
+    assert joined[1]["jd"]["filename"] == "old.pdf"
+
+
+def test_read_overlapping_an_invalidation_is_not_cached():
+    cv = _summary()
+    files_repository = MagicMock()
+
+    def read_while_the_file_is_written(user_id, file_ids):
+        invalidate_file_summary("user-1", cv.id)
+        return [cv]
+    files_repository.get_file_summaries.side_effect = read_while_the_file_is_written
+
+    assert get_file_summaries(files_repository, "user-1", [cv.id]) == {str(cv.id): cv}
+    get_file_summaries(files_repository, "user-1", [cv.id])
+
+    assert files_repository.get_file_summaries.call_count == 2
+
+
+def test_join_drops_results_computed_from_replaced_content():
+    cv, jd = _summary("CV", sha256="new"), _summary("JD", sha256="def")
+    files_repository = MagicMock()
+    files_repository.get_file_summaries.return_value = [cv, jd]
+    current = _result(cv.id, jd.id, cv_sha256="new")
+    stale = _result(cv.id, jd.id, cv_sha256="old")
+
+    joined = join_file_summaries(files_repository, "user-1", [current, stale])
+
+    assert [result["id"] for result in joined] == [current["id"]]
+    # the result keeps the version it was computed from
+    assert joined[0]["cv"]["sha256"] == "new" and joined[0]["jd"]["sha256"] == "def"
@@ -8,20 +8,22 @@ import pytest
 from azure.cosmos import CosmosClient
 from dotenv import load_dotenv
 import base64
+import hashlib
 import azure.core.exceptions
 import re
 from unittest.mock import MagicMock
 from shared.queue_service import QueueService
-from shared.mock_queue_service import MockQueueService
-from shared.blob_service import FilesBlobService
+from shared.blob_service import FilesBlobService, UploadedBlob
 from shared.files_repository import FilesRepository
 
 # add project root to sys.path
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from file_upload.file_upload import _files_upload
+from file_upload.file_upload import _complete_upload, _create_upload_urls, _files_upload
+from shared.natural_keys import file_id_for
 from shared.models import FileMetadataDb, FileType
+from shared.outbox import OutboxDispatcher
 from shared.user_repository import UserRepository
 from users.models import UserDb
 
@@ -225,9 +227,6 @@ def test_user(user_repository) -> UserDb:
     return user_repository.create_user(user.model_dump())
 
 def test_file_upload_success(repository, user_repository, blob_service, test_user, monkeypatch):
-    # Mock QueueService
-    monkeypatch.setattr('file_upload.file_upload.QueueService', DummyQueueService)
-    
     # Create mock file
     filename = f'test_{uuid4()}.pdf'
     mock_file = MockFile(filename)
@@ -267,8 +266,9 @@ def test_file_upload_success(repository, user_repository, blob_service, test_use
         assert len(files) == 1
         assert files[0].filename == filename
         
-        # Verify file exists in blob storage
-        assert blob_service.blob_exists(TEST_CONTAINER_NAME, filename)
+        # Verify file exists in blob storage under its content hash
+        assert files[0].blob_name.startswith(f"users/{test_user.userId}/sha256/")
+        assert blob_service.blob_exists(TEST_CONTAINER_NAME, files[0].blob_name)
         
         # Verify user's file count was incremented
         updated_user = user_repository.get_user(test_user.userId)
@@ -336,9 +336,6 @@ def test_file_upload_raw_bytes_missing_filename(repository, user_repository, blo
     assert "Invalid request: Filename not provided" == error_response
 
 def test_file_upload_limit_reached(repository, user_repository, blob_service, test_user, monkeypatch):
-    # Mock QueueService
-    monkeypatch.setattr('file_upload.file_upload.QueueService', DummyQueueService)
-    
     # Override container name for test
     original_container = blob_service.container_name
     blob_service.container_name = TEST_CONTAINER_NAME
@@ -394,9 +391,6 @@ def test_file_upload_limit_reached(repository, user_repository, blob_service, te
         blob_service.container_name = original_container
 
 def test_file_upload_user_not_found(repository, user_repository, blob_service, monkeypatch):
-    # Mock QueueService
-    monkeypatch.setattr('file_upload.file_upload.QueueService', DummyQueueService)
-    
     # Create mock file
     mock_file = type('MockFile', (), {
         'filename': f'test_{uuid4()}.pdf',
@@ -492,9 +486,6 @@ def test_file_upload_no_files(repository, user_repository, blob_service, test_us
     assert updated_user.filesCount == 0
 
 def test_file_upload_with_content_disposition(repository, user_repository, blob_service, test_user, monkeypatch):
-    # Mock QueueService
-    monkeypatch.setattr('file_upload.file_upload.QueueService', MockQueueService)
-    
     # Create mock file
     filename = "CV_Gleb F.-Fullstack_Developer.pdf"
     headers = {'Content-Disposition': f'form-data; name="content"; filename="{filename}"'}
@@ -530,8 +521,9 @@ def test_file_upload_with_content_disposition(repository, user_repository, blob_
         assert len(files) == 1
         assert files[0].filename == filename
         
-        # Verify file exists in blob storage
-        assert blob_service.blob_exists(TEST_CONTAINER_NAME, filename)
+        # Verify file exists in blob storage under its content hash
+        assert files[0].blob_name.startswith(f"users/{test_user.userId}/sha256/")
+        assert blob_service.blob_exists(TEST_CONTAINER_NAME, files[0].blob_name)
         
         # Verify user's file count was incremented
         updated_user = user_repository.get_user(test_user.userId)
@@ -541,9 +533,6 @@ def test_file_upload_with_content_disposition(repository, user_repository, blob_
         blob_service.container_name = original_container
 
 def test_file_upload_with_form_data_boundary(repository, user_repository, blob_service, test_user, monkeypatch):
-    # Mock QueueService
-    monkeypatch.setattr('file_upload.file_upload.QueueService', MockQueueService)
-    
     # Create request with exact same format as the cURL request
     filename = "CV_Gleb F.-Fullstack_Developer.pdf"
     content = b'test content'  # In real request this would be PDF content
@@ -591,8 +580,9 @@ def test_file_upload_with_form_data_boundary(repository, user_repository, blob_s
         assert len(files) == 1
         assert files[0].filename == filename
         
-        # Verify file exists in blob storage
-        assert blob_service.blob_exists(TEST_CONTAINER_NAME, filename)
+        # Verify file exists in blob storage under its content hash
+        assert files[0].blob_name.startswith(f"users/{test_user.userId}/sha256/")
+        assert blob_service.blob_exists(TEST_CONTAINER_NAME, files[0].blob_name)
         
         # Verify user's file count was incremented
         updated_user = user_repository.get_user(test_user.userId)
@@ -601,20 +591,7 @@ def test_file_upload_with_form_data_boundary(repository, user_repository, blob_s
         # Restore original container name
         blob_service.container_name = original_container
 
-class DummyQueueService:
-    def __init__(self, connection_string=None):
-        pass
-
-    def create_queue_if_not_exists(self, queue_name):
-        pass
-
-    def send_message(self, queue_name, message):
-        pass
-
 def test_file_upload_bytes_with_content_disposition(monkeypatch):
-    # Mock QueueService
-    monkeypatch.setattr('file_upload.file_upload.QueueService', MockQueueService)
-    
     # Setup dummy dependencies
     repository = DummyFilesRepository()
     user_repository = DummyUserRepository()
@@ -650,11 +627,237 @@ def test_file_upload_bytes_with_content_disposition(monkeypatch):
     assert len(result['files']) == 1
     assert result['files'][0]['filename'] == filename
 
+def test_file_upload_reports_per_file_status(monkeypatch):
+    class FailingBlobService(DummyBlobService):
+        def upload_blob_stream(self, container_name, filename, content, max_size=None):
+            if getattr(content, 'filename', None) == 'broken.pdf':
+                raise RuntimeError('upload failed')
+            return super().upload_blob_stream(container_name, filename, content, max_size)
+
+    released = []
+    user_repository = DummyUserRepository()
+    user_repository.decrement_files_count = lambda user_id, count=1: released.append(count)
+
+    req = MockHttpRequest(method='POST', url='/api/files/upload', params={}, body=None)
+    req.files = MockFiles({'content': [MockFile('first.pdf'), MockFile('broken.pdf'), MockFile('second.pdf')]})
+    req.form = {'type': 'CV'}
+    req.headers = {'X-MS-CLIENT-PRINCIPAL': create_mock_b2c_token('12345')}
+
+    files_repository = DummyFilesRepository()
+    response = _files_upload(req, FailingBlobService(), files_repository, user_repository)
+
+    assert response.status_code == 207
+    result = json.loads(response.get_body())
+    assert [f['filename'] for f in result['files']] == ['first.pdf', 'second.pdf']
+    assert result['failed'] == [{'filename': 'broken.pdf', 'error': 'upload failed'}]
+    # only the successful files are queued, through their outbox, and the failed slot is released
+    assert [len(document['outbox']) for document in files_repository.saved] == [1, 1]
+    assert released == [1]
+
+def _json_request(url, body, user_id='12345', route_params=None):
+    return func.HttpRequest(
+        method='POST',
+        url=url,
+        body=json.dumps(body).encode(),
+        route_params=route_params or {},
+        headers={'X-MS-CLIENT-PRINCIPAL': create_mock_b2c_token(user_id)}
+    )
+
+def test_create_upload_urls_returns_per_user_sas_urls():
+    blob_service = MagicMock(container_name='resume-match-pro-files')
+    blob_service.generate_upload_url.side_effect = lambda container, blob_name, expires_on: f'https://storage/{blob_name}?sas'
+    req = _json_request('/api/files/upload-url', {'files': [{'filename': 'cv.pdf', 'type': 'CV'}]})
+
+    response = _create_upload_urls(req, blob_service, DummyUserRepository())
+
+    assert response.status_code == 200
+    upload = json.loads(response.get_body())['uploads'][0]
+    assert upload['id'] == str(file_id_for('12345', 'cv.pdf'))
+    assert upload['blob_name'].startswith('users/12345/')
+    assert upload['upload_url'] == f"https://storage/{upload['blob_name']}?sas"
+
+def test_create_upload_urls_rejects_unsupported_type():
+    req = _json_request('/api/files/upload-url', {'files': [{'filename': 'cv.exe', 'type': 'CV'}]})
+
+    response = _create_upload_urls(req, MagicMock(), DummyUserRepository())
+
+    assert response.status_code == 400
+
+def test_complete_upload_rejects_wrong_magic_bytes():
+    blob_service = MagicMock(container_name='resume-match-pro-files')
+    blob_service.get_blob_size.return_value = 100
+    blob_service.read_blob_range.return_value = b'MZ\x90\x00\x03'
+    file_id = str(file_id_for('12345', 'cv.pdf'))
+    req = _json_request(f'/api/files/{file_id}/complete', {'filename': 'cv.pdf', 'type': 'CV'}, route_params={'file_id': file_id})
+    repository = MagicMock()
+
+    response = _complete_upload(req, blob_service, repository, DummyUserRepository())
+
+    assert response.status_code == 400
+    blob_service.delete_blob.assert_called_once()
+    repository.upsert_file.assert_not_called()
+
+def test_complete_upload_records_file_and_queues_processing():
+    blob_service = MagicMock(container_name='resume-match-pro-files')
+    blob_service.get_blob_size.return_value = 100
+    blob_service.read_blob_range.return_value = b'%PDF-'
+    blob_service.hash_blob.return_value = 'abc123'
+    blob_service.get_blob_url.return_value = 'https://storage/cv.pdf'
+    file_id = str(file_id_for('12345', 'cv.pdf'))
+    req = _json_request(f'/api/files/{file_id}/complete', {'filename': 'cv.pdf', 'type': 'CV', 'sha256': 'ABC123'}, route_params={'file_id': file_id})
+    blob_service.content_blob_name = FilesBlobService.content_blob_name
+    blob_service.move_blob.return_value = 'https://storage/users/12345/sha256/abc123.pdf'
+    repository = MagicMock()
+    repository.get_file_by_id.return_value = None
+    repository.upsert_file.side_effect = lambda file: FileMetadataDb(**file)
+
+    response = _complete_upload(req, blob_service, repository, DummyUserRepository())
+
+    assert response.status_code == 200, response.get_body()
+    saved = repository.upsert_file.call_args[0][0]
+    assert saved['sha256'] == 'abc123' and saved['size'] == 100
+    assert saved['blob_name'] == 'users/12345/sha256/abc123.pdf'
+    blob_service.move_blob.assert_called_once_with(
+        'resume-match-pro-files', f'users/12345/uploads/{file_id}.pdf', saved['blob_name']
+    )
+    assert saved['outbox'][0]['queue'] == 'extract-queue'
+    assert json.loads(saved['outbox'][0]['body'])['blob_name'] == saved['blob_name']
+
+def _completed_upload(queue_service, file_status_repository=None):
+    blob_service = MagicMock(container_name='resume-match-pro-files')
+    blob_service.get_blob_size.return_value = 100
+    blob_service.read_blob_range.return_value = b'%PDF-'
+    blob_service.hash_blob.return_value = 'abc123'
+    blob_service.content_blob_name = FilesBlobService.content_blob_name
+    blob_service.move_blob.return_value = 'https://storage/users/12345/sha256/abc123.pdf'
+    file_id = str(file_id_for('12345', 'cv.pdf'))
+    req = _json_request(f'/api/files/{file_id}/complete', {'filename': 'cv.pdf', 'type': 'CV'}, route_params={'file_id': file_id})
+    repository = MagicMock()
+    repository.get_file_by_id.return_value = None
+    repository.upsert_file.side_effect = lambda file: FileMetadataDb(**file)
+    response = _complete_upload(req, blob_service, repository, DummyUserRepository(), file_status_repository, OutboxDispatcher(repository, queue_service))
+    return response, repository
+
+def test_complete_upload_sends_extract_message_right_away():
+    queue_service = MagicMock()
+
+    response, repository = _completed_upload(queue_service)
+
+    assert response.status_code == 200, response.get_body()
+    saved = repository.upsert_file.call_args[0][0]
+    assert saved['outbox_pending'] is True
+    queue_service.send_messages.assert_called_once_with('extract-queue', [saved['outbox'][0]['body']])
+    assert repository.clear_outbox.call_args[0][:2] == ('12345', saved['id'])
+
+def test_complete_upload_leaves_outbox_to_dispatcher_when_send_fails():
+    queue_service = MagicMock()
+    queue_service.send_messages.side_effect = RuntimeError("queue unavailable")
+
+    response, repository = _completed_upload(queue_service)
+
+    assert response.status_code == 200, response.get_body()
+    repository.clear_outbox.assert_not_called()
+
+def test_complete_upload_reports_uploaded_before_sending_the_extract_message():
+    events = []
+    queue_service = MagicMock()
+    queue_service.send_messages.side_effect = lambda queue, messages: events.append('sent')
+    file_status_repository = MagicMock()
+    file_status_repository.set_stage.side_effect = lambda *args: events.append('uploaded')
+
+    response, _ = _completed_upload(queue_service, file_status_repository)
+
+    assert response.status_code == 200, response.get_body()
+    assert events == ['uploaded', 'sent']
+
+def test_complete_upload_survives_a_failed_status_update():
+    queue_service = MagicMock()
+    file_status_repository = MagicMock()
+    file_status_repository.set_stage.side_effect = RuntimeError("status unavailable")
+
+    response, repository = _completed_upload(queue_service, file_status_repository)
+
+    assert response.status_code == 200, response.get_body()
+    repository.upsert_file.assert_called_once()
+    queue_service.send_messages.assert_called_once()
+
+def test_complete_upload_skips_unchanged_content():
+    blob_service = MagicMock(container_name='resume-match-pro-files')
+    blob_service.get_blob_size.return_value = 100
+    blob_service.read_blob_range.return_value = b'%PDF-'
+    blob_service.hash_blob.return_value = 'abc123'
+    blob_service.content_blob_name = FilesBlobService.content_blob_name
+    file_id = str(file_id_for('12345', 'cv.pdf'))
+    repository = MagicMock()
+    repository.get_file_by_id.return_value = FileMetadataDb(
+        id=file_id, filename='cv.pdf', type='CV', user_id='12345', url='https://cv',
+        blob_name='users/12345/sha256/abc123.pdf', sha256='abc123', extraction_blob='12345/cv.json.gz'
+    )
+    req = _json_request(f'/api/files/{file_id}/complete', {'filename': 'cv.pdf', 'type': 'CV'}, route_params={'file_id': file_id})
+
+    response = _complete_upload(req, blob_service, repository, DummyUserRepository())
+
+    assert response.status_code == 200
+    assert json.loads(response.get_body())['unchanged'] is True
+    blob_service.delete_blob.assert_called_once_with('resume-match-pro-files', f'users/12345/uploads/{file_id}.pdf')
+    repository.upsert_file.assert_not_called()
+
+def test_file_upload_stores_identical_content_once_and_skips_unchanged():
+    blob_name = FilesBlobService.content_blob_name('12345', hashlib.sha256(b'test content').hexdigest(), 'a.pdf')
+
+    class StoredBlobService(DummyBlobService):
+        def blob_exists(self, container_name, filename):
+            return filename == blob_name
+
+        def upload_blob_stream(self, container_name, filename, content, max_size=None):
+            raise AssertionError('content is already stored')
+
+    class ProcessedFilesRepository(DummyFilesRepository):
+        def get_file_by_id(self, user_id, file_id):
+            if str(file_id) == str(file_id_for(user_id, 'a.pdf')):
+                return FileMetadataDb(id=file_id, filename='a.pdf', type='CV', user_id=user_id, url='http://dummyurl',
+                                      blob_name=blob_name, extraction_blob=f'{user_id}/{file_id}.json.gz')
+            return None
+
+    released = []
+    user_repository = DummyUserRepository()
+    user_repository.decrement_files_count = lambda user_id, count=1: released.append(count)
+
+    req = MockHttpRequest(method='POST', url='/api/files/upload', params={}, body=None)
+    req.files = MockFiles({'content': [MockFile('a.pdf'), MockFile('copy-of-a.pdf')]})
+    req.form = {'type': 'CV'}
+    req.headers = {'X-MS-CLIENT-PRINCIPAL': create_mock_b2c_token('12345')}
+
+    files_repository = ProcessedFilesRepository()
+    response = _files_upload(req, StoredBlobService(), files_repository, user_repository)
+
+    assert response.status_code == 200, response.get_body()
+    result = json.loads(response.get_body())
+    assert [f['unchanged'] for f in result['files']] == [True, False]
+    # only the new filename is processed, and the slot reserved for the unchanged one is released
+    assert [json.loads(document['outbox'][0]['body'])['filename'] for document in files_repository.saved] == ['copy-of-a.pdf']
+    assert released == [1]
+
+def test_complete_upload_rejects_foreign_file_id():
+    file_id = str(file_id_for('someone-else', 'cv.pdf'))
+    req = _json_request(f'/api/files/{file_id}/complete', {'filename': 'cv.pdf', 'type': 'CV'}, route_params={'file_id': file_id})
+
+    response = _complete_upload(req, MagicMock(), MagicMock(), DummyUserRepository())
+
+    assert response.status_code == 400
+
 # Dummy implementations for dependencies
 class DummyFilesRepository:
+    def __init__(self):
+        self.saved = []
+
     def upsert_file(self, file_metadata):
+        self.saved.append(file_metadata)
         # Return a dummy file metadata object with required attributes
         return DummyFileMetadata(file_metadata)
+
+    def get_file_by_id(self, user_id, file_id):
+        return None
         
     def get_files_from_db(self, user_id):
         return [DummyFileMetadata({'filename': 'test.pdf', 'type': 'CV', 'user_id': user_id, 'url': 'http://dummyurl'})]
@@ -683,7 +886,13 @@ class DummyUserRepository:
     def can_upload_file(self, user_id):
         return True
 
-    def increment_files_count(self, user_id):
+    def reserve_files(self, user_id, count):
+        return True
+
+    def increment_files_count(self, user_id, count=1):
+        pass
+
+    def decrement_files_count(self, user_id, count=1):
         pass
 
 class DummyBlobService:
@@ -691,9 +900,19 @@ class DummyBlobService:
 
     def upload_blob(self, container_name, filename, content):
         return 'http://dummyurl'
+
+    def upload_blob_stream(self, container_name, filename, content, max_size=None):
+        data = content if isinstance(content, bytes) else content.read()
+        return UploadedBlob(url='http://dummyurl', size=len(data), sha256=hashlib.sha256(data).hexdigest())
         
     def blob_exists(self, container_name, filename):
-        return True
+        return False
+
+    def get_blob_url(self, container_name, blob_name):
+        return 'http://dummyurl'
+
+    hash_content = staticmethod(FilesBlobService.hash_content)
+    content_blob_name = staticmethod(FilesBlobService.content_blob_name)
 
 class DummyTestUser:
     def __init__(self, user_id):
@@ -13,7 +13,7 @@ load_dotenv(Path(__file__).parent / ".env.test")
 # add project root to sys.path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from shared.models import FileMetadataDb
+from shared.models import FileMetadataDb, FileView, ProcessingState
 from shared.files_repository import FilesRepository
 
 
@@ -139,4 +139,50 @@ def test_get_file_by_id(repository, sample_CV):
 def test_get_file_by_id_not_found(repository):
     # Retrieve the file by ID
     file = repository.get_file_by_id(user_id=str(uuid4()), file_id=str(uuid4()))
-    assert file is None
\ No newline at end of file
+    assert file is None
+
+def test_get_file_by_id_other_user_not_found(repository, sample_CV):
+    repository.upsert_file(sample_CV.model_dump(mode="json"))
+    file_id = repository.get_files_from_db(user_id=sample_CV.user_id)[0].id
+
+    # point reads are scoped to the caller's partition
+    assert repository.get_file_by_id(user_id=str(uuid4()), file_id=file_id) is None
+
+def test_get_files_summary_view_projects_fields(repository, sample_CV):
+    sample_CV.paragraphs = ["Python Developer"]
+    repository.upsert_file(sample_CV.model_dump(mode="json"))
+
+    items = repository.query_files(sample_CV.user_id, fields=FilesRepository.SUMMARY_FIELDS)
+    assert len(items) == 1
+    assert "text" not in items[0]
+    assert "paragraphs" not in items[0]
+
+    summaries = repository.get_files_from_db(sample_CV.user_id, view=FileView.SUMMARY)
+    assert summaries[0].filename == sample_CV.filename
+
+
+def test_query_files_rejects_unknown_fields(repository):
+    with pytest.raises(ValueError):
+        repository.query_files("user", fields=["filename", "1=1 OR c.secret"])
+
+
+def test_advance_processing_state_applies_once(repository, sample_CV):
+    sample_CV.sha256 = "abc123"
+    saved = repository.upsert_file(sample_CV.model_dump(mode="json"))
+
+    assert repository.advance_processing_state(
+        sample_CV.user_id, saved.id, ProcessingState.UPLOADED, ProcessingState.EXTRACTED,
+        sha256="abc123", extraction_blob="blob"
+    )
+    # a second delivery finds the file already advanced
+    assert not repository.advance_processing_state(
+        sample_CV.user_id, saved.id, ProcessingState.UPLOADED, ProcessingState.EXTRACTED, sha256="abc123"
+    )
+    # and a stale message does not match the current content
+    assert not repository.advance_processing_state(
+        sample_CV.user_id, saved.id, ProcessingState.EXTRACTED, ProcessingState.ANALYZED, sha256="def456"
+    )
+
+    file = repository.get_file_by_id(sample_CV.user_id, saved.id)
+    assert file.processing_state == ProcessingState.EXTRACTED
+    assert file.extraction_blob == "blob"
@@ -0,0 +1,67 @@
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from matching.matching_feed import MATCHING_SWEEP_AFTER_SECONDS, _schedule_matching, _sweep_persisted_files
+from shared.mock_queue_service import MockQueueService
+from shared.models import FileStage, ProcessingState
+
+
+def _document(file_id, state):
+    return {"id": file_id, "user_id": "test_user", "type": "CV", "sha256": "abc", "processing_state": state}
+
+
+def test_schedules_persisted_files_of_a_batch():
+    documents = [
+        _document("11111111-1111-1111-1111-111111111111", "persisted"),
+        _document("22222222-2222-2222-2222-222222222222", "queued"),
+        _document("33333333-3333-3333-3333-333333333333", "extracted"),
+        {"id": "44444444-4444-4444-4444-444444444444", "user_id": "test_user", "type": "JD"},
+    ]
+    files_repository = MagicMock()
+    status_repository = MagicMock()
+    queue_service = MockQueueService()
+
+    scheduled = _schedule_matching(documents, files_repository, queue_service, status_repository)
+
+    assert scheduled == 1
+    assert [queue for queue, _ in queue_service.messages] == ["matching-queue"]
+    assert json.loads(queue_service.messages[0][1])["file_id"] == "11111111-1111-1111-1111-111111111111"
+    files_repository.advance_processing_state.assert_called_once_with(
+        "test_user", "11111111-1111-1111-1111-111111111111", ProcessingState.PERSISTED, ProcessingState.QUEUED, sha256="abc"
+    )
+    status_repository.set_stage.assert_called_once_with("test_user", "11111111-1111-1111-1111-111111111111", FileStage.QUEUED)
+
+
+def test_failed_send_leaves_files_persisted_for_the_retry():
+    files_repository = MagicMock()
+    queue_service = MagicMock()
+    queue_service.send_messages.side_effect = RuntimeError("queue unavailable")
+
+    with pytest.raises(RuntimeError):
+        _schedule_matching([_document("11111111-1111-1111-1111-111111111111", "persisted")], files_repository, queue_service)
+
+    files_repository.advance_processing_state.assert_not_called()
+
+
+def test_batch_without_persisted_files_sends_nothing():
+    queue_service = MagicMock()
+
+    assert _schedule_matching([_document("11111111-1111-1111-1111-111111111111", "queued")], MagicMock(), queue_service) == 0
+    queue_service.send_messages.assert_not_called()
+
+
+def test_sweep_schedules_files_left_persisted():
+    files_repository = MagicMock()
+    files_repository.get_files_stuck_in_state.return_value = [_document("11111111-1111-1111-1111-111111111111", "persisted")]
+    queue_service = MockQueueService()
+
+    assert _sweep_persisted_files(files_repository, queue_service) == 1
+
+    state, before, _ = files_repository.get_files_stuck_in_state.call_args.args
+    assert state == ProcessingState.PERSISTED
+    assert before <= time.time() - MATCHING_SWEEP_AFTER_SECONDS
+    assert [queue for queue, _ in queue_service.messages] == ["matching-queue"]
+    files_repository.advance_processing_state.assert_called_once()
@@ -5,7 +5,7 @@ import pytest
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
-from matching.schemas import CV_Match, Candidate_Capabilities, FileModel, JD_Requirements, MatchingResultModel
+from matching.schemas import CV_Match, Candidate_Capabilities, FileRef, JD_Requirements, MatchingResultModel
 
 @pytest.fixture
 def create_matching_result():
@@ -15,8 +15,8 @@ def create_matching_result():
         user_id = "test_user_123"
         return MatchingResultModel(
             user_id=user_id,
-            cv=FileModel(id=cv_id, filename="cv.txt", type="CV", url="https://cv.com", text="Python Developer", user_id=user_id),
-            jd=FileModel(id=jd_id, filename="jd.txt", type="JD", url="https://jd.com", text="Python Developer", user_id=user_id),
+            cv=FileRef(id=cv_id, sha256="abc"),
+            jd=FileRef(id=jd_id, sha256="def"),
             jd_requirements=JD_Requirements(skills=["Python"], experience=["2 years"], education=["Bachelor"]),
             candidate_capabilities=Candidate_Capabilities(skills=["Python"], experience=["2 years"], education=["Bachelor"]),
             cv_match=CV_Match(skills_match=["Python"], experience_match=["2 years"], education_match=["Bachelor"], gaps=[]),
@@ -64,4 +64,8 @@ def test_get_results_by_jd_id(repository, create_matching_result):
     # Retrieve results by JD ID
     results = repository.get_results_by_jd_id(sample_matching_result.user_id, sample_matching_result.jd.id)
     assert len(results) == 1
-    assert results[0]["jd"]["id"] == str(sample_matching_result.jd.id)
\ No newline at end of file
+    assert results[0]["jd"]["id"] == str(sample_matching_result.jd.id)
+def test_result_stores_only_id_and_version_of_its_files(create_matching_result):
+    matching_result = create_matching_result().model_dump(mode="json")
+    assert set(matching_result["cv"]) == {"id", "sha256"}
+    assert set(matching_result["jd"]) == {"id", "sha256"}
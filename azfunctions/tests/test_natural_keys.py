@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+from azure.cosmos.exceptions import CosmosResourceExistsError
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from shared.files_repository import FilesRepository
+from shared.matching_results_repository import MatchingResultsRepository
+from shared.natural_keys import file_id_for, matching_result_id_for
+
+
+def _repository(cls):
+    repository = cls.__new__(cls)
+    repository.container = MagicMock()
+    repository.container.upsert_item.side_effect = lambda item: item
+    return repository
+
+
+def test_file_id_is_deterministic():
+    assert file_id_for("user-1", "cv.pdf") == file_id_for("user-1", "cv.pdf")
+    assert file_id_for("user-1", "cv.pdf") != file_id_for("user-2", "cv.pdf")
+    assert file_id_for("user-1", "cv.pdf") != file_id_for("user-1", "jd.pdf")
+
+
+def test_matching_result_id_depends_on_pair_order():
+    cv_id, jd_id = uuid4(), uuid4()
+    assert matching_result_id_for("user-1", cv_id, jd_id) == matching_result_id_for("user-1", str(cv_id), str(jd_id))
+    assert matching_result_id_for("user-1", cv_id, jd_id) != matching_result_id_for("user-1", jd_id, cv_id)
+
+
+def test_upsert_file_is_a_single_blind_upsert():
+    repository = _repository(FilesRepository)
+    file = {"id": str(uuid4()), "user_id": "user-1", "filename": "cv.pdf", "type": "CV", "url": "https://cv"}
+
+    saved = repository.upsert_file(file)
+
+    assert str(saved.id) == str(file_id_for("user-1", "cv.pdf"))
+    repository.container.upsert_item.assert_called_once()
+    repository.container.query_items.assert_not_called()
+
+
+def test_upsert_file_updates_legacy_document_in_place():
+    repository = _repository(FilesRepository)
+    legacy_id = str(uuid4())
+    repository.container.upsert_item.side_effect = iter([
+        CosmosResourceExistsError(status_code=409, message="unique key"),
+        {"id": legacy_id, "user_id": "user-1", "filename": "cv.pdf", "type": "CV", "url": "https://cv"},
+    ])
+    repository.container.query_items.return_value = [{"id": legacy_id}]
+
+    saved = repository.upsert_file({"user_id": "user-1", "filename": "cv.pdf", "type": "CV", "url": "https://cv"})
+
+    assert str(saved.id) == legacy_id
+    assert repository.container.upsert_item.call_args[0][0]["id"] == legacy_id
+
+
+def test_upsert_file_reraises_conflict_without_legacy_document():
+    repository = _repository(FilesRepository)
+    repository.container.upsert_item.side_effect = CosmosResourceExistsError(status_code=409, message="conflict")
+    repository.container.query_items.return_value = []
+
+    with pytest.raises(CosmosResourceExistsError):
+        repository.upsert_file({"user_id": "user-1", "filename": "cv.pdf", "type": "CV", "url": "https://cv"})
+
+
+def test_upsert_result_uses_natural_key():
+    repository = _repository(MatchingResultsRepository)
+    cv_id, jd_id = str(uuid4()), str(uuid4())
+
+    repository.upsert_result({"user_id": "user-1", "cv": {"id": cv_id}, "jd": {"id": jd_id}})
+
+    written = repository.container.upsert_item.call_args[0][0]
+    assert written["id"] == str(matching_result_id_for("user-1", cv_id, jd_id))
+    repository.container.query_items.assert_not_called()
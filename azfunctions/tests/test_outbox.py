@@ -0,0 +1,111 @@
+from unittest.mock import MagicMock
+
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError
+
+from shared.files_repository import FilesRepository
+from shared.mock_queue_service import MockQueueService
+from shared.models import OutboxMessage, ProcessingState
+from shared.outbox import OutboxDispatcher
+
+
+def _document(file_id, *queues):
+    return {"id": file_id, "user_id": "test_user", "outbox": [
+        OutboxMessage(queue=queue, body=f"{file_id}->{queue}").model_dump() for queue in queues
+    ]}
+
+
+def test_dispatch_sends_one_batch_per_queue_and_clears_outboxes():
+    files_repository = MagicMock()
+    queue_service = MagicMock()
+    documents = [_document("a", "extract-queue"), _document("b", "extract-queue"), _document("c", "matching-queue"), _document("d")]
+
+    dispatched = OutboxDispatcher(files_repository, queue_service).dispatch(documents)
+
+    assert dispatched == 3
+    sends = {call.args[0]: call.args[1] for call in queue_service.send_messages.call_args_list}
+    assert sends == {"extract-queue": ["a->extract-queue", "b->extract-queue"], "matching-queue": ["c->matching-queue"]}
+    assert [call.args[1] for call in files_repository.clear_outbox.call_args_list] == ["a", "b", "c"]
+
+
+def test_dispatch_keeps_outbox_of_failed_queue():
+    files_repository = MagicMock()
+    queue_service = MockQueueService()
+
+    def send_messages(queue_name, messages):
+        if queue_name == "matching-queue":
+            raise RuntimeError("queue unavailable")
+    queue_service.send_messages = send_messages
+
+    dispatched = OutboxDispatcher(files_repository, queue_service).dispatch(
+        [_document("a", "extract-queue"), _document("b", "matching-queue")]
+    )
+
+    assert dispatched == 1
+    assert [call.args[1] for call in files_repository.clear_outbox.call_args_list] == ["a"]
+
+
+def test_drain_reads_pending_outboxes_until_a_partial_batch():
+    files_repository = MagicMock()
+    files_repository.get_pending_outboxes.side_effect = [
+        [_document("a", "extract-queue"), _document("b", "extract-queue")],
+        [_document("c", "extract-queue")],
+    ]
+
+    dispatched = OutboxDispatcher(files_repository, MockQueueService(), batch_size=2).drain()
+
+    assert dispatched == 3
+    assert files_repository.get_pending_outboxes.call_count == 2
+
+
+def test_dispatch_changes_sends_only_outboxes_still_pending():
+    files_repository = MagicMock()
+    queue_service = MagicMock()
+    files_repository.get_pending_outboxes_of.return_value = [_document("b", "extract-queue")]
+    changes = [
+        {**_document("a", "extract-queue"), "outbox_pending": True},
+        {**_document("b", "extract-queue"), "outbox_pending": True},
+        {"id": "c", "user_id": "test_user", "outbox": [], "outbox_pending": False},
+    ]
+
+    dispatched = OutboxDispatcher(files_repository, queue_service).dispatch_changes(changes)
+
+    # "a" was sent by its writer after the change was recorded
+    assert dispatched == 1
+    files_repository.get_pending_outboxes_of.assert_called_once_with("test_user", ["a", "b"])
+    queue_service.send_messages.assert_called_once_with("extract-queue", ["b->extract-queue"])
+
+
+def test_pending_outboxes_are_found_by_the_indexed_flag():
+    repository = FilesRepository.__new__(FilesRepository)
+    repository.container = MagicMock()
+    repository.container.query_items.return_value = []
+
+    repository.get_pending_outboxes(100)
+
+    assert "WHERE c.outbox_pending = true" in repository.container.query_items.call_args[0][0]
+    assert "ARRAY_LENGTH" not in repository.container.query_items.call_args[0][0]
+
+
+def test_advancing_state_flags_a_written_outbox():
+    repository = FilesRepository.__new__(FilesRepository)
+    repository.container = MagicMock()
+    outbox = [OutboxMessage(queue="extract-queue", body="{}").model_dump()]
+
+    repository.advance_processing_state("test_user", "a", ProcessingState.ANALYZED, ProcessingState.PERSISTED, outbox=outbox)
+
+    operations = repository.container.patch_item.call_args.kwargs["patch_operations"]
+    assert {"op": "set", "path": "/outbox_pending", "value": True} in operations
+
+
+def test_clear_outbox_only_applies_to_the_sent_messages():
+    repository = FilesRepository.__new__(FilesRepository)
+    repository.container = MagicMock()
+    messages = [OutboxMessage(queue="extract-queue", body="{}")]
+
+    assert repository.clear_outbox("test_user", "a", messages)
+    assert {"op": "set", "path": "/outbox_pending", "value": False} in repository.container.patch_item.call_args.kwargs["patch_operations"]
+    predicate = repository.container.patch_item.call_args.kwargs["filter_predicate"]
+    assert predicate == f"FROM c WHERE ARRAY_LENGTH(c.outbox) = 1 AND c.outbox[0].id = '{messages[0].id}'"
+
+    repository.container.patch_item.side_effect = CosmosAccessConditionFailedError()
+    assert not repository.clear_outbox("test_user", "a", messages)
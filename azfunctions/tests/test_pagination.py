@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from shared.files_repository import FilesRepository
+from shared.matching_results_repository import MatchingResultsRepository
+from shared.models import FileView
+from shared.pagination import decode_continuation, encode_continuation, query_page
+
+
+class FakePages:
+    """Mimics the iterator returned by ItemPaged.by_page() in the Cosmos SDK."""
+
+    def __init__(self, items, page_size, continuation):
+        start = int(continuation) if continuation else 0
+        self._page = items[start:start + page_size]
+        self._consumed = False
+        self.continuation_token = str(start + page_size) if start + page_size < len(items) else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._consumed:
+            raise StopIteration
+        self._consumed = True
+        return iter(self._page)
+
+
+def fake_container(items):
+    container = MagicMock()
+
+    def query_items(query, parameters=None, partition_key=None, max_item_count=None):
+        paged = MagicMock()
+        paged.by_page.side_effect = lambda token: FakePages(items, max_item_count, token)
+        return paged
+
+    container.query_items.side_effect = query_items
+    return container
+
+
+def test_continuation_round_trip():
+    token = '[{"token":"+RID:~abc==#RT:1#TRC:2","range":{"min":"","max":"FF"}}]'
+    cursor = encode_continuation(token)
+    assert "+" not in cursor and "/" not in cursor
+    assert decode_continuation(cursor) == token
+    assert encode_continuation(None) is None
+    assert decode_continuation(None) is None
+
+
+def test_decode_invalid_continuation():
+    with pytest.raises(ValueError):
+        decode_continuation("not base64!")
+
+
+def test_query_page_walks_all_pages():
+    container = fake_container([{"id": str(i)} for i in range(5)])
+    seen = []
+    cursor = None
+    while True:
+        items, cursor = query_page(container, "SELECT * FROM c", [], "user", page_size=2, continuation=cursor)
+        seen.extend(item["id"] for item in items)
+        if not cursor:
+            break
+    assert seen == ["0", "1", "2", "3", "4"]
+    _, kwargs = container.query_items.call_args
+    assert kwargs["partition_key"] == "user"
+    assert kwargs["max_item_count"] == 2
+
+
+def test_files_repository_page_uses_projection():
+    repository = FilesRepository.__new__(FilesRepository)
+    repository.container = fake_container([
+        {"id": "8a3e4b7c-1d2e-4f5a-9b6c-7d8e9f0a1b2c", "filename": "cv.pdf", "type": "CV", "user_id": "user", "url": "https://cv"}
+    ])
+
+    files, cursor = repository.get_files_page("user", view=FileView.SUMMARY, page_size=10)
+
+    assert cursor is None
+    assert files[0].filename == "cv.pdf"
+    query = repository.container.query_items.call_args[0][0]
+    assert query.startswith("SELECT c.id, c.filename")
+
+
+def test_matching_results_page_rejects_invalid_type():
+    repository = MatchingResultsRepository.__new__(MatchingResultsRepository)
+    repository.container = fake_container([])
+    with pytest.raises(ValueError):
+        repository.get_results_page_by_file_type_and_id("user", "file", "XX")
@@ -0,0 +1,111 @@
+import io
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from docx import Document
+
+from shared.models import FileMetadataDb
+from shared.parsing_executor import ParsingExecutor
+
+
+def _slow_task(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _native_hang(seconds):
+    # Stands in for native code that never returns to the interpreter
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def docx_content() -> bytes:
+    doc = Document()
+    doc.add_paragraph("Python Developer", style='Heading 1')
+    doc.add_paragraph("Five years of Azure Functions")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Skill"
+    table.cell(0, 1).text = "Python"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pool_executor():
+    executor = ParsingExecutor(max_workers=1, task_timeout=60)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("extractor", ["python-docx", "stream"])
+def test_pool_and_inline_extraction_match(docx_content, pool_executor, extractor):
+    inline = ParsingExecutor(max_workers=0).extract_docx(docx_content, extractor)
+    pooled = pool_executor.extract_docx(docx_content, extractor)
+
+    assert pooled == inline
+    assert isinstance(pooled['pages'][0], dict)
+    assert pooled['text'].startswith("Python Developer")
+
+
+def test_extraction_result_validates_into_file_metadata(docx_content):
+    structured_info = ParsingExecutor(max_workers=0).extract_docx(docx_content)
+    file_metadata = FileMetadataDb(
+        filename="cv.docx", type="CV", user_id="user", url="https://blob/cv.docx", **structured_info
+    )
+    assert file_metadata.pages[0].lines[0].content == "Python Developer"
+    assert file_metadata.tables[0][0][1].text == "Python"
+
+
+def test_task_timeout_keeps_pool():
+    executor = ParsingExecutor(max_workers=1, task_timeout=0.5)
+    try:
+        with pytest.raises(TimeoutError):
+            executor._run(_slow_task, 30)
+        pool = executor._pool
+        # The worker survives its timed-out task and runs the next one
+        assert executor._run(_slow_task, 0) == 0
+        assert executor._pool is pool
+    finally:
+        executor.shutdown()
+
+
+def test_task_timeout_excludes_queue_time():
+    executor = ParsingExecutor(max_workers=1, task_timeout=2)
+    try:
+        executor._run(_slow_task, 0)
+        with ThreadPoolExecutor(max_workers=3) as callers:
+            # Each task fits its deadline, though the last one waits for the others first
+            futures = [callers.submit(executor._run, _slow_task, 1.2) for _ in range(3)]
+            assert [future.result() for future in futures] == [1.2, 1.2, 1.2]
+    finally:
+        executor.shutdown()
+
+
+def test_hung_worker_is_killed_and_pool_replaced():
+    executor = ParsingExecutor(max_workers=1, task_timeout=0.5, kill_grace=0.5)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            executor._run(_native_hang, 30)
+        assert executor._pool is None
+        assert executor._run(_slow_task, 0) == 0
+    finally:
+        executor.shutdown()
+
+
+def test_stale_reset_keeps_replacement_pool():
+    executor = ParsingExecutor(max_workers=1)
+    try:
+        broken = executor._get_pool()
+        executor._reset_pool(broken)
+        replacement = executor._get_pool()
+        # A caller still holding the broken pool must not discard the new one
+        executor._reset_pool(broken)
+        assert executor._pool is replacement
+    finally:
+        executor.shutdown()
@@ -0,0 +1,118 @@
+import base64
+import hashlib
+import io
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from shared import blob_service, queue_service
+from shared.blob_service import FilesBlobService, FileTooLargeError
+from shared.queue_service import QueueService
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setattr(queue_service, "_queue_service_clients", {})
+    monkeypatch.setattr(queue_service, "_provisioned_queues", set())
+    monkeypatch.setattr(blob_service, "_blob_service_clients", {})
+    monkeypatch.setattr(blob_service, "_provisioned_containers", set())
+    monkeypatch.setenv("AZURE_STORAGE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+
+
+def test_queue_service_client_is_shared_and_queue_created_once():
+    with patch.object(queue_service.QueueServiceClient, "from_connection_string") as from_connection_string:
+        client = from_connection_string.return_value
+        client.get_queue_client.return_value.create_queue.side_effect = ResourceExistsError("exists")
+
+        for _ in range(3):
+            QueueService("conn").create_queue_if_not_exists("processing-queue")
+
+    from_connection_string.assert_called_once_with("conn")
+    client.get_queue_client.return_value.create_queue.assert_called_once()
+
+
+def test_send_messages_sends_every_message_base64_encoded():
+    with patch.object(queue_service.QueueServiceClient, "from_connection_string") as from_connection_string:
+        queue_client = from_connection_string.return_value.get_queue_client.return_value
+        QueueService("conn").send_messages("processing-queue", ["a", "b", "c"])
+
+    sent = sorted(call.args[0] for call in queue_client.send_message.call_args_list)
+    assert sent == sorted(base64.b64encode(m.encode()).decode() for m in ["a", "b", "c"])
+
+
+def test_upload_blob_provisions_container_once():
+    with patch.object(blob_service.BlobServiceClient, "from_connection_string") as from_connection_string:
+        client = from_connection_string.return_value
+        service = FilesBlobService()
+        service.upload_blob("files", "a.pdf", b"a")
+        FilesBlobService().upload_blob("files", "b.pdf", b"b")
+
+    from_connection_string.assert_called_once()
+    client.create_container.assert_called_once_with("files")
+    assert client.get_blob_client.return_value.upload_blob.call_count == 2
+
+
+def test_upload_blob_recreates_deleted_container():
+    with patch.object(blob_service.BlobServiceClient, "from_connection_string") as from_connection_string:
+        client = from_connection_string.return_value
+        blob_client = client.get_blob_client.return_value
+        blob_client.upload_blob.side_effect = [ResourceNotFoundError("container gone"), None]
+        service = FilesBlobService()
+        blob_service._provisioned_containers.add((client.account_name, "files"))
+
+        service.upload_blob("files", "a.pdf", b"a")
+
+    client.create_container.assert_called_once_with("files")
+    assert blob_client.upload_blob.call_count == 2
+
+
+def test_upload_blob_stream_stages_blocks_and_hashes():
+    content = b"x" * 10
+    with patch.object(blob_service.BlobServiceClient, "from_connection_string") as from_connection_string:
+        blob_client = from_connection_string.return_value.get_blob_client.return_value
+        blob_client.url = "https://storage/files/a.pdf"
+        uploaded = FilesBlobService().upload_blob_stream("files", "a.pdf", io.BytesIO(content), block_size=4)
+
+    assert uploaded.size == 10
+    assert uploaded.sha256 == hashlib.sha256(content).hexdigest()
+    assert [call.kwargs["data"] for call in blob_client.stage_block.call_args_list] == [b"xxxx", b"xxxx", b"xx"]
+    committed = blob_client.commit_block_list.call_args[0][0]
+    assert [block.id for block in committed] == [call.kwargs["block_id"] for call in blob_client.stage_block.call_args_list]
+
+
+def test_upload_blob_stream_stops_at_max_size():
+    with patch.object(blob_service.BlobServiceClient, "from_connection_string") as from_connection_string:
+        blob_client = from_connection_string.return_value.get_blob_client.return_value
+        with pytest.raises(FileTooLargeError):
+            FilesBlobService().upload_blob_stream("files", "a.pdf", io.BytesIO(b"x" * 100), max_size=6, block_size=4)
+
+    assert blob_client.stage_block.call_count == 1
+    blob_client.commit_block_list.assert_not_called()
+
+
+def test_hash_content_rewinds_stream():
+    content = io.BytesIO(b"x" * 10)
+
+    sha256, size, rewound = FilesBlobService.hash_content(content, block_size=4)
+
+    assert (sha256, size) == (hashlib.sha256(b"x" * 10).hexdigest(), 10)
+    assert rewound.read() == b"x" * 10
+
+
+def test_content_blob_name_is_per_user():
+    assert FilesBlobService.content_blob_name("user-1", "abc", "CV.PDF") == "users/user-1/sha256/abc.pdf"
+
+
+def test_move_blob_keeps_existing_target():
+    with patch.object(blob_service.BlobServiceClient, "from_connection_string") as from_connection_string:
+        blob_client = from_connection_string.return_value.get_blob_client.return_value
+        blob_client.exists.return_value = True
+        FilesBlobService().move_blob("files", "users/u/uploads/a.pdf", "users/u/sha256/abc.pdf")
+
+    blob_client.upload_blob_from_url.assert_not_called()
+    blob_client.delete_blob.assert_called_once()
@@ -0,0 +1,66 @@
+import io
+from types import SimpleNamespace
+
+from docx import Document
+from docx.shared import Pt
+
+from shared.style_table import StyleTable
+from shared.docx_service import DocxService
+from shared.document_intelligence_service import DocumentIntelligenceService
+
+
+def test_intern_returns_same_id_for_identical_styles():
+    table = StyleTable()
+    first = table.intern(font_name="Arial", font_size=11.0, is_bold=True)
+    second = table.intern(font_name="Arial", font_size=11.0, is_bold=True)
+    third = table.intern(font_name="Arial", font_size=12.0, is_bold=True)
+
+    assert first == second
+    assert first != third
+    assert len(table) == 2
+    assert table.styles[first].name == first
+    assert table.styles[third].font_size == 12.0
+
+
+def test_intern_skips_empty_styles():
+    table = StyleTable()
+    assert table.intern() is None
+    assert len(table) == 0
+
+
+def test_docx_styles_are_interned_per_distinct_style():
+    doc = Document()
+    doc.styles['Heading 1'].font.size = Pt(16)
+    for i in range(50):
+        doc.add_paragraph(f"Heading {i}", style='Heading 1')
+        doc.add_paragraph(f"Body {i}")
+    buffer = io.BytesIO()
+    doc.save(buffer)
+
+    structured_info = DocxService.get_text_from_docx(buffer.getvalue())
+
+    lines = structured_info['pages'][0].lines
+    assert len(lines) == 100
+    # Only the styles in use are stored, and every line references one of them
+    assert len(structured_info['styles']) <= 2
+    heading_styles = {line.style for line in lines if line.content.startswith("Heading")}
+    assert len(heading_styles) == 1
+    heading_style = structured_info['styles'][heading_styles.pop()]
+    assert heading_style.font_size == 16.0
+
+
+def test_document_intelligence_styles_are_interned():
+    def make_line(content, is_bold):
+        style = SimpleNamespace(font_family="Calibri", font_size=11, is_bold=is_bold, is_italic=False, is_underline=False)
+        return SimpleNamespace(content=content, appearance=SimpleNamespace(style=style))
+
+    page = SimpleNamespace(page_number=1, lines=[make_line(f"line {i}", i % 2 == 0) for i in range(40)])
+    result = SimpleNamespace(content="text", pages=[page], paragraphs=[], tables=[], languages=[])
+
+    service = DocumentIntelligenceService.__new__(DocumentIntelligenceService)
+    structured_info = service.process_analysis_result(result)
+
+    assert len(structured_info['styles']) == 2
+    lines = structured_info['pages'][0].lines
+    assert lines[0].style == lines[2].style
+    assert lines[0].style != lines[1].style
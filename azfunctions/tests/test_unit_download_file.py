@@ -137,5 +137,82 @@ class TestDownloadFile(unittest.TestCase):
         result = json.loads(response.get_body())
         self.assertEqual(result['error'], "Unauthorized - Missing user claims")
 
+    def _stored_file(self, **fields):
+        file_metadata = FileMetadataDb(
+            id=self.file_id,
+            filename="test_document.pdf",
+            type=FileType.CV,
+            user_id=self.user_id,
+            url="https://test.blob.core.windows.net/test_document.pdf",
+            content_type="application/pdf",
+            **fields
+        )
+        self.repository.get_file_by_id.return_value = file_metadata
+        self.blob_service.container_name = "test-container"
+        return file_metadata
+
+    def _request(self, headers=None, params=None):
+        return func.HttpRequest(
+            method='GET',
+            url=f'/api/files/{self.file_id}/download',
+            route_params={'file_id': self.file_id},
+            params=params or {},
+            headers={'X-MS-CLIENT-PRINCIPAL': self.encoded_claims, **(headers or {})},
+            body=None
+        )
+
+    def test_download_file_range(self):
+        """Test a Range request returns 206 with only the requested bytes."""
+        self._stored_file(size=100)
+        self.blob_service.read_blob_range.return_value = b"0123456789"
+
+        response = _download_file(self._request({'Range': 'bytes=10-19'}), self.blob_service, self.repository)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.get_body(), b"0123456789")
+        self.assertEqual(response.headers['Content-Range'], 'bytes 10-19/100')
+        self.blob_service.read_blob_range.assert_called_once_with("test-container", "test_document.pdf", 10, 10)
+        self.blob_service.get_file_content.assert_not_called()
+
+    def test_download_file_suffix_range(self):
+        """Test a suffix range returns the last bytes of the file."""
+        self._stored_file(size=100)
+        self.blob_service.read_blob_range.return_value = b"tail"
+
+        response = _download_file(self._request({'Range': 'bytes=-4'}), self.blob_service, self.repository)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 96-99/100')
+
+    def test_download_file_unsatisfiable_range(self):
+        """Test a range past the end of the file returns 416."""
+        self._stored_file(size=100)
+
+        response = _download_file(self._request({'Range': 'bytes=200-'}), self.blob_service, self.repository)
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */100')
+
+    def test_download_file_not_modified(self):
+        """Test If-None-Match with the current ETag returns 304 without reading the blob."""
+        self._stored_file(sha256="abc123")
+
+        response = _download_file(self._request({'If-None-Match': '"abc123"'}), self.blob_service, self.repository)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], '"abc123"')
+        self.blob_service.get_file_content.assert_not_called()
+
+    def test_download_file_redirect(self):
+        """Test redirect=true answers with a read-only SAS URL."""
+        self._stored_file()
+        self.blob_service.generate_download_url.return_value = "https://storage/test_document.pdf?sas"
+
+        response = _download_file(self._request(params={'redirect': 'true'}), self.blob_service, self.repository)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers['Location'], "https://storage/test_document.pdf?sas")
+        self.blob_service.get_file_content.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
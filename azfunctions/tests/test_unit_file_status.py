@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import json
+import base64
+import azure.functions as func
+from user_files.user_files import _get_file_status, _get_file_status_changes
+from shared.file_status_repository import FileStatusRepository, _decode_cursor, _encode_cursor, status_timestamp
+from shared.models import FileStage, FileStatusDb
+from uuid import uuid4
+
+
+class TestFileStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.repository = MagicMock()
+        self.user_id = "test-user-123"
+        self.file_id = str(uuid4())
+        mock_claims = {
+            "claims": [
+                {"typ": "http://schemas.xmlsoap.org/ws/2005/05/identity/claims/nameidentifier", "val": self.user_id}
+            ]
+        }
+        self.encoded_claims = base64.b64encode(json.dumps(mock_claims).encode()).decode()
+
+    def _status(self, stage=FileStage.EXTRACTED, updated_at="2026-01-01T00:00:01.000000Z"):
+        return FileStatusDb(id=self.file_id, user_id=self.user_id, stage=stage, progress=40, updated_at=updated_at)
+
+    def _request(self, url, params=None, route_params=None):
+        return func.HttpRequest(
+            method='GET',
+            url=url,
+            params=params or {},
+            route_params=route_params or {},
+            headers={'X-MS-CLIENT-PRINCIPAL': self.encoded_claims},
+            body=None
+        )
+
+    def test_get_file_status(self):
+        self.repository.get_status.return_value = self._status()
+        req = self._request(f'/api/files/{self.file_id}/status', route_params={'file_id': self.file_id})
+
+        response = _get_file_status(req, self.repository)
+
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.get_body())
+        self.assertEqual(body['stage'], 'extracted')
+        self.assertEqual(body['progress'], 40)
+        self.repository.get_status.assert_called_once_with(self.user_id, self.file_id)
+
+    def test_get_file_status_not_found(self):
+        self.repository.get_status.return_value = None
+        req = self._request(f'/api/files/{self.file_id}/status', route_params={'file_id': self.file_id})
+
+        response = _get_file_status(req, self.repository)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_changes_return_changes_and_next_cursor(self):
+        status = self._status()
+        self.repository.get_changes.return_value = ([status], 'next-cursor')
+        req = self._request('/api/files/status', params={'since': 'cursor'})
+
+        response = asyncio.run(_get_file_status_changes(req, self.repository))
+
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.get_body())
+        self.assertEqual([s['id'] for s in body['statuses']], [self.file_id])
+        self.assertEqual(body['cursor'], 'next-cursor')
+        self.repository.get_changes.assert_called_once_with(self.user_id, 'cursor')
+
+    def test_status_changes_reject_invalid_cursor(self):
+        self.repository.get_changes.side_effect = ValueError("Invalid status cursor")
+        req = self._request('/api/files/status', params={'since': 'not-a-cursor'})
+
+        response = asyncio.run(_get_file_status_changes(req, self.repository))
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch('user_files.user_files.asyncio.sleep', new_callable=AsyncMock)
+    def test_status_changes_long_poll_waits_for_a_change(self, sleep):
+        self.repository.get_changes.side_effect = [([], 'cursor'), ([], 'cursor'), ([self._status()], 'next-cursor')]
+        req = self._request('/api/files/status', params={'since': 'cursor', 'wait': '10'})
+
+        response = asyncio.run(_get_file_status_changes(req, self.repository))
+
+        self.assertEqual(len(json.loads(response.get_body())['statuses']), 1)
+        self.assertEqual([call.args[0] for call in sleep.await_args_list], [2, 4])
+
+    @patch('user_files.user_files.time.monotonic')
+    @patch('user_files.user_files.asyncio.sleep', new_callable=AsyncMock)
+    def test_status_changes_long_poll_returns_same_cursor_when_nothing_changed(self, sleep, monotonic):
+        clock = iter(range(0, 100, 2))
+        monotonic.side_effect = lambda: next(clock)
+        self.repository.get_changes.return_value = ([], 'cursor')
+        req = self._request('/api/files/status', params={'since': 'cursor', 'wait': '6'})
+
+        response = asyncio.run(_get_file_status_changes(req, self.repository))
+
+        body = json.loads(response.get_body())
+        self.assertEqual(body, {'statuses': [], 'cursor': 'cursor'})
+        self.assertLessEqual(sleep.call_count, 3)
+
+    def _repository(self, items):
+        repository = FileStatusRepository.__new__(FileStatusRepository)
+        repository.container = MagicMock()
+        repository.container.query_items.return_value = items
+        return repository
+
+    def _item(self, ts, etag, file_id=None):
+        item = self._status().model_dump(mode="json")
+        item.update(id=file_id or str(uuid4()), _ts=ts, _etag=etag)
+        return item
+
+    def test_repository_queries_changes_by_server_timestamp_in_user_partition(self):
+        repository = self._repository([self._item(100, '"a"'), self._item(101, '"b"')])
+
+        changes, cursor = repository.get_changes(self.user_id, _encode_cursor(100, []))
+
+        self.assertEqual([change.ts for change in changes], [100, 101])
+        self.assertEqual(changes[0].stage, FileStage.EXTRACTED)
+        query = repository.container.query_items.call_args[0][0]
+        self.assertIn("c._ts >= @since", query)
+        self.assertTrue(query.endswith("ORDER BY c._ts"))
+        self.assertEqual(repository.container.query_items.call_args.kwargs["partition_key"], self.user_id)
+        self.assertEqual(_decode_cursor(cursor)[0], 101)
+        # the server timestamp is read, never written back or returned to clients
+        self.assertNotIn("ts", changes[0].model_dump(mode="json"))
+
+    def test_repository_skips_versions_already_returned_in_the_cursor_second(self):
+        file_id = str(uuid4())
+        first, cursor = self._repository([self._item(100, '"a"', file_id)]).get_changes(self.user_id)
+        # a later write to the same file in the same second, committed after the first read
+        repository = self._repository([self._item(100, '"a"', file_id), self._item(100, '"b"', file_id)])
+
+        changes, next_cursor = repository.get_changes(self.user_id, cursor)
+
+        self.assertEqual([change.etag for change in changes], ['"b"'])
+        self.assertEqual(len(_decode_cursor(next_cursor)[1]), 2)
+        repository = self._repository([self._item(100, '"a"', file_id), self._item(100, '"b"', file_id)])
+        self.assertEqual(repository.get_changes(self.user_id, next_cursor), ([], next_cursor))
+
+    def test_repository_rejects_foreign_cursor(self):
+        with self.assertRaises(ValueError):
+            self._repository([]).get_changes(self.user_id, "2026-01-01T00:00:00.000000Z")
+
+    def test_status_timestamps_sort_as_strings(self):
+        first = status_timestamp()
+        second = status_timestamp()
+        self.assertEqual(len(first), len(second))
+        self.assertLessEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
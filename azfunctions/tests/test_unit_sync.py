@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import json
+import base64
+from uuid import uuid4
+import azure.functions as func
+from shared.files_repository import FilesRepository
+from shared.matching_results_repository import MatchingResultsRepository
+from shared.models import FileSummaryDb, SyncEntity, TombstoneDb
+from shared.tombstone_repository import TOMBSTONE_TTL_SECONDS
+from sync.sync import SYNC_CLOCK_SKEW_SECONDS, _sync
+
+NOW = 1_800_000_000
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.files_repository = MagicMock()
+        self.matching_results_repository = MagicMock()
+        self.tombstone_repository = MagicMock()
+        self.files_repository.get_files_changed_since.return_value = []
+        self.matching_results_repository.get_results_changed_since.return_value = []
+        self.tombstone_repository.get_since.return_value = []
+        self.user_id = "test-user-123"
+        mock_claims = {
+            "claims": [
+                {"typ": "http://schemas.xmlsoap.org/ws/2005/05/identity/claims/nameidentifier", "val": self.user_id}
+            ]
+        }
+        self.encoded_claims = base64.b64encode(json.dumps(mock_claims).encode()).decode()
+
+    def _request(self, params=None):
+        return func.HttpRequest(
+            method='GET',
+            url='/api/sync',
+            params=params or {},
+            headers={'X-MS-CLIENT-PRINCIPAL': self.encoded_claims},
+            body=None
+        )
+
+    def _file(self):
+        return FileSummaryDb(id=uuid4(), filename="cv.pdf", type="CV", user_id=self.user_id, url="https://storage/cv.pdf")
+
+    def _result(self):
+        file = {"id": str(uuid4()), "filename": "f.pdf", "type": "CV", "url": "https://storage/f.pdf"}
+        lists = {"skills": [], "experience": [], "education": []}
+        return {
+            "id": str(uuid4()), "user_id": self.user_id, "cv": file, "jd": dict(file, type="JD"),
+            "jd_requirements": lists, "candidate_capabilities": lists,
+            "cv_match": {"skills_match": [], "experience_match": [], "education_match": [], "gaps": []},
+            "overall_match_percentage": 50.0, "_ts": NOW
+        }
+
+    def _tombstone(self, kind, entity_id):
+        return TombstoneDb(**{"id": f"{kind.value}-{entity_id}", "user_id": self.user_id, "kind": kind,
+                              "entity_id": str(entity_id), "_ts": NOW - 10})
+
+    def _sync(self, params=None):
+        with patch('sync.sync.time.time', return_value=NOW):
+            return _sync(self._request(params), self.files_repository, self.matching_results_repository, self.tombstone_repository)
+
+    def test_first_sync_returns_everything_without_tombstones(self):
+        self.files_repository.get_files_changed_since.return_value = [self._file()]
+        self.matching_results_repository.get_results_changed_since.return_value = [self._result()]
+
+        response = self._sync()
+
+        body = json.loads(response.get_body())
+        self.assertEqual((len(body['files']), len(body['results']), body['deleted']), (1, 1, []))
+        self.assertEqual(body['token'], str(NOW - SYNC_CLOCK_SKEW_SECONDS))
+        self.assertFalse(body['reset'])
+        self.files_repository.get_files_changed_since.assert_called_once_with(self.user_id, None)
+        self.tombstone_repository.get_since.assert_not_called()
+
+    def test_delta_sync_returns_changes_and_deletes_since_token(self):
+        deleted_id = uuid4()
+        self.tombstone_repository.get_since.return_value = [self._tombstone(SyncEntity.FILE, deleted_id)]
+
+        body = json.loads(self._sync({'since': str(NOW - 60)}).get_body())
+
+        self.assertEqual(body['deleted'], [{'kind': 'file', 'id': str(deleted_id), 'deleted_at': NOW - 10}])
+        self.files_repository.get_files_changed_since.assert_called_once_with(self.user_id, NOW - 60)
+        self.matching_results_repository.get_results_changed_since.assert_called_once_with(self.user_id, NOW - 60)
+        self.tombstone_repository.get_since.assert_called_once_with(self.user_id, NOW - 60)
+
+    def test_recreated_entity_is_not_reported_deleted(self):
+        result = self._result()
+        self.matching_results_repository.get_results_changed_since.return_value = [result]
+        self.tombstone_repository.get_since.return_value = [self._tombstone(SyncEntity.MATCHING_RESULT, result['id'])]
+
+        body = json.loads(self._sync({'since': str(NOW - 60)}).get_body())
+
+        self.assertEqual([r['id'] for r in body['results']], [result['id']])
+        self.assertEqual(body['deleted'], [])
+
+    def test_token_older_than_tombstones_resets(self):
+        body = json.loads(self._sync({'since': str(NOW - TOMBSTONE_TTL_SECONDS - 1)}).get_body())
+
+        self.assertTrue(body['reset'])
+        self.files_repository.get_files_changed_since.assert_called_once_with(self.user_id, None)
+        self.tombstone_repository.get_since.assert_not_called()
+
+    def test_invalid_token(self):
+        self.assertEqual(self._sync({'since': 'yesterday'}).status_code, 400)
+
+    def test_repository_queries_by_ts_in_user_partition(self):
+        repository = FilesRepository.__new__(FilesRepository)
+        repository.container = MagicMock()
+        repository.container.query_items.return_value = [self._file().model_dump(mode="json")]
+
+        files = repository.get_files_changed_since(self.user_id, NOW)
+
+        self.assertEqual(len(files), 1)
+        query = repository.container.query_items.call_args[0][0]
+        self.assertIn("c._ts >= @since", query)
+        self.assertEqual(repository.container.query_items.call_args.kwargs["partition_key"], self.user_id)
+
+    def test_deleting_results_leaves_tombstones(self):
+        repository = MatchingResultsRepository.__new__(MatchingResultsRepository)
+        repository.container = MagicMock()
+        repository.tombstones = MagicMock()
+        result = self._result()
+        repository.container.query_items.return_value = [result]
+
+        repository.delete_matching_results_by_file(self.user_id, result['cv']['id'])
+
+        repository.tombstones.add.assert_called_once_with(self.user_id, SyncEntity.MATCHING_RESULT, [result['id']])
+
+
+if __name__ == '__main__':
+    unittest.main()
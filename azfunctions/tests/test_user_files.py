@@ -11,7 +11,7 @@ from dotenv import load_dotenv
 from azure.cosmos import CosmosClient
 from user_files.user_files import _get_file, _download_file
 from user_files.user_files import _get_files, _delete_file, user_files_bp
-from shared.models import FileMetadataDb, FileType, DocumentPage, Line, TableCell, DocumentStyle
+from shared.models import FileMetadataDb, FileType, FileView, DocumentPage, Line, TableCell, DocumentStyle
 from shared.files_repository import FilesRepository
 from shared.blob_service import FilesBlobService
 from unittest import mock
@@ -257,6 +257,36 @@ def test_delete_file_logic():
     mock_files_repository.delete_file.assert_called_once_with(user_id='user-123', file_id=str(file_id))
 
 
+def test_delete_file_keeps_content_blob_shared_with_other_files():
+    mock_files_repository = mock.Mock()
+    mock_blob_service = mock.Mock()
+    file_id = uuid4()
+    mock_files_repository.get_file_by_id.return_value = FileMetadataDb(
+        id=file_id,
+        filename="test.pdf",
+        type=FileType.CV,
+        user_id="user-123",
+        url="https://test.pdf",
+        blob_name="users/user-123/sha256/abc.pdf"
+    )
+    mock_files_repository.count_files_with_blob.return_value = 1
+    mock_claims = {"claims": [{"typ": "http://schemas.xmlsoap.org/ws/2005/05/identity/claims/nameidentifier", "val": "user-123"}]}
+    req = func.HttpRequest(
+        method='DELETE',
+        url=f'/api/files/{file_id}',
+        route_params={'file_id': str(file_id)},
+        headers={'X-MS-CLIENT-PRINCIPAL': base64.b64encode(json.dumps(mock_claims).encode()).decode()},
+        body=None
+    )
+
+    response = _delete_file(req, mock_blob_service, mock_files_repository)
+
+    assert response.status_code == 204
+    mock_files_repository.delete_file.assert_called_once_with(user_id='user-123', file_id=str(file_id))
+    mock_files_repository.count_files_with_blob.assert_called_once_with('user-123', 'users/user-123/sha256/abc.pdf')
+    mock_blob_service.delete_blob.assert_not_called()
+
+
 def test_delete_file_logic_not_found():
     # Mock dependencies
     mock_files_repository = mock.Mock()
@@ -1153,4 +1183,72 @@ def test_get_file_with_model_structure(repository, blob_service, sample_file_con
     assert structure['professional_summary'] == "Software Engineer"
     assert len(structure['skills']) == 2
     assert len(structure['experience']) == 1
-    assert structure['experience'][0]['title'] == "Developer"
\ No newline at end of file
+    assert structure['experience'][0]['title'] == "Developer"
+
+def _files_request(params):
+    mock_claims = {
+        "claims": [
+            {"typ": "http://schemas.xmlsoap.org/ws/2005/05/identity/claims/nameidentifier", "val": "123"}
+        ]
+    }
+    encoded_claims = base64.b64encode(json.dumps(mock_claims).encode()).decode()
+    return func.HttpRequest(
+        method='GET',
+        url='/api/files',
+        params=params,
+        headers={'X-MS-CLIENT-PRINCIPAL': encoded_claims},
+        body=None
+    )
+
+
+def test_get_files_summary_view_is_default():
+    mock_files_repository = mock.Mock()
+    mock_files_repository.get_files_from_db.return_value = [
+        FileMetadataDb(
+            id=uuid4(),
+            filename="file1.txt",
+            type=FileType.CV,
+            user_id="123",
+            url="https://file1.txt",
+            text="Sample text 1",
+            paragraphs=["Sample text 1"]
+        )
+    ]
+
+    response = _get_files(_files_request({}), mock_files_repository)
+
+    assert response.status_code == 200
+    mock_files_repository.get_files_from_db.assert_called_once_with("123", None, view=FileView.SUMMARY)
+    result = json.loads(response.get_body())
+    assert result['files'][0]['filename'] == 'file1.txt'
+    assert 'text' not in result['files'][0]
+    assert 'paragraphs' not in result['files'][0]
+
+
+def test_get_files_full_view():
+    mock_files_repository = mock.Mock()
+    mock_files_repository.get_files_from_db.return_value = []
+
+    response = _get_files(_files_request({'view': 'full'}), mock_files_repository)
+
+    assert response.status_code == 200
+    mock_files_repository.get_files_from_db.assert_called_once_with("123", None, view=FileView.FULL)
+
+
+def test_get_files_invalid_view():
+    response = _get_files(_files_request({'view': 'everything'}), mock.Mock())
+    assert response.status_code == 400
+
+
+def test_get_files_paginated():
+    mock_files_repository = mock.Mock()
+    mock_files_repository.get_files_page.return_value = ([], "next-cursor")
+
+    response = _get_files(_files_request({'page_size': '25', 'continuation': 'abc'}), mock_files_repository)
+
+    assert response.status_code == 200
+    mock_files_repository.get_files_page.assert_called_once_with(
+        "123", None, view=FileView.SUMMARY, page_size=25, continuation='abc'
+    )
+    mock_files_repository.get_files_from_db.assert_not_called()
+    assert json.loads(response.get_body())['continuation'] == "next-cursor"
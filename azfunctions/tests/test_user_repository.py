@@ -296,4 +296,44 @@ def test_can_upload_file_with_naive_datetime(repository, sample_user):
     # Verify the reset happened
     updated_user = repository.get_user(sample_user.userId)
     assert updated_user.matchingUsedCount == 0
-    assert updated_user.lastMatchingReset.tzinfo is not None  # Should be timezone-aware 
\ No newline at end of file
+    assert updated_user.lastMatchingReset.tzinfo is not None  # Should be timezone-aware 
+
+def test_increment_matching_count_by_batch(repository, sample_user):
+    repository.create_user(sample_user.model_dump())
+
+    updated_user = repository.increment_matching_count(sample_user.userId, count=5)
+    assert updated_user.matchingUsedCount == 5
+
+    updated_user = repository.increment_matching_count(sample_user.userId, count=3)
+    assert updated_user.matchingUsedCount == 8
+
+def test_matching_counter_batch_after_30_days(repository, sample_user):
+    sample_user.matchingUsedCount = 50
+    sample_user.lastMatchingReset = datetime.now(UTC) - timedelta(days=31)
+    repository.create_user(sample_user.model_dump())
+
+    # The batch is charged to the new period only
+    updated_user = repository.increment_matching_count(sample_user.userId, count=4)
+    assert updated_user.matchingUsedCount == 4
+    assert updated_user.lastMatchingReset > sample_user.lastMatchingReset
+
+def test_files_count_by_batch_never_below_zero(repository, sample_user):
+    repository.create_user(sample_user.model_dump())
+
+    updated_user = repository.increment_files_count(sample_user.userId, count=3)
+    assert updated_user.filesCount == 3
+
+    updated_user = repository.decrement_files_count(sample_user.userId, count=5)
+    assert updated_user.filesCount == 0
+
+def test_reserve_files_within_limit(repository, sample_user):
+    sample_user.filesLimit = 5
+    sample_user.filesCount = 2
+    repository.create_user(sample_user.model_dump())
+
+    assert repository.reserve_files(sample_user.userId, 3) is True
+    assert repository.get_user(sample_user.userId).filesCount == 5
+
+    # The whole batch is rejected when it does not fit
+    assert repository.reserve_files(sample_user.userId, 1) is False
+    assert repository.get_user(sample_user.userId).filesCount == 5
@@ -4,6 +4,9 @@ from uuid import UUID, uuid4
 from openai import BaseModel
 from pydantic import Field
 
+from shared.models import FileStatusDb, FileView
+from shared.pagination import MAX_PAGE_SIZE
+
 
 class FileType(str, Enum):
     CV = "CV"
@@ -13,6 +16,10 @@ class FileType(str, Enum):
 class UserFilesRequest(BaseModel):
     user_id: str
     type: Optional[FileType] = None
+    view: FileView = FileView.SUMMARY
+    # Pagination is opt-in: without page_size or continuation all files are returned
+    page_size: Optional[int] = Field(default=None, ge=1, le=MAX_PAGE_SIZE)
+    continuation: Optional[str] = None
     
 
 class TableCell(BaseModel):
@@ -66,4 +73,35 @@ class File(BaseModel):
 
 class UserFilesResponse(BaseModel):
     files: List[File] = []
-    
\ No newline at end of file
+    continuation: Optional[str] = None
+
+
+class FileSummary(BaseModel):
+    # Drop any extra fields so listings never carry document content
+    model_config = {"extra": "ignore"}
+
+    id: str
+    filename: str
+    type: str
+    user_id: str
+    url: str
+    content_type: Optional[str] = None
+
+
+class UserFilesSummaryResponse(BaseModel):
+    files: List[FileSummary] = []
+    continuation: Optional[str] = None
+
+
+class FileStatusChangesResponse(BaseModel):
+    statuses: List[FileStatusDb] = []
+    # pass back as ``since`` to get only later changes
+    cursor: Optional[str] = None
+
+
+class FileCleanupMessage(BaseModel):
+    """Queued when a file is deleted, to delete the documents that refer to it."""
+    file_id: str
+    user_id: str
+    # content of the deleted file; ids are natural keys, so a re-upload reuses file_id
+    sha256: Optional[str] = None
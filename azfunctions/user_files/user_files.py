@@ -3,13 +3,22 @@ import json
 import azure.functions as func
 import logging
 from pydantic import ValidationError
+import asyncio
 import base64
+import time
+from datetime import datetime, timedelta, UTC
 
 from shared.db_service import get_cosmos_db_client
 from shared.files_repository import FilesRepository
+from shared.matching_results_repository import MatchingResultsRepository
+from shared.queue_service import QueueService
+from shared.file_status_repository import FileStatusRepository
 from shared.blob_service import FilesBlobService
-from user_files.models import UserFilesRequest, UserFilesResponse, File, ResumeStructure, PersonalDetail, ExperienceEntry, Page, Line, TableCell
+from shared.extraction_store import FileExtractionStore
+from user_files.models import FileCleanupMessage, FileStatusChangesResponse, UserFilesRequest, UserFilesResponse, UserFilesSummaryResponse, File, ResumeStructure, PersonalDetail, ExperienceEntry, Page, Line, TableCell
 from shared.openai_service.models import DocumentAnalysis
+from shared.models import FileView
+from shared.pagination import DEFAULT_PAGE_SIZE
 
 def get_user_id_from_claims(req: func.HttpRequest) -> str:
     """Extract user ID from B2C claims in the request headers."""
@@ -27,6 +36,17 @@ def get_user_id_from_claims(req: func.HttpRequest) -> str:
         logging.error(f"Error getting user ID from claims: {str(e)}")
         return None
 
+# How long a download redirect URL stays valid
+DOWNLOAD_URL_TTL = timedelta(minutes=int(os.getenv("DOWNLOAD_URL_TTL_MINUTES", 5)))
+# Longest a status long-poll waits for changes, and how often it checks meanwhile
+STATUS_MAX_WAIT_SECONDS = int(os.getenv("STATUS_MAX_WAIT_SECONDS", 20))
+STATUS_POLL_INTERVAL_SECONDS = float(os.getenv("STATUS_POLL_INTERVAL_SECONDS", 2))
+# The interval between checks doubles up to this, so a long wait costs a few queries
+STATUS_MAX_POLL_INTERVAL_SECONDS = float(os.getenv("STATUS_MAX_POLL_INTERVAL_SECONDS", 8))
+
+# Queue of the clean-ups that follow a file delete
+FILE_CLEANUP_QUEUE = "file-cleanup-queue"
+
 # create blueprint
 user_files_bp = func.Blueprint()
 
@@ -78,15 +98,35 @@ def _get_files(req: func.HttpRequest, files_repository: FilesRepository) -> func
             )
 
         # Use user_id from claims
-        request = UserFilesRequest(user_id=user_id, type=req.params.get('type'))
-        files_metadata_db = files_repository.get_files_from_db(request.user_id, request.type)
-        response = UserFilesResponse(files=[file_metadata.model_dump(mode="json") for file_metadata in files_metadata_db])
+        request = UserFilesRequest(
+            user_id=user_id,
+            type=req.params.get('type'),
+            view=req.params.get('view') or FileView.SUMMARY,
+            page_size=req.params.get('page_size'),
+            continuation=req.params.get('continuation')
+        )
+        continuation = None
+        if request.page_size or request.continuation:
+            files_metadata_db, continuation = files_repository.get_files_page(
+                request.user_id,
+                request.type,
+                view=request.view,
+                page_size=request.page_size or DEFAULT_PAGE_SIZE,
+                continuation=request.continuation
+            )
+        else:
+            files_metadata_db = files_repository.get_files_from_db(request.user_id, request.type, view=request.view)
+        response_model = UserFilesResponse if request.view == FileView.FULL else UserFilesSummaryResponse
+        response = response_model(
+            files=[file_metadata.model_dump(mode="json") for file_metadata in files_metadata_db],
+            continuation=continuation
+        )
         return func.HttpResponse(
             body=response.model_dump_json(),
             mimetype="application/json",
             status_code=200
         )
-    except ValidationError as e:
+    except (ValidationError, ValueError) as e:
         logging.error(f"Validation error: {str(e)}")
         return func.HttpResponse(
             body=json.dumps({"error": str(e)}),
@@ -109,7 +149,9 @@ def delete_file(req: func.HttpRequest) -> func.HttpResponse:
         files_blob_service = FilesBlobService()
         cosmos_db_client = get_cosmos_db_client()
         files_repository = FilesRepository(cosmos_db_client)
-        response = _delete_file(req, files_blob_service, files_repository)
+        file_status_repository = FileStatusRepository(cosmos_db_client)
+        cleanup_queue_service = QueueService(connection_string=os.getenv("AzureWebJobsStorage"))
+        response = _delete_file(req, files_blob_service, files_repository, file_status_repository, cleanup_queue_service)
         return response
     except Exception as e:
         logging.error(f"Error in delete_file wrapper: {str(e)}")
@@ -120,7 +162,13 @@ def delete_file(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 
-def _delete_file(req: func.HttpRequest, files_blob_service: FilesBlobService, files_repository: FilesRepository) -> func.HttpResponse:
+def _delete_file(
+    req: func.HttpRequest,
+    files_blob_service: FilesBlobService,
+    files_repository: FilesRepository,
+    file_status_repository: FileStatusRepository = None,
+    cleanup_queue_service: QueueService = None
+) -> func.HttpResponse:
     # Get file_id from route parameters
     file_id = req.route_params.get('file_id')
     if not file_id:
@@ -177,14 +225,39 @@ def _delete_file(req: func.HttpRequest, files_blob_service: FilesBlobService, fi
                 status_code=403
             )
         
-        # Delete file from blob storage
-        files_blob_service.delete_blob(
-            container_name="resume-match-pro-files",
-            filename=file_metadata.filename
-        )
+        # Delete file from blob storage. Content-addressed blobs are shared by the
+        # user's files with identical bytes and are deleted with the last of them.
+        if not file_metadata.blob_name:
+            files_blob_service.delete_blob(
+                container_name="resume-match-pro-files",
+                filename=file_metadata.get_blob_name()
+            )
+        
+        # Delete the extraction sidecar, if the file has one
+        FileExtractionStore(files_blob_service).delete(file_metadata)
         
         # Delete file metadata from database
         files_repository.delete_file(user_id=user_id, file_id=file_id)
+        if file_status_repository:
+            file_status_repository.delete_status(user_id, file_id)
+
+        if file_metadata.blob_name and files_repository.count_files_with_blob(user_id, file_metadata.blob_name) == 0:
+            files_blob_service.delete_blob(
+                container_name="resume-match-pro-files",
+                filename=file_metadata.blob_name
+            )
+
+        # The file's matching results can be many: they are deleted in the background
+        if cleanup_queue_service:
+            try:
+                cleanup_queue_service.create_queue_if_not_exists(FILE_CLEANUP_QUEUE)
+                cleanup_queue_service.send_message(
+                    FILE_CLEANUP_QUEUE,
+                    FileCleanupMessage(file_id=file_id, user_id=user_id, sha256=file_metadata.sha256).model_dump_json()
+                )
+            except Exception as e:
+                # results of deleted files are left out of responses until cleaned up
+                logging.error(f"Could not queue the clean-up of file {file_id}: {str(e)}")
         
         return func.HttpResponse(
             body="",
@@ -199,13 +272,43 @@ def _delete_file(req: func.HttpRequest, files_blob_service: FilesBlobService, fi
         )
 
 
+@user_files_bp.queue_trigger(arg_name="msg", queue_name=FILE_CLEANUP_QUEUE, connection="AzureWebJobsStorage")
+def clean_up_deleted_file(msg: func.QueueMessage):
+    """Delete the matching results of a deleted file."""
+    message = FileCleanupMessage(**msg.get_json())
+    cosmos_db_client = get_cosmos_db_client()
+    _clean_up_deleted_file(message, MatchingResultsRepository(cosmos_db_client), FilesRepository(cosmos_db_client))
+
+
+def _clean_up_deleted_file(
+    message: FileCleanupMessage,
+    matching_results_repository: MatchingResultsRepository,
+    files_repository: FilesRepository = None
+) -> int:
+    """Delete the results of the deleted content of a file. Returns the number deleted.
+
+    File ids are natural keys, so the file may have been uploaded again under
+    the same id before this runs: results of its new content are kept, and
+    nothing is deleted when the same content is back.
+    """
+    if files_repository:
+        current = files_repository.get_file_by_id(message.user_id, message.file_id)
+        if current and (not message.sha256 or current.sha256 == message.sha256):
+            logging.info(f"File {message.file_id} was uploaded again with the same content, keeping its results")
+            return 0
+    deleted = matching_results_repository.delete_matching_results_by_file(message.user_id, message.file_id, message.sha256)
+    logging.info(f"Deleted {deleted} matching results of deleted file {message.file_id}")
+    return deleted
+
+
 @user_files_bp.route(route="files/{file_id}", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
 def get_file(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Get file function processed a request.')
     try:
         cosmos_db_client = get_cosmos_db_client()
         files_repository = FilesRepository(cosmos_db_client)
-        response = _get_file(req, files_repository)
+        extraction_store = FileExtractionStore(FilesBlobService())
+        response = _get_file(req, files_repository, extraction_store)
         return response
     except Exception as e:
         logging.error(f"Error in get_file wrapper: {str(e)}")
@@ -216,7 +319,7 @@ def get_file(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 
-def _get_file(req: func.HttpRequest, files_repository: FilesRepository) -> func.HttpResponse:
+def _get_file(req: func.HttpRequest, files_repository: FilesRepository, extraction_store: FileExtractionStore = None) -> func.HttpResponse:
     try:
         # Get user ID from claims
         user_id = get_user_id_from_claims(req)
@@ -246,6 +349,10 @@ def _get_file(req: func.HttpRequest, files_repository: FilesRepository) -> func.
                     status_code=404
                 )
 
+            # Load the document analysis from the extraction sidecar
+            if extraction_store:
+                file_db = extraction_store.load(file_db)
+
             # Create response model
             file_response = File(
                 id=str(file_db.id),
@@ -282,6 +389,31 @@ def _get_file(req: func.HttpRequest, files_repository: FilesRepository) -> func.
         )
 
 
+def _parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single-range `bytes=` header into inclusive offsets.
+
+    Returns None when the header should be ignored (other units or multiple
+    ranges) and raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range {range_header} not satisfiable for {size} bytes")
+    return start, end
+
+
 @user_files_bp.route(route="files/{file_id}/download", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
 def download_file(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Download file function processed a request.')
@@ -330,21 +462,68 @@ def _download_file(req: func.HttpRequest, files_blob_service: FilesBlobService,
                     status_code=404
                 )
             
+            blob_name = file.get_blob_name()
+            content_type = file.content_type or "application/octet-stream"
+            headers = {
+                'Content-Disposition': f'attachment; filename="{file.filename}"',
+                'Content-Type': content_type,
+                'Accept-Ranges': 'bytes'
+            }
+            # The content hash is a strong validator, so repeat views can be answered with 304
+            etag = f'"{file.sha256}"' if file.sha256 else None
+            if etag:
+                headers['ETag'] = etag
+                headers['Cache-Control'] = 'private, no-cache'
+                if etag in [tag.strip() for tag in req.headers.get('If-None-Match', '').split(',')]:
+                    return func.HttpResponse(status_code=304, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+            # Optionally hand out a read-only SAS URL so the bytes bypass the function
+            if req.params.get('redirect', '').lower() == 'true':
+                expires_on = datetime.now(UTC) + DOWNLOAD_URL_TTL
+                download_url = files_blob_service.generate_download_url(
+                    files_blob_service.container_name, blob_name, expires_on, download_filename=file.filename
+                )
+                return func.HttpResponse(status_code=302, headers={'Location': download_url, 'Cache-Control': 'no-store'})
+
             # Get file content from blob storage
             try:
+                range_header = req.headers.get('Range')
+                if range_header:
+                    size = file.size if file.size is not None else files_blob_service.get_blob_size(
+                        files_blob_service.container_name, blob_name
+                    )
+                    try:
+                        byte_range = _parse_range(range_header, size)
+                    except ValueError:
+                        return func.HttpResponse(
+                            body=json.dumps({"error": "Requested range not satisfiable"}),
+                            mimetype="application/json",
+                            status_code=416,
+                            headers={'Content-Range': f'bytes */{size}'}
+                        )
+                    if byte_range:
+                        start, end = byte_range
+                        partial_content = files_blob_service.read_blob_range(
+                            files_blob_service.container_name, blob_name, start, end - start + 1
+                        )
+                        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                        return func.HttpResponse(
+                            body=partial_content,
+                            mimetype=content_type,
+                            status_code=206,
+                            headers=headers
+                        )
+
                 file_content = files_blob_service.get_file_content(
                     container_name=files_blob_service.container_name,
-                    filename=file.filename
+                    filename=blob_name
                 )
 
                 return func.HttpResponse(
                     body=file_content,
-                    mimetype=file.content_type or "application/octet-stream",
+                    mimetype=content_type,
                     status_code=200,
-                    headers={
-                        'Content-Disposition': f'attachment; filename="{file.filename}"',
-                        'Content-Type': file.content_type or "application/octet-stream"
-                    }
+                    headers=headers
                 )
             except Exception as e:
                 logging.error(f"Error getting file content from blob storage: {str(e)}")
@@ -367,4 +546,98 @@ def _download_file(req: func.HttpRequest, files_blob_service: FilesBlobService,
             body=json.dumps({"error": "Internal Server Error"}),
             mimetype="application/json",
             status_code=500
-        )
\ No newline at end of file
+        )
+
+
+@user_files_bp.route(route="files/status", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+async def get_file_status_changes(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('Get file status changes function processed a request.')
+    try:
+        file_status_repository = FileStatusRepository(get_cosmos_db_client())
+        return await _get_file_status_changes(req, file_status_repository)
+    except Exception as e:
+        logging.error(f"Error in get_file_status_changes wrapper: {str(e)}")
+        return func.HttpResponse(
+            body=json.dumps({"error": "Internal Server Error"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+async def _get_file_status_changes(req: func.HttpRequest, file_status_repository: FileStatusRepository) -> func.HttpResponse:
+    """Long-poll for status changes of the user's files.
+
+    Returns the statuses updated after the ``since`` cursor and the cursor to
+    pass next. With ``wait`` (seconds, capped at STATUS_MAX_WAIT_SECONDS) the
+    request is held until a change arrives or the wait is over. Waiting runs
+    on the event loop and the queries on its default executor, so held
+    requests take no thread from the worker's pool for synchronous functions.
+    """
+    user_id = get_user_id_from_claims(req)
+    if not user_id:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Unauthorized - Missing user claims"}),
+            mimetype="application/json",
+            status_code=401
+        )
+    since = req.params.get('since') or None
+    try:
+        wait = min(max(float(req.params.get('wait', 0)), 0), STATUS_MAX_WAIT_SECONDS)
+    except ValueError:
+        return func.HttpResponse(
+            body=json.dumps({"error": "wait must be a number of seconds"}),
+            mimetype="application/json",
+            status_code=400
+        )
+
+    deadline = time.monotonic() + wait
+    interval = STATUS_POLL_INTERVAL_SECONDS
+    try:
+        changes, cursor = await asyncio.to_thread(file_status_repository.get_changes, user_id, since)
+    except ValueError:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Invalid status cursor"}),
+            mimetype="application/json",
+            status_code=400
+        )
+    while not changes and time.monotonic() + interval <= deadline:
+        await asyncio.sleep(interval)
+        changes, cursor = await asyncio.to_thread(file_status_repository.get_changes, user_id, since)
+        interval = min(interval * 2, STATUS_MAX_POLL_INTERVAL_SECONDS)
+
+    response = FileStatusChangesResponse(statuses=changes, cursor=cursor)
+    return func.HttpResponse(response.model_dump_json(), mimetype="application/json", status_code=200)
+
+
+@user_files_bp.route(route="files/{file_id}/status", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def get_file_status(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('Get file status function processed a request.')
+    try:
+        file_status_repository = FileStatusRepository(get_cosmos_db_client())
+        return _get_file_status(req, file_status_repository)
+    except Exception as e:
+        logging.error(f"Error in get_file_status wrapper: {str(e)}")
+        return func.HttpResponse(
+            body=json.dumps({"error": "Internal Server Error"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+def _get_file_status(req: func.HttpRequest, file_status_repository: FileStatusRepository) -> func.HttpResponse:
+    user_id = get_user_id_from_claims(req)
+    if not user_id:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Unauthorized - Missing user claims"}),
+            mimetype="application/json",
+            status_code=401
+        )
+    # statuses are partitioned by user, so other users' files are not found
+    status = file_status_repository.get_status(user_id, req.route_params.get('file_id'))
+    if not status:
+        return func.HttpResponse(
+            body=json.dumps({"error": "File status not found"}),
+            mimetype="application/json",
+            status_code=404
+        )
+    return func.HttpResponse(status.model_dump_json(), mimetype="application/json", status_code=200)
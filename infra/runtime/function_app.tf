@@ -52,6 +52,8 @@ resource "azurerm_linux_function_app" "resumematchpro" {
         "COSMOS_URL" = azurerm_cosmosdb_account.cosmosdb.endpoint
         "COSMOS_KEY" = azurerm_cosmosdb_account.cosmosdb.primary_key
         "COSMOS_DB_NAME" = "${var.project_name}-${terraform.workspace}"
+        # Connection of the Cosmos DB change-feed triggers (outbox dispatch, change-feed matching)
+        "CosmosDbConnection" = azurerm_cosmosdb_account.cosmosdb.primary_sql_connection_string
 
         # CORS Configuration
         "ALLOWED_ORIGINS" = var.MAIN_FRONTEND_URLS